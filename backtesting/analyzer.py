@@ -1,10 +1,37 @@
+import numpy as np
+import pandas as pd
 import backtrader as bt
 
+from backtesting.feeds.store import EPOCH_ORDINAL
+from backtesting import stats
+
+# metrics EquityCurve can compute, METRICS in the config selects them
+METRICS = ('trades', 'drawdown', 'sqn', 'sharpe_ratio', 'sharpe_ratio_a', 'sortino_ratio', 'calmar_ratio',
+           'annual_returns')
+DEFAULT_METRICS = ('trades', 'drawdown', 'sqn', 'sharpe_ratio', 'sharpe_ratio_a')
+
+# raw fields of a closed trade, the others are derived from them at stop
+TRADE_DTYPE = np.dtype([
+    ('ref', np.int64),
+    ('data', np.int32),  # index of the trade data in the strategy datas
+    ('long', np.bool_),
+    ('dtin', np.float64),
+    ('dtout', np.float64),
+    ('pricein', np.float64),
+    ('priceout', np.float64),
+    ('pnl', np.float64),
+    ('brokervalue', np.float64),
+    ('size', np.float64),
+    ('value', np.float64),
+    ('nbars', np.int64),
+    ('barout', np.int64),  # index of the exit bar in the data
+])
+
 
 class TradeList(bt.Analyzer):
     """
-    Records closed trades and returns dictionary containing the following
-    keys/values:
+    Records closed trades and returns a DataFrame with one row per trade and
+    the following columns:
       - ``ref``: reference number (from backtrader)
       - ``ticker``: data name
       - ``direction``: direction (long or short)
@@ -24,83 +51,284 @@ class TradeList(bt.Analyzer):
       - ``mae``: max adverse excursion in $s from entry price
       - ``mfe%``: max favorable excursion in % of entry price
       - ``mae%``: max adverse excursion in % of entry price
+
+    Trades are recorded as raw fields in a growing structured array and the
+    derived columns, MFE and MAE included, are computed at once over the data
+    arrays at stop, so the data must be preloaded.
     """
 
     def __init__(self):
-        self.trades = []
-        self.cumprofit = 0.0
+        self.records = np.empty(16, dtype=TRADE_DTYPE)
+        self.count = 0
+        self.trades = None
 
     def notify_trade(self, trade):
+        if not trade.isclosed:
+            return
+        if self.count == len(self.records):
+            self.records = np.resize(self.records, 2 * len(self.records))
+
+        history = trade.history
+        first, last = history[0], history[-1]
+        size = value = 0.0
+        for record in history:
+            if abs(size) < abs(record.status.size):
+                size = record.status.size
+                value = record.status.value
+
+        self.records[self.count] = (
+            trade.ref, self.data_index(trade.data), first.event.size > 0,
+            first.status.dt, last.status.dt, last.status.price, last.event.price,
+            last.status.pnlcomm, self.strategy.broker.getvalue(), size, value,
+            last.status.barlen, len(trade.data) - 1,
+        )
+        self.count += 1
+
+    def data_index(self, data):
+        # datas.index would compare the lines with ==, which builds a line operation
+        for i, d in enumerate(self.strategy.datas):
+            if d is data:
+                return i
+
+    def stop(self):
+        self.trades = self.build(self.records[:self.count])
+
+    def excursions(self, records):
+        """
+        Highest high and lowest low of every trade, entry and exit bars included.
+        """
+        highest = np.empty(len(records))
+        lowest = np.empty(len(records))
+        for i in np.unique(records['data']).tolist():
+            rows = records['data'] == i
+            data = self.strategy.datas[i]
+            # a trailing bar keeps the window bounds inside the arrays for reduceat
+            high = np.append(np.frombuffer(data.high.array, dtype=np.float64), np.nan)
+            low = np.append(np.frombuffer(data.low.array, dtype=np.float64), np.nan)
+            bounds = np.column_stack((records['barout'][rows] - records['nbars'][rows],
+                                      records['barout'][rows] + 1)).ravel()
+            highest[rows] = np.maximum.reduceat(high, bounds)[::2]
+            lowest[rows] = np.minimum.reduceat(low, bounds)[::2]
+        return highest, lowest
+
+    def dates(self, records, field):
+        days = records[field] - EPOCH_ORDINAL
+        dates = (days * 86400e6).round().astype('datetime64[us]')
+        if all(d._timeframe >= bt.TimeFrame.Days for d in self.strategy.datas):
+            return dates.astype('datetime64[D]')
+        return dates
 
-        if trade.isclosed:
-            if trade.isclosed:
-
-                brokervalue = self.strategy.broker.getvalue()
-
-                direction = 'short'
-                if trade.history[0].event.size > 0:
-                    direction = 'long'
-
-                pricein = trade.history[len(trade.history) - 1].status.price
-                priceout = trade.history[len(trade.history) - 1].event.price
-                datein = bt.num2date(trade.history[0].status.dt)
-                dateout = bt.num2date(trade.history[len(trade.history) - 1].status.dt)
-                if trade.data._timeframe >= bt.TimeFrame.Days:
-                    datein = datein.date()
-                    dateout = dateout.date()
-
-                pcntchange = 100 * priceout / pricein - 100
-                pnl = trade.history[len(trade.history) - 1].status.pnlcomm
-                pnlpcnt = 100 * pnl / brokervalue
-                barlen = trade.history[len(trade.history) - 1].status.barlen
-                pbar = pnl / barlen
-                self.cumprofit += pnl
-
-                size = value = 0.0
-                for record in trade.history:
-                    if abs(size) < abs(record.status.size):
-                        size = record.status.size
-                        value = record.status.value
-
-                highest_in_trade = max(trade.data.high.get(ago=0, size=barlen + 1))
-                lowest_in_trade = min(trade.data.low.get(ago=0, size=barlen + 1))
-                hp = highest_in_trade - pricein
-                lp = lowest_in_trade - pricein
-                mfe0 = 0.0
-                mae0 = 0.0
-                mfe = 0.0
-                mae = 0.0
-                if direction == 'long':
-                    mfe0 = hp
-                    mae0 = lp
-                    mfe = 100 * hp / pricein
-                    mae = 100 * lp / pricein
-                if direction == 'short':
-                    mfe0 = -lp
-                    mae0 = -hp
-                    mfe = -100 * lp / pricein
-                    mae = -100 * hp / pricein
-
-                self.trades.append({
-                    'ref': trade.ref,
-                    'ticker': trade.data._name,
-                    'direction': direction,
-                    'datein': datein,
-                    'pricein': pricein,
-                    'dateout': dateout,
-                    'priceout': priceout,
-                    'chng%': round(pcntchange, 2),
-                    'pnl': pnl,
-                    'pnl%': round(pnlpcnt, 2),
-                    'size': size, 'value': value,
-                    'cumpnl': self.cumprofit,
-                    'nbars': barlen,
-                    'pnl/bar': round(pbar, 2),
-                    'mfe': round(mfe0, 2),
-                    'mae': round(mae0, 2),
-                    'mfe%': round(mfe, 2),
-                    'mae%': round(mae, 2)
-                })
+    def build(self, records):
+        pricein = records['pricein']
+        pnl = records['pnl']
+        highest, lowest = self.excursions(records)
+        hp = highest - pricein
+        lp = lowest - pricein
+        is_long = records['long']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'ref': records['ref'],
+                'ticker': [self.strategy.datas[i]._name for i in records['data']],
+                'direction': np.where(is_long, 'long', 'short'),
+                'datein': self.dates(records, 'dtin'),
+                'pricein': pricein,
+                'dateout': self.dates(records, 'dtout'),
+                'priceout': records['priceout'],
+                'chng%': np.round(100 * records['priceout'] / pricein - 100, 2),
+                'pnl': pnl,
+                'pnl%': np.round(100 * pnl / records['brokervalue'], 2),
+                'size': records['size'],
+                'value': records['value'],
+                'cumpnl': np.cumsum(pnl),
+                'nbars': records['nbars'],
+                'pnl/bar': np.round(pnl / records['nbars'], 2),
+                'mfe': np.round(np.where(is_long, hp, -lp), 2),
+                'mae': np.round(np.where(is_long, lp, -hp), 2),
+                'mfe%': np.round(np.where(is_long, 100 * hp / pricein, -100 * lp / pricein), 2),
+                'mae%': np.round(np.where(is_long, 100 * lp / pricein, -100 * hp / pricein), 2),
+            })
 
     def get_analysis(self):
+        if self.trades is None:
+            self.stop()
         return self.trades
+
+
+class EquityCurve(bt.Analyzer):
+    """
+    Records the broker value at every bar and the net profit of every closed
+    trade, and computes the selected ``metrics`` from them in one pass at stop,
+    as the backtrader analyzers they replace would:
+      - ``trades``: ``TradeAnalyzer`` totals, streaks and net profit
+      - ``drawdown``: ``DrawDown`` max drawdown (%) and moneydown
+      - ``sqn``: ``SQN``
+      - ``sharpe_ratio``: ``SharpeRatio`` of daily returns, annualized
+      - ``sharpe_ratio_a``: ``SharpeRatio_A`` of yearly returns
+      - ``sortino_ratio``: annualized Sortino ratio of daily returns
+      - ``calmar_ratio``: annualized return over max drawdown
+      - ``annual_returns``: return of every year, by year
+
+    With ``curve``, the analysis holds the curve itself as ``curve``: the dates
+    (``datetime64[D]``), the broker values and the net profit of the closed trades.
+    """
+
+    params = (
+        ('metrics', DEFAULT_METRICS),
+        ('curve', False),
+    )
+
+    def start(self):
+        unknown = set(self.p.metrics) - set(METRICS)
+        if unknown:
+            raise ValueError('unknown metrics: %s' % ', '.join(sorted(unknown)))
+        size = max(self.strategy.data.buflen(), 1)
+        self.values = np.empty(size)
+        self.datetimes = np.empty(size)
+        self.count = 0
+        self.start_value = self.strategy.broker.getvalue()
+        self.pnlcomm = []
+        self.opened = 0
+        self.open = 0
+        self.rets = {}
+
+    def notify_fund(self, cash, value, fundvalue, shares):
+        if self.count == len(self.values):
+            self.values = np.resize(self.values, 2 * len(self.values))
+            self.datetimes = np.resize(self.datetimes, 2 * len(self.datetimes))
+        self.values[self.count] = value
+        self.datetimes[self.count] = self.strategy.datetime[0]
+        self.count += 1
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self.opened += 1
+            self.open += 1
+        elif trade.isclosed:
+            self.open -= 1
+            self.pnlcomm.append(trade.pnlcomm)
+
+    def stop(self):
+        metrics = self.p.metrics
+        values = self.values[:self.count, None]
+        days = np.floor(self.datetimes[:self.count]).astype(np.int64) - EPOCH_ORDINAL
+        dates = days.astype('datetime64[D]')
+        rets = {}
+
+        if 'trades' in metrics:
+            rets['total_open'] = self.open if self.opened else None
+            rets.update(stats.trade_stats(self.pnlcomm))
+        if 'drawdown' in metrics:
+            max_drawdown, max_moneydown = stats.drawdown(values)
+            rets['max_drawdown'] = float(max_drawdown[0])
+            rets['max_moneydown'] = float(max_moneydown[0])
+        if 'sqn' in metrics:
+            rets['sqn'] = stats.sqn(self.pnlcomm)
+        # the return metrics only see the backtest window, whatever the bars loaded around it
+        window = self.window(dates)
+        window_values, window_dates = values[window], dates[window]
+        windowed = len(window_dates) > 0
+        if windowed and set(metrics) & {'sharpe_ratio', 'sortino_ratio'}:
+            daily = stats.period_returns(window_values, window_dates, self.start_value)
+            if 'sharpe_ratio' in metrics:
+                rets['sharpe_ratio'] = self.value(stats.sharpe_ratio(daily, factor=252, annualize=True))
+            if 'sortino_ratio' in metrics:
+                rets['sortino_ratio'] = self.value(stats.sortino_ratio(daily, factor=252, annualize=True))
+        if windowed and set(metrics) & {'sharpe_ratio_a', 'annual_returns'}:
+            years = window_dates.astype('datetime64[Y]')
+            yearly = stats.period_returns(window_values, years, self.start_value)
+            if 'sharpe_ratio_a' in metrics:
+                rets['sharpe_ratio_a'] = self.value(stats.sharpe_ratio(yearly, riskfreerate=0.01, factor=1,
+                                                                       annualize=True))
+            if 'annual_returns' in metrics:
+                keys = np.unique(years).astype(int) + 1970
+                rets['annual_returns'] = dict(zip(keys.tolist(), yearly[:, 0].tolist()))
+        if windowed and 'calmar_ratio' in metrics:
+            span = int((window_dates[-1] - window_dates[0]).astype(int))
+            # the drawdown is measured from the start value, as over the flat bars before the window
+            start = np.full((1, 1), float(self.start_value))
+            rets['calmar_ratio'] = self.value(stats.calmar_ratio(np.vstack([start, window_values]), span,
+                                                                 self.start_value))
+        if self.p.curve:
+            rets['curve'] = (dates, values[:, 0].copy(), list(self.pnlcomm))
+        self.rets = rets
+
+    def window(self, dates):
+        """
+        ``stats.metric_window`` of the curve rows over the bars of the strategy's data,
+        every row for a strategy without a backtest window.
+        """
+        start_date = getattr(self.strategy, 'start_date', None)
+        end_date = getattr(self.strategy, 'end_date', None)
+        if start_date is None or end_date is None:
+            return np.ones(len(dates), dtype=bool)
+        bar_days = np.floor(np.asarray(self.strategy.data.datetime.array)).astype(np.int64) - EPOCH_ORDINAL
+        return stats.metric_window(dates, bar_days.astype('datetime64[D]'), start_date, end_date)
+
+    @staticmethod
+    def value(ratio):
+        return None if np.isnan(ratio[0]) else float(ratio[0])
+
+    def get_analysis(self):
+        return self.rets
+
+
+# plotlines keys of an indicator line the charts keep
+LINE_STYLE = ('color', 'ls', 'marker', 'markersize')
+
+
+class ChartSeries(bt.Analyzer):
+    """
+    Records what the chart of a run draws over the bars of its backtest window, so
+    it can be rendered after the run instead of by ``cerebro.plot`` in the worker:
+      - ``datetime``, ``open``, ``high``, ``low``, ``close``: the bars of the data
+      - ``lines``: the lines of the plotted indicators of the strategy, each a dict of
+        ``label``, ``line``, ``subplot``, ``style`` (from its plotlines) and ``values``
+      - ``order_datetime``, ``order_price``, ``order_size``: the executed orders,
+        the size negative for a sale
+    """
+
+    def start(self):
+        self.orders = []
+        self.rets = {}
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.orders.append((self.strategy.datetime[0], order.executed.price, order.executed.size))
+
+    def stop(self):
+        data = self.strategy.data
+        first = getattr(self.strategy, 'first_bar', 0)
+        end = getattr(self.strategy, 'end_bar', len(data))
+
+        def values(line):
+            return np.frombuffer(line.array, dtype=np.float64)[first:end].copy()
+
+        rets = {'datetime': self.dates(values(data.datetime))}
+        for name in ('open', 'high', 'low', 'close'):
+            rets[name] = values(getattr(data.lines, name))
+        lines = []
+        for indicator in self.strategy.getindicators():
+            if not indicator.plotinfo.plot:
+                continue
+            for i, alias in enumerate(indicator.lines.getlinealiases()):
+                plotline = indicator.plotlines._get(alias, None)
+                if plotline is not None and plotline._get('_plotskip', False):
+                    continue
+                style = {}
+                if plotline is not None:
+                    style = {key: plotline._get(key) for key in LINE_STYLE if plotline._get(key, None) is not None}
+                lines.append({'label': indicator.plotlabel(), 'line': alias, 'subplot': bool(indicator.plotinfo.subplot),
+                              'style': style, 'values': values(indicator.lines[i])})
+        rets['lines'] = lines
+        orders = np.array(self.orders, dtype=np.float64).reshape(-1, 3)
+        rets['order_datetime'] = self.dates(orders[:, 0])
+        rets['order_price'] = orders[:, 1]
+        rets['order_size'] = orders[:, 2]
+        self.rets = rets
+
+    @staticmethod
+    def dates(values):
+        return (np.floor(values).astype(np.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+
+    def get_analysis(self):
+        return self.rets
@@ -0,0 +1,101 @@
+import backtrader as bt
+
+from backtesting.task import Task
+from backtesting.feeds.akshare import load_bars, feed_from_bars
+from backtesting.vectorized import params_grid
+from backtesting.indicators.cache import indicator_cache
+from backtesting.timing import timer
+
+
+class BatchBroker(bt.brokers.BackBroker):
+    """
+    Broker of a batch run. A strategy bound to a symbol trades on an account of its
+    own, a ``BackBroker`` set up like this one when the strategy is created, so its
+    cash, value, orders and metrics are those of a run on the symbol alone. An
+    account only steps on the bars of its symbol.
+
+    The broker's own book is left to strategies added without ``batch``, which see
+    every symbol: the place of a cross-sectional strategy.
+    """
+
+    def init(self):
+        super(BatchBroker, self).init()
+        # [data, account, bars stepped] of every strategy bound to a symbol
+        self.accounts = []
+
+    def account(self, strategy):
+        account = bt.brokers.BackBroker(**self.p._getkwargs())
+        account.comminfo = dict(self.comminfo)
+        account.start()
+        self.accounts.append([strategy.data, account, 0])
+        return account
+
+    def next(self):
+        super(BatchBroker, self).next()
+        for entry in self.accounts:
+            data, account, bars = entry
+            if len(data) > bars:
+                entry[2] = len(data)
+                account.next()
+            # Cerebro delivers the notifications to the owner of the order
+            if account.notifs:
+                self.notifs.extend(account.notifs)
+                account.notifs.clear()
+
+
+class BatchTask(Task):
+    """
+    Runs the grid of a strategy on many symbols in one Cerebro: one strategy per
+    symbol and parameter set, bound to its symbol and trading on an account of its
+    own, so the records are those of ``Task.run`` on every symbol. The event loop
+    walks the union of the dates of the symbols.
+
+    Cerebro setup, strategy and analyzer instantiation and the optimization pool
+    of ``Task`` are paid once per batch instead of once per symbol.
+    """
+
+    def new_cerebro(self):
+        cerebro = super(BatchTask, self).new_cerebro()
+        cerebro.setbroker(BatchBroker())
+        return cerebro
+
+    def add_strategies(self):
+        # run adds them for every symbol
+        pass
+
+    def run(self, symbols, bars=None):
+        """
+        :param symbols: dict of symbol to name
+        :param bars: dict of symbol to its ``Bars`` when already loaded, read from the store otherwise
+        :return: dict of symbol to its metrics records, in the order of ``Task.run``; the trade
+            lists are in ``trade_lists`` and the chart series in ``chart_series``, by symbol,
+            then by params repr
+        """
+        bars = bars or {}
+        indicator_cache.resize(self.indicator_cache_size * 1024 * 1024)
+        combos = params_grid(self.strategy_cls, self.optimization, self.params)
+        with timer.phase('load'):
+            for i, symbol in enumerate(symbols):
+                symbol_bars = bars.get(symbol)
+                if symbol_bars is None:
+                    symbol_bars = load_bars(self.data_dir, symbol)
+                self.cerebro.adddata(feed_from_bars(self.window_bars(symbol_bars)), name=symbol)
+                for combo in combos:
+                    self.cerebro.addstrategy(self.strategy_cls, batch=i, **combo)
+        with timer.phase('run'):
+            strategies = self.cerebro.run(cheat_on_open=self.cheat_on_open, tradehistory=self.trade_history,
+                                          runonce=self.run_once)
+        metrics_records = {symbol: [] for symbol in symbols}
+        trade_lists = {symbol: {} for symbol in symbols}
+        chart_series = {symbol: {} for symbol in symbols}
+        with timer.phase('performance'):
+            for strategy in strategies:
+                # performance reports on the symbol of the task
+                self.symbol = strategy.data._name
+                self.name = symbols[self.symbol]
+                self.trade_lists = trade_lists[self.symbol]
+                self.chart_series = chart_series[self.symbol]
+                metrics_records[self.symbol].append(self.performance(strategy).asdict())
+        self.trade_lists = trade_lists
+        self.chart_series = chart_series
+        return metrics_records
@@ -0,0 +1,94 @@
+import io
+import os
+import glob
+import json
+import hashlib
+
+import numpy as np
+
+# arrays of a chart series, the indicator lines aside
+SERIES_ARRAYS = ('datetime', 'open', 'high', 'low', 'close', 'order_datetime', 'order_price', 'order_size')
+
+
+class ChartLog:
+    """
+    Chart series of every backtest, the ``ChartSeries`` analysis, partitioned by
+    strategy and run like the trade log:
+
+      <root>/<strategy>/<run id>/<part>.npz    series of a work unit, by symbol and params
+
+    A part holds its arrays, compressed, and an index of its series referring to them.
+    An array shared by several series, such as the bars of a symbol or the average of
+    one period across a grid, is stored once.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, strategy, run_id):
+        return os.path.join(self.root, strategy, run_id)
+
+    def write(self, strategy, run_id, unit_key, symbol, series):
+        """
+        :param series: dict of params repr to the ``ChartSeries`` analysis of a backtest
+        """
+        if not series:
+            return
+        directory = self.path(strategy, run_id)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        names = {}
+
+        def store(values):
+            # the dtypes of the arrays pickled back from the optimization pool carry metadata np.save warns of
+            values = values.view(np.dtype(values.dtype.str))
+            digest = hashlib.blake2b(values.dtype.str.encode() + values.tobytes(), digest_size=16).hexdigest()
+            if digest not in names:
+                names[digest] = 'a%d' % len(names)
+                arrays[names[digest]] = values
+            return names[digest]
+
+        index = []
+        for params in sorted(series):
+            analysis = series[params]
+            entry = {'symbol': symbol, 'params': params}
+            entry.update({name: store(analysis[name]) for name in SERIES_ARRAYS})
+            entry['lines'] = [dict(line, values=store(line['values'])) for line in analysis['lines']]
+            index.append(entry)
+        arrays['index'] = np.array(json.dumps(index))
+        part = hashlib.blake2b(unit_key.encode('utf-8'), digest_size=8).hexdigest()
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        file_path = os.path.join(directory, part + '.npz')
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, file_path)
+
+    def parts(self, strategy, run_id):
+        return sorted(glob.glob(os.path.join(self.path(strategy, run_id), '*.npz')))
+
+    def index(self, strategy, run_id):
+        """
+        :return: dict of (symbol, params repr) to the part holding its series
+        """
+        index = {}
+        for file_path in self.parts(strategy, run_id):
+            with np.load(file_path) as part:
+                for entry in json.loads(str(part['index'])):
+                    index[(entry['symbol'], entry['params'])] = file_path
+        return index
+
+    @staticmethod
+    def read(file_path, symbol, params):
+        """
+        The series of ``symbol`` and ``params`` in the part ``file_path``, as ``ChartSeries`` analyses it.
+        """
+        with np.load(file_path) as part:
+            for entry in json.loads(str(part['index'])):
+                if entry['symbol'] == symbol and entry['params'] == params:
+                    series = {name: part[entry[name]] for name in SERIES_ARRAYS}
+                    series['lines'] = [dict(line, values=part[line['values']]) for line in entry['lines']]
+                    return series
+        return None
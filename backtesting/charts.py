@@ -0,0 +1,163 @@
+import os
+import re
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtesting.task import Task
+from backtesting.vectorized import VectorTask, params_grid, params_repr
+from backtesting.chartlog import ChartLog
+from backtesting.journal import Journal
+from backtesting.search import top
+
+
+def chart_path(directory, record):
+    # characters a file name cannot hold on Windows
+    name = re.sub(r'[\\/:*?"<>|]', '_', '%(strategy)s %(symbol)s %(params)s' % record)
+    return os.path.join(directory, name + '.png')
+
+
+def select(records, count, metric, symbols=None):
+    """
+    The ``count`` records of every strategy with the highest ``metric``, of ``symbols`` only when given.
+
+    :return: dict of strategy name to its selected records, best first
+    """
+    by_strategy = {}
+    for record in records:
+        if symbols is None or record['symbol'] in symbols:
+            by_strategy.setdefault(record['strategy'], []).append(record)
+    return {strategy: top(rows, [row.get(metric) for row in rows], count) for strategy, rows in by_strategy.items()}
+
+
+def render_charts(config, run_id, strategies=None, count=None, metric=None, symbols=None):
+    """
+    Render the charts of the ``count`` backtests of every strategy of a run with the
+    highest ``metric``, ``CHART_TOP`` by ``CHART_METRIC`` by default, to
+    ``REPORT_DIR/chart/<run id>``. The records come from the journal of the run and
+    the series from its chart log. A backtest without series there, its result taken
+    from the result cache, runs again for its chart.
+
+    The charts are drawn with matplotlib's Agg backend by a pool of ``CHART_WORKERS``
+    processes, all the cores by default.
+
+    :param strategies: names of the strategies to chart, all of the run by default
+    :return: the paths of the charts rendered
+    """
+    report_dir = config.get('REPORT_DIR')
+    count = count or config.get('CHART_TOP', 10)
+    metric = metric or config.get('CHART_METRIC', 'sharpe_ratio')
+    records = [record for _, unit_records in Journal(os.path.join(report_dir, 'journal'), run_id).entries()
+               for record in unit_records if strategies is None or record['strategy'] in strategies]
+    selected = select(records, count, metric, symbols)
+    chart_log = ChartLog(os.path.join(report_dir, 'chart_log'))
+    directory = os.path.join(report_dir, 'chart', run_id)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    jobs = []
+    for strategy_name in sorted(selected):
+        index = chart_log.index(strategy_name, run_id)
+        for record in selected[strategy_name]:
+            jobs.append((index.get((record['symbol'], record['params'])), record))
+    if not jobs:
+        print('run %s has no backtest to chart' % run_id)
+        return []
+
+    paths = []
+    workers = min(config.get('CHART_WORKERS') or os.cpu_count(), len(jobs))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(record, executor.submit(render_job, config, part, record, metric, chart_path(directory, record)))
+                   for part, record in jobs]
+        for record, future in futures:
+            try:
+                paths.append(future.result())
+            except Exception as exc:
+                print('%(strategy)s %(symbol)s %(params)s chart generated an exception: ' % record + str(exc))
+    print('%d charts by %s rendered to %s' % (len(paths), metric, directory))
+    return paths
+
+
+def render_job(config, part, record, metric, file_path):
+    series = ChartLog.read(part, record['symbol'], record['params']) if part is not None else None
+    if series is None:
+        series = run_series(config, record)
+    score = record.get(metric)
+    title = '%(strategy)s %(symbol)s %(name)s %(params)s' % record + \
+            '  %s %s' % (metric, 'None' if score is None else '%.4g' % score)
+    render_chart(series, title, file_path)
+    return file_path
+
+
+def run_series(config, record):
+    """
+    The chart series of the backtest of ``record``, run again.
+    """
+    strategy_cls = getattr(importlib.import_module(config.get('STRATEGIES')[record['strategy']]), record['strategy'])
+    combos = {params_repr(strategy_cls, combo): combo
+              for combo in params_grid(strategy_cls, strategy_cls.optimize(), strategy_cls.params_list())}
+    conf = dict(config, CHART=True, MAXCPUS=1)
+    if conf.get('ENGINE', 'backtrader') == 'vectorized':
+        task = VectorTask(conf, strategy_cls, combos[record['params']])
+    else:
+        task = Task(conf, strategy_cls, combos[record['params']])
+    task.run(record['symbol'], record['name'])
+    return task.chart_series[record['params']]
+
+
+def render_chart(series, title, file_path):
+    """
+    Draw the chart of a ``ChartSeries`` analysis to ``file_path``: candlesticks of the
+    bars with the executed orders and the indicators plotted on them, and a panel
+    below for every indicator plotted on its own.
+    """
+    # headless: the workers have no display
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
+    dates = series['datetime']
+    if not len(dates):
+        raise ValueError('no bars in the backtest window')
+    x = np.arange(len(dates))
+    panels = []
+    for line in series['lines']:
+        if line['subplot'] and line['label'] not in panels:
+            panels.append(line['label'])
+    fig, axes = plt.subplots(1 + len(panels), 1, sharex=True, squeeze=False, figsize=(16, 9),
+                             gridspec_kw={'height_ratios': [4] + [1] * len(panels)})
+    axes = axes[:, 0]
+    price = axes[0]
+
+    open_, high, low, close = series['open'], series['high'], series['low'], series['close']
+    # rising bars red and falling ones green, as the A-share quotes show them
+    colors = np.where(close >= open_, 'tab:red', 'tab:green')
+    price.vlines(x, low, high, colors=colors, linewidth=0.6)
+    price.bar(x, np.abs(close - open_), bottom=np.minimum(open_, close), color=colors, width=0.6)
+
+    for line in series['lines']:
+        ax = axes[1 + panels.index(line['label'])] if line['subplot'] else price
+        values = line['values']
+        finite = np.isfinite(values)
+        ax.plot(x[finite], values[finite], label='%s %s' % (line['label'], line['line']), **line['style'])
+
+    bars = np.searchsorted(dates, series['order_datetime'])
+    inside = bars < len(dates)
+    size = series['order_size']
+    for side, marker, color in ((size > 0, '^', 'tab:blue'), (size < 0, 'v', 'black')):
+        rows = side & inside
+        if rows.any():
+            price.scatter(x[bars[rows]], series['order_price'][rows], marker=marker, color=color, s=36, zorder=3,
+                          label='buy' if marker == '^' else 'sell')
+
+    axes[-1].xaxis.set_major_formatter(FuncFormatter(
+        lambda value, _: str(dates[int(value)]) if 0 <= value < len(dates) else ''))
+    for ax in axes:
+        ax.grid(alpha=0.3)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(loc='upper left', fontsize='small')
+    fig.suptitle(title)
+    fig.tight_layout()
+    fig.savefig(file_path, dpi=100)
+    plt.close(fig)
@@ -1,10 +1,13 @@
 import backtrader as bt
 
+from backtesting.costs import CostModel
+
 
 class StampDutyCommissionScheme(bt.CommInfoBase):
     '''
-    This commission scheme uses a fixed commission and stamp duty for share
-    purchases. Share sales are subject only to the fixed commission.
+    This commission scheme charges a commission of the order value, at least
+    ``minimum_commission`` per order, and the stamp duty on share sales, as
+    computed by ``CostModel``.
 
     The scheme is intended for trading China equities on the main market.
 
@@ -29,17 +32,11 @@ class StampDutyCommissionScheme(bt.CommInfoBase):
         self.sell_commission_rate = sell_commission_rate
         self.minimum_commission = minimum_commission
         self.stamp_duty = stamp_duty
+        self.costs = CostModel(buy_commission_rate, sell_commission_rate, minimum_commission, stamp_duty)
 
     def _getcommission(self, size, price, pseudoexec):
         '''
         If size is greater than 0, this indicates a long / buying of shares.
         If size is less than 0, it idicates a short / selling of shares.
         '''
-
-        if size > 0:
-            return size * price * self.buy_commission_rate
-        elif size < 0:
-            # return - size * price * (self.p.stamp_duty + self.p.commission * self.p.mult)
-            return abs(size) * price * self.sell_commission_rate
-        else:
-            return 0  # just in case for some reason the size is 0.
+        return self.costs.commission(size, price)
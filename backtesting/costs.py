@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+
+class CostModel:
+    """
+    Trading costs of China A-shares: a commission of ``buy_rate`` or ``sell_rate``
+    of the order value, at least ``minimum`` per order, and the ``stamp_duty`` rate
+    on sales only.
+
+    Every method takes scalars, for the sizer and the commission scheme, or NumPy
+    arrays of orders, for simulations and reports over many orders at once.
+    """
+
+    def __init__(self, buy_rate, sell_rate, minimum=0.0, stamp_duty=0.0):
+        self.buy_rate = buy_rate
+        self.sell_rate = sell_rate
+        self.minimum = minimum
+        self.stamp_duty = stamp_duty
+
+    def buy_cost(self, value):
+        """
+        Cost of buying shares worth ``value``.
+        """
+        if isinstance(value, np.ndarray):
+            return np.where(value > 0, np.maximum(value * self.buy_rate, self.minimum), 0.0)
+        return max(value * self.buy_rate, self.minimum) if value > 0 else 0.0
+
+    def sell_cost(self, value):
+        """
+        Cost of selling shares worth ``value``, stamp duty included.
+        """
+        if isinstance(value, np.ndarray):
+            return np.where(value > 0, np.maximum(value * self.sell_rate, self.minimum) + value * self.stamp_duty, 0.0)
+        return max(value * self.sell_rate, self.minimum) + value * self.stamp_duty if value > 0 else 0.0
+
+    def commission(self, size, price):
+        """
+        Cost of an order of ``size`` shares at ``price``: bought when ``size`` > 0, sold when < 0.
+        Orders are an array of sizes with a price or an array of prices.
+        """
+        if isinstance(size, np.ndarray):
+            value = np.abs(size) * price
+            return np.where(size > 0, self.buy_cost(value), self.sell_cost(value))
+        # inlined, the broker charges every execution through here
+        if size > 0:
+            comm = size * price * self.buy_rate
+            return comm if comm > self.minimum else self.minimum
+        if size < 0:
+            value = -size * price
+            comm = value * self.sell_rate
+            return (comm if comm > self.minimum else self.minimum) + value * self.stamp_duty
+        return 0.0
+
+    def affordable(self, size, price, cash):
+        """
+        Whether buying ``size`` shares at ``price`` costs less than ``cash``, fees included.
+        """
+        value = size * price
+        return value + self.buy_cost(value) < cash
+
+    def max_size(self, cash, price, lot=1):
+        """
+        Largest multiple of ``lot`` shares affordable with ``cash`` at ``price``, in closed form:
+        ``size * price * (1 + buy_rate) < cash`` and ``size * price + minimum < cash``.
+        """
+        if isinstance(cash, np.ndarray) or isinstance(price, np.ndarray):
+            cash, price = np.broadcast_arrays(np.asarray(cash, dtype=np.float64), np.asarray(price, dtype=np.float64))
+            bound = np.minimum(cash / (price * (1 + self.buy_rate)), (cash - self.minimum) / price)
+            size = np.maximum(np.floor(bound / lot), 0).astype(np.int64) * lot
+            # the bounds are exclusive and rounded, step a lot back or ahead where they fell on the wrong side
+            size = np.where((size > 0) & ~self.affordable(size, price, cash), size - lot, size)
+            return np.where(self.affordable(size + lot, price, cash), size + lot, size)
+        bound = min(cash / (price * (1 + self.buy_rate)), (cash - self.minimum) / price)
+        size = max(math.floor(bound / lot), 0) * lot
+        if size > 0 and not self.affordable(size, price, cash):
+            size -= lot
+        if self.affordable(size + lot, price, cash):
+            size += lot
+        return size
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import glob
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'OFF': OFF}
+LEVEL_NAMES = {level: name for name, level in LEVELS.items()}
+
+
+class EventLog:
+    """
+    Structured event log of a process. An event is a dict written as one JSON
+    line to a buffered sink: ``<directory>/<pid>.part.jsonl`` per process, so
+    workers never share a file, or stdout without a directory. The parent
+    merges the parts of a run with ``merge_events``.
+
+    Strategies flush the sink when they stop, as the processes of backtrader's
+    optimization pool exit without flushing.
+
+    Events below ``level`` are dropped. Hot paths test the ``debug``/``info``
+    flags before building an event, so a disabled level costs an attribute
+    lookup and no formatting or I/O.
+    """
+
+    def __init__(self, level=OFF, directory=None, buffer_size=1024 * 1024):
+        self.file = None
+        self.settings = None
+        self.fork_hook = False
+        self.apply(level, directory, buffer_size)
+
+    def configure(self, level, directory=None, buffer_size=1024 * 1024):
+        # the fork hook is registered by the first configuration, importing the module registers nothing
+        if not self.fork_hook:
+            os.register_at_fork(before=self.flush, after_in_child=self.forked)
+            self.fork_hook = True
+        self.apply(level, directory, buffer_size)
+
+    def apply(self, level, directory, buffer_size):
+        level = LEVELS[level.upper()] if isinstance(level, str) else level
+        if self.settings == (level, directory, buffer_size):
+            return
+        self.close()
+        self.settings = (level, directory, buffer_size)
+        self.level = level
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.debug = level <= DEBUG
+        self.info = level <= INFO
+        self.warning = level <= WARNING
+
+    def open(self):
+        if self.directory is None:
+            return sys.stdout
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        file_path = os.path.join(self.directory, '%d.part.jsonl' % os.getpid())
+        return open(file_path, 'a', encoding='utf-8', buffering=self.buffer_size)
+
+    def emit(self, level, event, **fields):
+        if level < self.level:
+            return
+        if self.file is None:
+            self.file = self.open()
+        record = {'time': time.time(), 'pid': os.getpid(), 'level': LEVEL_NAMES[level], 'event': event}
+        record.update(fields)
+        self.file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None and self.file is not sys.stdout:
+            self.file.close()
+        self.file = None
+
+    def forked(self):
+        # the buffer was flushed before the fork, a forked child (backtrader's
+        # optimization pool) writes to a part of its own
+        self.file = None
+
+
+event_log = EventLog()
+
+
+def configure_events(config, run_id=None):
+    """
+    Set up the event log of this process from ``LOG_LEVEL``: the parts of a run go
+    to ``REPORT_DIR/log/<run_id>``, events are printed without a run.
+    """
+    directory = os.path.join(config.get('REPORT_DIR'), 'log', run_id) if run_id else None
+    event_log.configure(config.get('LOG_LEVEL') or 'OFF', directory)
+
+
+def merge_events(directory):
+    """
+    Merge the per-process parts in ``directory`` into its ``events.jsonl`` in time order.
+    """
+    parts = glob.glob(os.path.join(directory, '*.part.jsonl'))
+    if not parts:
+        return
+    records = []
+    for file_path in parts:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append((json.loads(line)['time'], line))
+                except ValueError:
+                    # a line cut short by a crashed worker
+                    continue
+    records.sort(key=lambda record: record[0])
+    with open(os.path.join(directory, 'events.jsonl'), 'a', encoding='utf-8') as f:
+        f.writelines(line for _, line in records)
+    for file_path in parts:
+        os.remove(file_path)
@@ -1,79 +1,78 @@
 import os
-from datetime import datetime
+import numpy as np
 import pandas as pd
-import backtrader as bt
-import akshare as ak
 
+from backtesting.feeds.store import BarStore
+from backtesting.feeds.arraydata import ArrayData, frame_columns
 
-class AkshareData(bt.feed.DataBase):
+# akshare takes seconds to import, so it is imported by the functions fetching from it:
+# the backtests reading the stored bars, and the workers running them, never load it
+
+
+class AkshareData(ArrayData):
     """
     AkshareData base on akshare to fetch history data
     """
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.iter = None
-        self.data = None
-
-    def start(self):
-        if self.data is None:
-            df = ak.stock_zh_a_hist(symbol=self.p.dataname, adjust="qfq").iloc[:, :6]
-            df.columns = [
-                'trade_date',
-                'open',
-                'close',
-                'high',
-                'low',
-                'volume',
-            ]
-            df.index = pd.to_datetime(df['trade_date'])
-            self.data = df
-            assert (self.data is not None)
-        # set the iterator anyway
-        self.iter = self.data.sort_index(ascending=False).iterrows()
-
-    def stop(self):
-        pass
-
-    def _load(self):
-        if self.iter is None:
-            # if no data ... no parsing
-            return False
-        # try to get 1 row of data from iterator
-        try:
-            row = next(self.iter)
-        except StopIteration:
-            # end of the list
-            return False
-        # fill the lines
-        self.lines.datetime[0] = self.date2num(datetime.strptime(row[1]['trade_date'], '%Y-%m-%d'))
-        self.lines.open[0] = row[1]['open']
-        self.lines.high[0] = row[1]['high']
-        self.lines.low[0] = row[1]['low']
-        self.lines.close[0] = row[1]['close']
-        self.lines.volume[0] = row[1]['volume']
-        self.lines.openinterest[0] = -1
-        # Say success
-        return True
+    def fetch(self):
+        columns = frame_columns(fetch_akshare(self.p.dataname), 'date', '%Y-%m-%d')
+        columns['openinterest'] = np.full(len(columns['datetime']), -1.0)
+        return columns
+
+
+def fetch_index_cons(index_code):
+    """
+    Current constituents of the index ``index_code``: ``symbol``, ``name`` and ``included``
+    (inclusion date) columns.
+    """
+    import akshare as ak
+    df = ak.index_stock_cons(symbol=index_code)
+    df.columns = ['symbol', 'name', 'included']
+    return df
+
+
+def fetch_akshare(symbol, start_date=None, end_date=None):
+    """
+    Daily qfq bars of ``symbol``, all of them or those between the optional dates.
+    """
+    import akshare as ak
+    kwargs = {}
+    if start_date is not None:
+        kwargs['start_date'] = pd.Timestamp(start_date).strftime('%Y%m%d')
+    if end_date is not None:
+        kwargs['end_date'] = pd.Timestamp(end_date).strftime('%Y%m%d')
+    df = ak.stock_zh_a_hist(symbol=symbol, adjust="qfq", **kwargs).iloc[:, :6]
+    df.columns = [
+        'date',
+        'open',
+        'close',
+        'high',
+        'low',
+        'volume',
+    ]
+    return df
+
+
+def load_bars(data_dir, symbol):
+    """
+    Open the columnar bars of ``symbol`` from the store in ``data_dir``.
+
+    A symbol missing from the store is imported from its legacy
+    ``<symbol>.csv`` cache when present, or downloaded otherwise.
+    """
+    store = BarStore(os.path.join(data_dir, 'store'))
+    if not store.has(symbol):
+        file_path = os.path.join(data_dir, symbol + '.csv')
+        if os.path.exists(file_path):
+            store.import_csv(symbol, file_path)
+        else:
+            store.write(symbol, fetch_akshare(symbol))
+    return store.read(symbol)
+
+
+def feed_from_bars(bars):
+    return ArrayData.from_bars(bars)
 
 
 def load_data_from_akshare(data_dir, symbol):
-    if not os.path.exists(data_dir):
-        os.mkdir(data_dir)
-    file_path = os.path.join(data_dir, symbol + '.csv')
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-    else:
-        df = ak.stock_zh_a_hist(symbol=symbol, adjust="qfq").iloc[:, :6]
-        df.columns = [
-            'date',
-            'open',
-            'close',
-            'high',
-            'low',
-            'volume',
-        ]
-        df.to_csv(file_path, index=False)
-    df.index = pd.to_datetime(df['date'])
-    data = bt.feeds.PandasData(dataname=df)
-    return data
+    return feed_from_bars(load_bars(data_dir, symbol))
@@ -0,0 +1,108 @@
+import array
+
+import numpy as np
+import pandas as pd
+import backtrader as bt
+
+from backtesting.feeds.store import EPOCH_ORDINAL
+
+LINES = ('datetime', 'open', 'high', 'low', 'close', 'volume', 'openinterest')
+
+
+def date2num(dates):
+    """
+    Dates (anything ``pd.to_datetime`` takes) as backtrader float day numbers.
+    """
+    values = pd.to_datetime(dates).values.astype('datetime64[us]').astype(np.int64)
+    return values / 86400e6 + EPOCH_ORDINAL
+
+
+def frame_columns(df, date_column, date_format=None, volume_column='volume'):
+    """
+    Columns of a bars DataFrame as ``ArrayData`` takes them, sorted by date.
+    """
+    dates = date2num(pd.to_datetime(df[date_column], format=date_format))
+    order = np.argsort(dates, kind='stable')
+    columns = {'datetime': dates[order]}
+    for name in LINES[1:5]:
+        columns[name] = df[name].values[order]
+    columns['volume'] = df[volume_column].values[order]
+    return columns
+
+
+class ArrayData(bt.feed.DataBase):
+    """
+    Data feed over whole columns: ``dataname`` is a mapping of line name to an
+    array, with ``datetime`` as backtrader day numbers (``date2num``). Missing
+    lines are left NaN.
+
+    Preloading copies every column into its line buffer at once instead of
+    going through ``_load`` bar by bar, which remains for unpreloaded runs and
+    for feeds with filters. Subclasses fetch their columns in ``fetch``.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.columns = None
+        self.index = 0
+
+    @classmethod
+    def from_bars(cls, bars, **kwargs):
+        """
+        Feed over the ``Bars`` of a ``BarStore``.
+        """
+        columns = {'datetime': bars.date2num()}
+        for name in LINES[1:6]:
+            columns[name] = getattr(bars, name)
+        return cls(dataname=columns, **kwargs)
+
+    def fetch(self):
+        return self.p.dataname
+
+    def window(self, start_date, end_date):
+        """
+        Bar indices of the first bar on or after ``start_date`` and of the first bar
+        after ``end_date``, counted in the bars the feed delivers.
+        """
+        dates = self.columns['datetime']
+        offset = np.searchsorted(dates, self.fromdate, side='left')
+        first = np.searchsorted(dates, pd.Timestamp(start_date).toordinal(), side='left')
+        last = np.searchsorted(dates, pd.Timestamp(end_date).toordinal() + 1, side='left')
+        return max(int(first - offset), 0), max(int(last - offset), 0)
+
+    def start(self):
+        super().start()
+        if self.columns is None:
+            self.columns = {name: np.ascontiguousarray(values, dtype=np.float64)
+                            for name, values in self.fetch().items()}
+        self.index = 0
+
+    def stop(self):
+        pass
+
+    def preload(self):
+        if self._filters or self._tzinput:
+            return super().preload()
+
+        dates = self.columns['datetime']
+        # the fromdate/todate filters of load
+        first = int(np.searchsorted(dates, self.fromdate, side='left'))
+        last = int(np.searchsorted(dates, self.todate, side='right'))
+        nan = np.full(last - first, np.nan)
+        for name in LINES:
+            values = self.columns.get(name)
+            values = nan if values is None else values[first:last]
+            getattr(self.lines, name).array = array.array('d', np.ascontiguousarray(values).tobytes())
+        self.index = last
+        self._last()
+        self.home()
+
+    def _load(self):
+        if self.index >= len(self.columns['datetime']):
+            return False
+        for name in LINES:
+            values = self.columns.get(name)
+            if values is not None:
+                getattr(self.lines, name)[0] = float(values[self.index])
+        self.index += 1
+        return True
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtesting.feeds.store import BarStore, COLUMNS
+
+
+class CsvSource:
+    """
+    Bar source reading ``<directory>/<symbol>.csv`` files with a ``date`` column
+    and OHLCV columns, a local stand-in for ``fetch_akshare``.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, symbol, start_date=None, end_date=None):
+        df = pd.read_csv(os.path.join(self.directory, symbol + '.csv'))
+        dates = pd.to_datetime(df['date'])
+        if start_date is not None:
+            df = df[dates >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            df = df[dates <= pd.Timestamp(end_date)]
+        return df.reset_index(drop=True)
+
+
+def refresh_symbol(store, symbol, source, overlap=5, rtol=1e-6):
+    """
+    Bring the stored bars of ``symbol`` up to date from ``source``.
+
+    Only the bars from the last ``overlap`` stored dates on are fetched. When the
+    overlapping bars no longer match the stored ones, the qfq adjustment has
+    shifted the history and the whole symbol is fetched again.
+
+    :return: 'new', 'current', 'appended' or 'adjusted'
+    """
+    if not store.has(symbol):
+        store.write(symbol, source(symbol))
+        return 'new'
+
+    bars = store.read(symbol, mmap=False)
+    first = max(0, len(bars) - overlap)
+    df = source(symbol, start_date=pd.Timestamp(bars.datetime[first]))
+    dates = pd.to_datetime(df['date']).values.astype('datetime64[D]')
+    order = np.argsort(dates, kind='stable')
+    df, dates = df.iloc[order], dates[order]
+
+    stored = bars.datetime[first:]
+    matched = np.isin(stored, dates)
+    if not matched.all():
+        store.write(symbol, source(symbol))
+        return 'adjusted'
+    rows = np.searchsorted(dates, stored)
+    for column in COLUMNS[:4]:
+        fetched = df[column].values.astype(np.float64)[rows]
+        if not np.allclose(fetched, getattr(bars, column)[first:], rtol=rtol, atol=0.0):
+            store.write(symbol, source(symbol))
+            return 'adjusted'
+
+    new = df[dates > bars.datetime[-1]]
+    if new.empty:
+        return 'current'
+    store.append(symbol, new)
+    return 'appended'
+
+
+def refresh(data_dir, symbols, source):
+    """
+    Refresh the bars of ``symbols`` in the store of ``data_dir``.
+
+    :return: dict of symbol to the ``refresh_symbol`` outcome, or the exception raised
+    """
+    store = BarStore(os.path.join(data_dir, 'store'))
+    outcome = {}
+    for symbol in symbols:
+        try:
+            outcome[symbol] = refresh_symbol(store, symbol, source)
+        except Exception as exc:
+            outcome[symbol] = exc
+            print('%s refresh generated an exception: %s' % (symbol, exc))
+        else:
+            print('%s refresh %s' % (symbol, outcome[symbol]))
+    return outcome
@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# backtrader's date2num counts days from 0001-01-01 (ordinal 1), numpy from 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class Bars:
+    """
+    Read-only view on the columns of one symbol in a BarStore.
+
+    Every column is a numpy array (memory-mapped when opened from disk):
+      - ``datetime``: trading dates as ``datetime64[D]``, ascending
+      - ``open``, ``high``, ``low``, ``close``, ``volume``: float64
+    """
+
+    def __init__(self, symbol, columns):
+        self.symbol = symbol
+        self.datetime = columns['datetime']
+        self.open = columns['open']
+        self.high = columns['high']
+        self.low = columns['low']
+        self.close = columns['close']
+        self.volume = columns['volume']
+
+    def __len__(self):
+        return len(self.datetime)
+
+    def fingerprint(self):
+        """
+        Content hash of the bars.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for column in ('datetime',) + COLUMNS:
+            digest.update(np.ascontiguousarray(getattr(self, column)).view(np.uint8))
+        return digest.hexdigest()
+
+    def date2num(self):
+        """
+        Dates as backtrader float day numbers, the representation of ``lines.datetime``.
+        """
+        return self.datetime.astype(np.int64).astype(np.float64) + EPOCH_ORDINAL
+
+    def locate(self, dt, side='left'):
+        """
+        Index of the first bar on or after ``dt`` (``side='left'``) or after ``dt`` (``side='right'``).
+        """
+        return int(np.searchsorted(self.datetime, np.datetime64(dt, 'D'), side=side))
+
+    def bounds(self, start_date, end_date, warmup=0, lookahead=0):
+        """
+        Indices ``[first, last)`` of the bars from ``warmup`` bars before ``start_date``
+        to ``lookahead`` bars after ``end_date`` plus the two bars closing a position
+        still open at its end (the close is ordered on the first and filled on the
+        next bar at the latest).
+        """
+        first = max(self.locate(start_date) - warmup, 0)
+        last = min(self.locate(end_date, side='right') + lookahead + 2, len(self))
+        return first, last
+
+    def slice(self, first, last):
+        columns = {column: getattr(self, column)[first:last] for column in ('datetime',) + COLUMNS}
+        return Bars(self.symbol, columns)
+
+    def window(self, start_date, end_date, warmup=0, lookahead=0):
+        """
+        The bars of ``bounds``.
+        """
+        return self.slice(*self.bounds(start_date, end_date, warmup, lookahead))
+
+    def to_frame(self):
+        df = pd.DataFrame({
+            'date': self.datetime,
+            'open': self.open,
+            'close': self.close,
+            'high': self.high,
+            'low': self.low,
+            'volume': self.volume,
+        })
+        df.index = pd.DatetimeIndex(df['date'])
+        return df
+
+
+class BarStore:
+    """
+    Columnar on-disk bar store, one directory per symbol:
+
+      <root>/<symbol>/datetime.<version>.npy    datetime64[D]
+      <root>/<symbol>/open.<version>.npy ...    float64, one file per OHLCV column
+      <root>/<symbol>/meta.json                 bars count, first/last date and version
+
+    Columns are plain ``.npy`` files so they can be opened with ``mmap`` and
+    handed to the feeds without parsing. Every write stores the columns of a
+    new version next to the current ones, then replaces ``meta.json`` to point
+    at them, so a crashed writer leaves the previous version of the symbol
+    in place and never a half-written one visible to readers.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, symbol):
+        return os.path.join(self.root, symbol)
+
+    def has(self, symbol):
+        return os.path.exists(os.path.join(self.path(symbol), 'meta.json'))
+
+    def symbols(self):
+        if not os.path.exists(self.root):
+            return []
+        return sorted(s for s in os.listdir(self.root) if self.has(s))
+
+    def meta(self, symbol):
+        with open(os.path.join(self.path(symbol), 'meta.json'), 'r') as f:
+            return json.load(f)
+
+    def index(self):
+        """
+        Symbol/date index of the store: one row per symbol with its bar count and date range.
+        """
+        rows = [dict(symbol=s, **self.meta(s)) for s in self.symbols()]
+        return pd.DataFrame(rows, columns=['symbol', 'bars', 'start', 'end'])
+
+    def column_path(self, symbol, column, version=None):
+        # the symbols stored before the columns were versioned have none
+        name = column + '.npy' if version is None else '%s.%d.npy' % (column, version)
+        return os.path.join(self.path(symbol), name)
+
+    def read(self, symbol, mmap=True):
+        version = self.meta(symbol).get('version')
+        mmap_mode = 'r' if mmap else None
+        columns = {}
+        for column in ('datetime',) + COLUMNS:
+            columns[column] = np.load(self.column_path(symbol, column, version), mmap_mode=mmap_mode)
+        return Bars(symbol, columns)
+
+    def write(self, symbol, df):
+        """
+        Store a DataFrame with a ``date`` column (or a DatetimeIndex) and OHLCV columns.
+        """
+        directory = self.path(symbol)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if 'date' in df.columns:
+            dates = pd.to_datetime(df['date'])
+        else:
+            dates = pd.to_datetime(df.index.to_series())
+        order = np.argsort(dates.values, kind='stable')
+        columns = {'datetime': dates.values[order].astype('datetime64[D]')}
+        for column in COLUMNS:
+            columns[column] = np.ascontiguousarray(df[column].values[order], dtype=np.float64)
+
+        version = self.meta(symbol).get('version', 0) + 1 if self.has(symbol) else 1
+        for column, values in columns.items():
+            file_path = self.column_path(symbol, column, version)
+            tmp_path = file_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp_path, file_path)
+
+        dates = columns['datetime']
+        meta = {
+            'bars': len(dates),
+            'start': str(dates[0]) if len(dates) else None,
+            'end': str(dates[-1]) if len(dates) else None,
+            'version': version,
+        }
+        meta_path = os.path.join(directory, 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        # the columns of the previous versions, and of writes that crashed before their meta.json
+        current = set(os.path.basename(self.column_path(symbol, column, version)) for column in columns)
+        for name in os.listdir(directory):
+            if name.endswith(('.npy', '.npy.tmp')) and name not in current:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    # still mapped by a reader on Windows, removed by the next write
+                    pass
+
+    def append(self, symbol, df):
+        """
+        Add the bars of ``df`` after the stored ones, rewriting the symbol as a new
+        version the same crash-safe way as ``write``.
+        """
+        frame = self.read(symbol, mmap=False).to_frame()
+        df = df.assign(date=pd.to_datetime(df['date'] if 'date' in df.columns else df.index.to_series()))
+        self.write(symbol, pd.concat([frame, df[['date'] + list(COLUMNS)]], ignore_index=True))
+
+    def import_csv(self, symbol, file_path):
+        self.write(symbol, pd.read_csv(file_path))
+
+    def export_csv(self, symbol, file_path):
+        self.read(symbol).to_frame().to_csv(file_path, index=False, date_format='%Y-%m-%d')
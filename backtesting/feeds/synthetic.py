@@ -0,0 +1,69 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_bars(symbol, bars=3000, end='2023-06-30', limit=0.1, seed=None):
+    """
+    Deterministic daily bars for ``symbol`` in the layout of ``fetch_akshare``: a
+    fat-tailed random walk on business days with opening gaps and moves capped at
+    ``limit`` of the previous close, A-share style. About 1% of the days are limit
+    moves, half of them locked at the limit for the whole day (one price bar).
+
+    The walk only depends on ``symbol`` (or ``seed``), ``bars`` and ``end``.
+    """
+    if seed is None:
+        seed = int.from_bytes(hashlib.blake2b(symbol.encode('utf-8'), digest_size=8).digest(), 'big')
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=bars)
+
+    returns = np.clip(rng.standard_t(4, bars) * 0.015, -limit, limit)
+    limit_days = rng.random(bars) < 0.01
+    returns[limit_days] = np.where(rng.random(limit_days.sum()) < 0.5, -limit, limit)
+    close = 10 * np.cumprod(1 + returns)
+    previous = np.concatenate(([10.0], close[:-1]))
+
+    # the open gaps from the previous close, staying within the limits and the day's close
+    gap = np.clip(rng.normal(0, 0.01, bars) + 0.3 * returns, -limit, limit)
+    open_ = previous * (1 + gap)
+    upper = previous * (1 + limit)
+    lower = previous * (1 - limit)
+    high = np.minimum(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, bars))), upper)
+    low = np.maximum(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, bars))), lower)
+    locked = limit_days & (rng.random(bars) < 0.5)
+    open_[locked] = high[locked] = low[locked] = close[locked]
+
+    open_, close, high, low = (np.round(p, 2) for p in (open_, close, high, low))
+    high = np.maximum.reduce([high, open_, close])
+    low = np.minimum.reduce([low, open_, close])
+    volume = np.round(rng.lognormal(13, 0.6, bars) * (1 + 2 * np.abs(returns) / limit))
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'open': open_,
+        'close': close,
+        'high': high,
+        'low': low,
+        'volume': volume,
+    })
+
+
+class SyntheticSource:
+    """
+    Bar source with the signature of ``fetch_akshare`` serving ``synthetic_bars``,
+    for the benchmarks and for running without network access.
+    """
+
+    def __init__(self, bars=3000, end='2023-06-30'):
+        self.bars = bars
+        self.end = end
+
+    def __call__(self, symbol, start_date=None, end_date=None):
+        df = synthetic_bars(symbol, self.bars, self.end)
+        dates = pd.to_datetime(df['date'])
+        keep = np.ones(len(df), dtype=bool)
+        if start_date is not None:
+            keep &= dates >= pd.Timestamp(start_date)
+        if end_date is not None:
+            keep &= dates <= pd.Timestamp(end_date)
+        return df[keep].reset_index(drop=True)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+from datetime import date
+
+import pandas as pd
+
+from backtesting.feeds.akshare import fetch_index_cons
+
+UNIVERSE_COLUMNS = ('symbol', 'name', 'included')
+
+
+class CsvUniverseSource:
+    """
+    Constituent source reading ``<directory>/<index code>.csv`` files with ``symbol``,
+    ``name`` and optional ``included`` columns, a local stand-in for ``fetch_index_cons``.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, index_code):
+        return pd.read_csv(os.path.join(self.directory, index_code + '.csv'), dtype=str, keep_default_na=False)
+
+
+class UniverseStore:
+    """
+    Versioned snapshots of index constituents, one directory per index:
+
+      <root>/<index>/<effective date>.csv    symbol, name and inclusion date of the members
+      <root>/<index>/meta.json               dates of the snapshots and time of the last check
+
+    ``refresh`` fetches the constituents from ``source`` and writes a snapshot
+    effective from the day they were fetched when they differ from the latest one.
+    Snapshots of past dates can be written as well, and ``members`` serves the
+    membership as of any date from them.
+    """
+
+    def __init__(self, root, source=fetch_index_cons, ttl=7):
+        self.root = root
+        self.source = source
+        self.ttl = ttl
+
+    def path(self, index_code):
+        return os.path.join(self.root, index_code)
+
+    def meta(self, index_code):
+        meta_path = os.path.join(self.path(index_code), 'meta.json')
+        if not os.path.exists(meta_path):
+            return {'snapshots': [], 'checked': None}
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+
+    def write_meta(self, index_code, meta):
+        meta_path = os.path.join(self.path(index_code), 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def snapshots(self, index_code):
+        """
+        Effective dates of the snapshots of ``index_code`` as ISO strings, ascending.
+        """
+        return self.meta(index_code)['snapshots']
+
+    def read(self, index_code, effective_date):
+        file_path = os.path.join(self.path(index_code), '%s.csv' % effective_date)
+        return pd.read_csv(file_path, dtype=str, keep_default_na=False)
+
+    def write(self, index_code, effective_date, df):
+        """
+        Store the constituents of ``df`` (``symbol`` and ``name`` columns, ``included``
+        optional) as the snapshot of ``index_code`` effective from ``effective_date``.
+        """
+        directory = self.path(index_code)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        effective_date = str(effective_date)
+        df = df.reindex(columns=UNIVERSE_COLUMNS).fillna('').astype(str)
+        df = df.sort_values('symbol').reset_index(drop=True)
+        file_path = os.path.join(directory, '%s.csv' % effective_date)
+        tmp_path = file_path + '.tmp'
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+        meta = self.meta(index_code)
+        meta['snapshots'] = sorted(set(meta['snapshots']) | {effective_date})
+        self.write_meta(index_code, meta)
+
+    def stale(self, index_code):
+        checked = self.meta(index_code)['checked']
+        return checked is None or time.time() - checked > self.ttl * 24 * 3600
+
+    def refresh(self, index_code, today=None):
+        """
+        Fetch the constituents of ``index_code``, stored as a new snapshot effective
+        ``today`` when they differ from the latest one.
+
+        :return: 'new', 'current' or 'changed'
+        """
+        today = str(today or date.today())
+        df = self.source(index_code)
+        snapshots = self.snapshots(index_code)
+        outcome = 'new'
+        if snapshots:
+            latest = self.read(index_code, snapshots[-1])
+            outcome = 'current' if set(latest['symbol']) == set(df['symbol'].astype(str)) else 'changed'
+        if outcome != 'current':
+            self.write(index_code, today, df)
+        meta = self.meta(index_code)
+        meta['checked'] = time.time()
+        self.write_meta(index_code, meta)
+        return outcome
+
+    def members(self, index_code, as_of=None):
+        """
+        Constituents of ``index_code`` as of ``as_of``, the latest ones without, as a dict
+        of symbol to name. The snapshots are refreshed first when older than ``ttl``
+        days, and the stored ones are served when the source fails.
+
+        The membership as of a date is the snapshot effective then. Before the first
+        snapshot, it is the first one without the members included after the date, which
+        still misses the members removed from the index in between.
+        """
+        if self.source is not None and self.stale(index_code):
+            try:
+                print('%s constituents refresh %s' % (index_code, self.refresh(index_code)))
+            except Exception as exc:
+                if not self.snapshots(index_code):
+                    raise
+                print('%s constituents refresh generated an exception, using the stored ones: %s' % (index_code, exc))
+        snapshots = self.snapshots(index_code)
+        if not snapshots:
+            raise ValueError('no constituents of index %s under %s' % (index_code, self.root))
+        if as_of is None:
+            return self.frame_members(self.read(index_code, snapshots[-1]))
+        as_of = str(pd.Timestamp(as_of).date())
+        effective = [snapshot for snapshot in snapshots if snapshot <= as_of]
+        if effective:
+            return self.frame_members(self.read(index_code, effective[-1]))
+        df = self.read(index_code, snapshots[0])
+        included = pd.to_datetime(df['included'], errors='coerce')
+        return self.frame_members(df[~(included > pd.Timestamp(as_of))])
+
+    @staticmethod
+    def frame_members(df):
+        return dict(zip(df['symbol'], df['name']))
+
+
+def code(symbol):
+    # YAML reads an unquoted code as a number, an octal one when zero-padded (000300 is 192)
+    if isinstance(symbol, int):
+        raise ValueError('UNIVERSE code %s is a number, quote the codes in config.yaml, e.g. \'000300\'' % symbol)
+    return str(symbol)
+
+
+def universe(config, as_of=None):
+    """
+    The symbols to backtest as a dict of symbol to name, by ``UNIVERSE``: the constituents
+    of an index code as of ``as_of`` (``UNIVERSE_AS_OF`` by default) from the snapshots
+    under ``DATA_DIR/universe``, or a list of symbols, or a mapping of symbol to name.
+    """
+    symbols = config.get('UNIVERSE', '000300')
+    if isinstance(symbols, dict):
+        return {code(symbol): str(name) for symbol, name in symbols.items()}
+    if isinstance(symbols, (list, tuple)):
+        return {code(symbol): code(symbol) for symbol in symbols}
+    source_dir = config.get('UNIVERSE_SOURCE_DIR')
+    source = CsvUniverseSource(source_dir) if source_dir else fetch_index_cons
+    store = UniverseStore(os.path.join(config.get('DATA_DIR'), 'universe'), source, config.get('UNIVERSE_TTL_DAYS', 7))
+    return store.members(code(symbols), as_of or config.get('UNIVERSE_AS_OF'))
@@ -0,0 +1,201 @@
+import math
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import backtrader as bt
+
+from backtesting.feeds.arraydata import ArrayData, LINES
+from backtesting.indicators.zigzag import ZigZag, zigzag_lines
+
+
+class IndicatorCache:
+    """
+    Size-bounded LRU cache of indicator lines computed over whole data feeds.
+
+    Entries are keyed by (symbol, data fingerprint, indicator class, params) so
+    parameter sets and strategies running on the same data in a process share
+    one computation. Cached arrays are read-only.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        while self.entries and self.nbytes > self.max_bytes:
+            key, lines = self.entries.popitem(last=False)
+            self.nbytes -= sum(line.nbytes for line in lines)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def get(self, key, compute):
+        lines = self.entries.get(key)
+        if lines is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return lines
+        self.misses += 1
+        lines = tuple(compute())
+        for line in lines:
+            line.flags.writeable = False
+        nbytes = sum(line.nbytes for line in lines)
+        if nbytes <= self.max_bytes:
+            self.entries[key] = lines
+            self.nbytes += nbytes
+            self.evict()
+        return lines
+
+
+indicator_cache = IndicatorCache()
+
+
+def fingerprint(data):
+    """
+    Content hash of a preloaded data feed, memoized on the feed.
+    """
+    buflen = data.buflen()
+    cached = getattr(data, '_fingerprint', None)
+    if cached is not None and cached[0] == buflen:
+        return cached[1]
+    digest = hashlib.blake2b(digest_size=16)
+    for line in (data.datetime, data.open, data.high, data.low, data.close, data.volume):
+        digest.update(memoryview(line.array))
+    data._fingerprint = (buflen, digest.hexdigest())
+    return data._fingerprint[1]
+
+
+def line_values(line):
+    return np.array(line.array, dtype=np.float64)
+
+
+def source_columns(data):
+    """
+    Columns the indicators of ``data`` are computed over, their content hash and
+    the index in them of the first bar ``data`` delivers.
+
+    An ``ArrayData`` delivering a window of its columns (``fromdate``/``todate``)
+    gives its whole columns, so the feeds of several windows of the same bars share
+    one computation. Other feeds give their lines. Memoized on the feed.
+    """
+    cached = getattr(data, '_source_columns', None)
+    if cached is not None and cached[0] == data.buflen():
+        return cached[1]
+    columns = getattr(data, 'columns', None)
+    if isinstance(data, ArrayData) and columns is not None:
+        digest = hashlib.blake2b(digest_size=16)
+        for name in LINES[:6]:
+            if name in columns:
+                digest.update(memoryview(columns[name]))
+        offset = int(np.searchsorted(columns['datetime'], data.fromdate, side='left'))
+        source = (columns, digest.hexdigest(), offset)
+    else:
+        source = ({name: line_values(getattr(data, name)) for name in LINES[:6]}, fingerprint(data), 0)
+    data._source_columns = (data.buflen(), source)
+    return source
+
+
+class CachedIndicator(bt.Indicator):
+    """
+    Base of the indicators served from ``indicator_cache``: the lines of ``source``
+    are computed once per data by ``compute`` over the ``source_columns`` and copied
+    into the lines. The data must be a preloaded feed.
+    """
+
+    source = None
+
+    def __init__(self):
+        self.cached_lines = None
+
+    @classmethod
+    def compute(cls, columns, **params):
+        """
+        :param columns: dict of line name to a float64 array
+        """
+        raise NotImplementedError
+
+    def cached(self):
+        if self.cached_lines is None:
+            params = tuple(self.p._getkwargs().items())
+            columns, digest, offset = source_columns(self.data)
+            key = (self.data._name, digest, self.source, params)
+            lines = indicator_cache.get(key, lambda: self.compute(columns, **dict(params)))
+            self.cached_lines = tuple(line[offset:] for line in lines)
+        return self.cached_lines
+
+    def next(self):
+        i = len(self) - 1
+        for line, values in enumerate(self.cached()):
+            self.lines[line][0] = values[i]
+
+    def once(self, start, end):
+        for line, values in enumerate(self.cached()):
+            np.frombuffer(self.lines[line].array, dtype=np.float64)[start:end] = values[start:end]
+
+
+class CachedSMA(CachedIndicator):
+    """
+    ``bt.ind.SMA`` over the close of a data feed, summed with ``math.fsum`` as backtrader does.
+    """
+
+    source = bt.ind.SMA
+    alias = ('CachedMovingAverageSimple',)
+    lines = ('sma',)
+    params = (('period', 30),)
+    plotinfo = dict(subplot=False)
+
+    def __init__(self):
+        super(CachedSMA, self).__init__()
+        self.addminperiod(self.p.period)
+
+    @classmethod
+    def compute(cls, columns, period):
+        close = columns['close'].tolist()
+        sma = np.full(len(close), np.nan)
+        sma[period - 1:] = [math.fsum(close[i - period + 1:i + 1]) / period for i in range(period - 1, len(close))]
+        return [sma]
+
+
+class CachedZigZag(CachedIndicator):
+    """
+    ``ZigZag`` computed in batch over a data feed.
+    """
+
+    source = ZigZag
+    lines = ZigZag.lines.getlinealiases()
+    params = (
+        ('dev_threshold', 5),  # Deviation (%)
+        ('depth', 10),
+    )
+    plotinfo = dict(ZigZag.plotinfo._getitems())
+    plotlines = dict(ZigZag.plotlines._getitems())
+
+    @classmethod
+    def compute(cls, columns, dev_threshold, depth):
+        lines = zigzag_lines(columns['high'], columns['low'], dev_threshold, depth)
+        return [lines[name] for name in cls.lines.getlinealiases()]
+
+
+CACHED_INDICATORS = {
+    bt.ind.SMA: CachedSMA,
+    ZigZag: CachedZigZag,
+}
+
+
+def indicator(indicator_cls, **params):
+    """
+    Create ``indicator_cls`` on the data of the calling strategy, served from the
+    indicator cache when it has a cached counterpart and the cache is enabled.
+    """
+    if indicator_cache.max_bytes > 0 and indicator_cls in CACHED_INDICATORS:
+        return CACHED_INDICATORS[indicator_cls](**params)
+    return indicator_cls(**params)
@@ -1,39 +1,24 @@
 import math
 from collections import deque
-from datetime import date
+import numpy as np
 import backtrader as bt
 
 
-class ZigZag(bt.Indicator):
+class ZigZagPivots:
     """
-    The Zig Zag indicator is used to describe the peaks and troughs.
-    Peaks and troughs are patterns that are developed by the price action experienced by all securities.
-    The easiest way to determine whether or not a trendline has been broken is to witness the breakdown and then replacement of either rising or falling peaks and troughs.
-    The Zig Zag indicator is used to help identify price trends and changes in price trends.
-    """
-
-    lines = ('zigzag', 'previous_peak', 'peak', 'previous_trough', 'trough')
-
-    plotinfo = dict(subplot=False, plotlinelabels=True, plotlinevalues=True, plotvaluetags=True, )
-
-    plotlines = dict(
-        zigzag=dict(_name='zigzag', color='blue', ls='-', _skipnan=True),
-        previous_peak=dict(_plotskip=True),
-        peak=dict(_plotskip=True),
-        previous_trough=dict(_plotskip=True),
-        trough=dict(_plotskip=False, color='green', ls='--', ),
-    )
+    Pivot state of the Zig Zag indicator, independent from backtrader lines.
 
-    params = (
-        ('dev_threshold', 5),  # Deviation (%)
-        ('depth', 10),
-    )
+    Bars are addressed by absolute index. The pivot of step ``bar_index`` is the
+    bar ``bar_index + length`` in the middle of the window
+    ``[bar_index, bar_index + 2 * length]``, so pivots are known ``length`` bars
+    before the line reaches them. Zig zag points are handed to ``set_zigzag``.
+    """
 
-    def __init__(self):
-        super(ZigZag, self).__init__()
-        self.dev_threshold = self.params.dev_threshold
-        self.depth = self.params.depth
-        self.bar_index = 0
+    def __init__(self, dev_threshold, depth, set_zigzag):
+        self.dev_threshold = dev_threshold
+        self.depth = depth
+        self.length = math.floor(depth / 2)
+        self.set_zigzag = set_zigzag
         # last pivot index
         self.index_last = 0
         # last pivot price
@@ -45,38 +30,29 @@ class ZigZag(bt.Indicator):
         self.peak_deque = deque([init_pair, init_pair, init_pair], maxlen=3)
         self.trough_deque = deque([init_pair, init_pair, init_pair], maxlen=3)
 
-    def pivots(self, length, is_high):
-        try:
-            src = self.data.high if is_high else self.data.low
-            price = src[length] if src[length] else 0.0
-            if length == 0:
-                return length, price
-            else:
-                is_found = True
-                for i in range(abs(length)):
-                    if is_high and src[i] > price:
-                        is_found = False
-                    if not is_high and src[i] < price:
-                        is_found = False
-                for i in range(length + 1, 2 * length + 1):
-                    if is_high and src[i] >= price:
-                        is_found = False
-                    if not is_high and src[i] <= price:
-                        is_found = False
-                if is_found and length * 2 <= self.bar_index:
-                    return length, price
-                else:
-                    return None, None
-        except Exception as e:
-            # TODO
-            print('The last data access out of range')
-            return None, None
+    def candidates(self, src, start, end, is_high):
+        """
+        Steps in ``[start, end)`` whose window middle bar is a pivot of ``src``: the
+        last highest high (or lowest low) of the window. Steps whose window runs
+        past the end of ``src`` or starts before ``2 * length`` have none.
+        """
+        found = np.zeros(end - start, dtype=bool)
+        length = self.length
+        first = max(start, 2 * length)
+        last = min(end, len(src) - 2 * length)
+        if not length or first >= last:
+            return found
+        windows = np.lib.stride_tricks.sliding_window_view(src[first:last + 2 * length], 2 * length + 1)
+        # argmax of the reversed window finds the last extreme, allowing ties on its left only
+        pick = np.argmax(windows[:, ::-1], axis=1) if is_high else np.argmin(windows[:, ::-1], axis=1)
+        found[first - start:last - start] = pick == length
+        return found
 
     def pivot_found(self, dev, is_high, index, price):
         """
         :param dev:
         :param is_high:
-        :param index:
+        :param index: absolute bar index of the pivot
         :param price:
         :return: A pair of bool
             1. Bool: The last pivot is is high or low
@@ -88,28 +64,27 @@ class ZigZag(bt.Indicator):
             same_direction = price > self.price_last if self.is_high_last else price < self.price_last
             if same_direction:
                 # remove previous pivot and set new pivot for higher high or lower low
-                bars_arg = self.index_last - self.bar_index
-                self.lines.zigzag[bars_arg] = self.nan
-                self.lines.zigzag[index] = price
+                self.set_zigzag(self.index_last, self.nan)
+                self.set_zigzag(index, price)
                 self.is_replaced_last = True
                 if is_high:
                     self.peak_deque.pop()
-                    self.peak_deque.append((self.bar_index + index, price))
+                    self.peak_deque.append((index, price))
                 else:
                     self.trough_deque.pop()
-                    self.trough_deque.append((self.bar_index + index, price))
+                    self.trough_deque.append((index, price))
                 return self.is_high_last, True, True
             else:
                 return None, False, False
         else:
             # reverse the direction (or create the very first line)
             if abs(dev) >= self.dev_threshold:
-                self.lines.zigzag[index] = price
+                self.set_zigzag(index, price)
                 self.is_replaced_last = False
                 if is_high:
-                    self.peak_deque.append((self.bar_index + index, price))
+                    self.peak_deque.append((index, price))
                 else:
-                    self.trough_deque.append((self.bar_index + index, price))
+                    self.trough_deque.append((index, price))
                 return is_high, True, False
             else:
                 return None, False, False
@@ -117,54 +92,193 @@ class ZigZag(bt.Indicator):
     def calc_dev(self, base_price, price):
         return 100 * (price - base_price) / base_price if base_price else 100
 
-    def next(self):
-        index_high, price_high = self.pivots(math.floor(self.depth / 2), True)
-        index_low, price_low = self.pivots(math.floor(self.depth / 2), False)
-
-        if index_high and index_low and index_high == index_low:
-            dev1 = self.calc_dev(self.price_last, price_high)
-            is_high2, is_new2, replaced = self.pivot_found(dev1, True, index_high, price_high)
-            if is_new2:
-                self.index_last = self.bar_index + index_high
+    def process(self, bar_index, price_high, price_low):
+        """
+        Apply the pivots found at step ``bar_index``; a price is None when there is no pivot.
+        """
+        index = bar_index + self.length
+        if price_high is not None:
+            dev = self.calc_dev(self.price_last, price_high)
+            is_high, is_new, replaced = self.pivot_found(dev, True, index, price_high)
+            if is_new:
+                self.index_last = index
                 self.price_last = price_high
-                self.is_high_last = is_high2
-            dev2 = self.calc_dev(self.price_last, price_low)
-            is_high1, is_new1, replaced = self.pivot_found(dev2, False, index_low, price_low)
-            if is_new1:
-                self.index_last = self.bar_index + index_low
+                self.is_high_last = is_high
+        if price_low is not None:
+            dev = self.calc_dev(self.price_last, price_low)
+            is_high, is_new, replaced = self.pivot_found(dev, False, index, price_low)
+            if is_new:
+                self.index_last = index
                 self.price_last = price_low
-                self.is_high_last = is_high1
+                self.is_high_last = is_high
+
+    def peak_trough(self, bar_index):
+        """
+        :return: previous peak, peak, previous trough and trough as seen at ``bar_index``,
+            ignoring pivots that lie ahead of it
+        """
+        if self.peak_deque[2][0] <= bar_index:
+            previous_peak, peak = self.peak_deque[1][1], self.peak_deque[2][1]
         else:
-            if index_high:
-                dev1 = self.calc_dev(self.price_last, price_high)
-                is_high, is_new, replaced = self.pivot_found(dev1, True, index_high, price_high)
-                if is_new:
-                    self.index_last = self.bar_index + index_high
-                    self.price_last = price_high
-                    self.is_high_last = is_high
-            else:
-                if index_low:
-                    dev2 = self.calc_dev(self.price_last, price_low)
-                    is_high, is_new, replaced = self.pivot_found(dev2, False, index_low, price_low)
-                    if is_new:
-                        self.index_last = self.bar_index + index_low
-                        self.price_last = price_low
-                        self.is_high_last = is_high
+            previous_peak, peak = self.peak_deque[0][1], self.peak_deque[1][1]
+        if self.trough_deque[2][0] <= bar_index:
+            previous_trough, trough = self.trough_deque[1][1], self.trough_deque[2][1]
+        else:
+            previous_trough, trough = self.trough_deque[0][1], self.trough_deque[1][1]
+        return previous_peak, peak, previous_trough, trough
+
+    def fill(self, start, end, previous_peak, peak, previous_trough, trough):
+        """
+        Write ``peak_trough`` for the steps in ``[start, end)`` while no pivot changes.
+        """
+        steps = np.arange(start, end)
+        for deq, previous_line, line in ((self.peak_deque, previous_peak, peak),
+                                         (self.trough_deque, previous_trough, trough)):
+            reached = steps >= deq[2][0]
+            previous_line[start:end] = np.where(reached, deq[1][1], deq[0][1])
+            line[start:end] = np.where(reached, deq[2][1], deq[1][1])
+
+    def batch(self, high, low, start, end, previous_peak, peak, previous_trough, trough):
+        """
+        Run the steps in ``[start, end)`` over whole ``high``/``low`` arrays. Only the
+        steps finding a pivot go through Python, the lines are filled in between.
+        """
+        high_found = self.candidates(high, start, end, True)
+        low_found = self.candidates(low, start, end, False)
+        segment = start
+        for step in (np.flatnonzero(high_found | low_found) + start).tolist():
+            self.fill(segment, step, previous_peak, peak, previous_trough, trough)
+            index = step + self.length
+            self.process(step,
+                         float(high[index]) if high_found[step - start] else None,
+                         float(low[index]) if low_found[step - start] else None)
+            segment = step
+        self.fill(segment, end, previous_peak, peak, previous_trough, trough)
+
+
+def zigzag_lines(high, low, dev_threshold=5, depth=10):
+    """
+    The ZigZag indicator lines over whole ``high``/``low`` arrays, as a dict of arrays.
+    """
+    n = len(high)
+    lines = {name: np.full(n, np.nan) for name in ZigZag.lines.getlinealiases()}
+
+    def set_zigzag(index, value):
+        lines['zigzag'][index] = value
+
+    pivots = ZigZagPivots(dev_threshold, depth, set_zigzag)
+    pivots.batch(np.asarray(high, dtype=np.float64), np.asarray(low, dtype=np.float64), 0, n,
+                 lines['previous_peak'], lines['peak'], lines['previous_trough'], lines['trough'])
+    return lines
+
+
+class ZigZag(bt.Indicator):
+    """
+    The Zig Zag indicator is used to describe the peaks and troughs.
+    Peaks and troughs are patterns that are developed by the price action experienced by all securities.
+    The easiest way to determine whether or not a trendline has been broken is to witness the breakdown and then replacement of either rising or falling peaks and troughs.
+    The Zig Zag indicator is used to help identify price trends and changes in price trends.
+
+    Pivots look ``depth`` bars ahead of the current bar, so the data must be preloaded.
+    ``next`` slides monotonic deques over the high/low windows (amortized O(1)
+    per bar) and ``once`` computes the whole run in batch.
+    """
+
+    lines = ('zigzag', 'previous_peak', 'peak', 'previous_trough', 'trough')
+
+    plotinfo = dict(subplot=False, plotlinelabels=True, plotlinevalues=True, plotvaluetags=True, )
+
+    plotlines = dict(
+        zigzag=dict(_name='zigzag', color='blue', ls='-', _skipnan=True),
+        previous_peak=dict(_plotskip=True),
+        peak=dict(_plotskip=True),
+        previous_trough=dict(_plotskip=True),
+        trough=dict(_plotskip=False, color='green', ls='--', ),
+    )
+
+    params = (
+        ('dev_threshold', 5),  # Deviation (%)
+        ('depth', 10),
+    )
+
+    def __init__(self):
+        super(ZigZag, self).__init__()
+        self.dev_threshold = self.params.dev_threshold
+        self.depth = self.params.depth
+        self.bar_index = 0
+        self.zigzag_pivots = ZigZagPivots(self.dev_threshold, self.depth, self.set_zigzag)
+        # (index, price) of the window bars that can still be its highest high / lowest low
+        self.high_window = deque()
+        self.low_window = deque()
+        self.window_end = 0
+        # zig zag points ahead of the current bar, written when next reaches them
+        self.pending = {}
+        self.zigzag_array = None
+
+    def set_zigzag(self, index, value):
+        if self.zigzag_array is not None:
+            self.zigzag_array[index] = value
+        elif index > self.bar_index:
+            self.pending[index] = value
+        else:
+            self.lines.zigzag[index - self.bar_index] = value
+
+    def slide(self, window, index, price, is_high):
+        while window and (window[-1][1] <= price if is_high else window[-1][1] >= price):
+            window.pop()
+        window.append((index, price))
+
+    def pivots(self):
+        """
+        Move the windows to ``[bar_index, bar_index + 2 * length]``.
+
+        :return: the high and low pivot prices of the window middle bar, None if it is not one
+        """
+        length = self.zigzag_pivots.length
+        if not length:
+            return None, None
+        buflen = self.data.buflen()
+        last = min(self.bar_index + 2 * length, buflen - 1)
+        while self.window_end <= last:
+            ago = self.window_end - self.bar_index
+            self.slide(self.high_window, self.window_end, self.data.high[ago], True)
+            self.slide(self.low_window, self.window_end, self.data.low[ago], False)
+            self.window_end += 1
+        for window in (self.high_window, self.low_window):
+            while window[0][0] < self.bar_index:
+                window.popleft()
+        if self.bar_index < 2 * length or self.bar_index + 2 * length >= buflen:
+            return None, None
+        middle = self.bar_index + length
+        price_high = self.high_window[0][1] if self.high_window[0][0] == middle else None
+        price_low = self.low_window[0][1] if self.low_window[0][0] == middle else None
+        return price_high, price_low
+
+    def next(self):
+        if self.bar_index in self.pending:
+            self.lines.zigzag[0] = self.pending.pop(self.bar_index)
+        price_high, price_low = self.pivots()
+        self.zigzag_pivots.process(self.bar_index, price_high, price_low)
         self.set_peak_trough()
         self.bar_index += 1
 
+    def once(self, start, end):
+        high = np.frombuffer(self.data.high.array, dtype=np.float64)
+        low = np.frombuffer(self.data.low.array, dtype=np.float64)
+        lines = [np.frombuffer(line.array, dtype=np.float64)
+                 for line in (self.lines.previous_peak, self.lines.peak,
+                              self.lines.previous_trough, self.lines.trough)]
+        self.zigzag_array = np.frombuffer(self.lines.zigzag.array, dtype=np.float64)
+        try:
+            self.zigzag_pivots.batch(high, low, start, end, *lines)
+        finally:
+            # release the buffers, backtrader resizes the line arrays
+            self.zigzag_array = None
+        self.bar_index = end
+
     def set_peak_trough(self):
-        index_high = self.peak_deque[2][0]
-        index_low = self.trough_deque[2][0]
-        if index_high <= self.bar_index:
-            self.lines.previous_peak[0] = self.peak_deque[1][1]
-            self.lines.peak[0] = self.peak_deque[2][1]
-        else:
-            self.lines.previous_peak[0] = self.peak_deque[0][1]
-            self.lines.peak[0] = self.peak_deque[1][1]
-        if index_low <= self.bar_index:
-            self.lines.previous_trough[0] = self.trough_deque[1][1]
-            self.lines.trough[0] = self.trough_deque[2][1]
-        else:
-            self.lines.previous_trough[0] = self.trough_deque[0][1]
-            self.lines.trough[0] = self.trough_deque[1][1]
+        previous_peak, peak, previous_trough, trough = self.zigzag_pivots.peak_trough(self.bar_index)
+        self.lines.previous_peak[0] = previous_peak
+        self.lines.peak[0] = peak
+        self.lines.previous_trough[0] = previous_trough
+        self.lines.trough[0] = trough
@@ -0,0 +1,68 @@
+import os
+import json
+from datetime import datetime
+
+
+def new_run_id():
+    # runs started in the same second, by the scripts of several processes, get ids of their own
+    # still sorting by start time
+    return '%s-%d' % (datetime.now().strftime('%Y%m%d-%H%M%S-%f'), os.getpid())
+
+
+class Journal:
+    """
+    Append-only journal of the completed units of a run, one JSON line per
+    unit with its metrics records. Every line is flushed to disk as soon as
+    the unit completes, so a crashed or interrupted run can be resumed from
+    it; a line cut short by a crash is ignored.
+    """
+
+    def __init__(self, directory, run_id):
+        self.run_id = run_id
+        self.path = os.path.join(directory, run_id + '.jsonl')
+        self.file = None
+
+    def entries(self):
+        """
+        :return: generator of (unit key, metrics records) of the units already journaled
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                yield entry['unit'], entry['records']
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        # drop a line cut short by a crash so the next entry starts on its own line
+        if self.file.tell() and not self.ends_with_newline():
+            self.file.write('\n')
+        return self
+
+    def ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def append(self, unit_key, records):
+        self.file.write(json.dumps({'unit': unit_key, 'records': records}, ensure_ascii=False, default=str) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
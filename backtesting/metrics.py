@@ -21,6 +21,8 @@ class DetailMetric:
         self.sqn = None
         self.sharpe_ratio = None
         self.sharpe_ratio_a = None
+        self.sortino_ratio = None
+        self.calmar_ratio = None
 
     def asdict(self):
         return {
@@ -44,6 +46,8 @@ class DetailMetric:
             'sqn': self.sqn,
             'sharpe_ratio': self.sharpe_ratio,
             'sharpe_ratio_a': self.sharpe_ratio_a,
+            'sortino_ratio': self.sortino_ratio,
+            'calmar_ratio': self.calmar_ratio,
         }
 
     def __repr__(self):
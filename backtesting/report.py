@@ -0,0 +1,94 @@
+import pandas as pd
+
+from backtesting.metrics import DetailMetric, SummaryMetric
+from backtesting.utils import csv_path, os_encoding
+
+DETAIL_COLUMNS = list(DetailMetric().asdict())
+SUMMARY_COLUMNS = list(SummaryMetric().asdict())
+
+
+class DetailWriter:
+    """
+    Detail report of a strategy written as the records arrive, so the rows
+    never pile up in memory. The file is opened on the first records.
+    """
+
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.file = None
+        self.rows = 0
+
+    def write(self, records):
+        if not records:
+            return
+        header = self.file is None
+        if header:
+            self.file = open(csv_path(self.directory, self.prefix), 'w', encoding=os_encoding(), newline='')
+        pd.DataFrame(records, columns=DETAIL_COLUMNS).to_csv(self.file, header=header, index=False)
+        self.file.flush()
+        self.rows += len(records)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Summary:
+    """
+    Summary of the detail records per (strategy, params), updated record by
+    record in memory proportional to the number of parameter sets:
+    sums of ``won_total``, ``total_closed`` and ``pnl_net_total``, means of
+    ``net_profit_percentage`` and ``sharpe_ratio_a`` and the max of
+    ``max_drawdown``, missing values skipped as pandas does.
+    """
+
+    def __init__(self, days):
+        self.days = days
+        # (strategy, params) -> [won, closed, pnl, profit sum, profit count, max drawdown, sharpe sum, sharpe count]
+        self.groups = {}
+
+    def add(self, records):
+        for record in records:
+            key = (record['strategy'], record['params'])
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = [0, 0, 0, 0.0, 0, None, 0.0, 0]
+            for i, field in enumerate(('won_total', 'total_closed', 'pnl_net_total')):
+                if record[field] is not None:
+                    group[i] += record[field]
+            if record['net_profit_percentage'] is not None:
+                group[3] += record['net_profit_percentage']
+                group[4] += 1
+            if record['max_drawdown'] is not None:
+                group[5] = record['max_drawdown'] if group[5] is None else max(group[5], record['max_drawdown'])
+            if record['sharpe_ratio_a'] is not None:
+                group[6] += record['sharpe_ratio_a']
+                group[7] += 1
+
+    def metrics(self, strategy=None):
+        """
+        :return: ``SummaryMetric`` of every group, of ``strategy`` only when given, sorted by strategy and params
+        """
+        metrics_list = []
+        for key in sorted(self.groups):
+            if strategy is not None and key[0] != strategy:
+                continue
+            won, closed, pnl, profit, profit_count, drawdown, sharpe, sharpe_count = self.groups[key]
+            metrics = SummaryMetric()
+            metrics.strategy, metrics.params = key
+            metrics.won_total = won
+            metrics.total_closed = closed
+            metrics.strike_rate = won / closed if closed else 0
+            metrics.pnl_net_total = pnl
+            metrics.net_profit_percentage = profit / profit_count if profit_count else None
+            metrics.annualized_return_percentage = metrics.net_profit_percentage / self.days * 365 \
+                if profit_count else None
+            metrics.max_drawdown = drawdown
+            metrics.sharpe_ratio_a = sharpe / sharpe_count if sharpe_count else None
+            metrics_list.append(metrics)
+        return metrics_list
+
+    def frame(self, strategy=None):
+        return pd.DataFrame([metrics.asdict() for metrics in self.metrics(strategy)], columns=SUMMARY_COLUMNS)
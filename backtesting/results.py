@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import inspect
+import importlib
+
+# config keys a backtest result depends on besides the bars, the strategy and its params
+CONFIG_KEYS = ('START_DATE', 'END_DATE', 'START_CASH', 'STAMP_DUTY', 'COMMISSION', 'BUY_COMMISSION_RATE',
+               'SELL_COMMISSION_RATE', 'MINIMUM_COMMISSION', 'CHEAT_ON_OPEN', 'ENGINE', 'METRICS',
+               'TRIM_BARS')
+# modules charging and sizing the orders of every strategy, their source is part of the key
+COST_MODULES = ('backtesting.costs', 'backtesting.comminfo', 'backtesting.sizer')
+# modules running the backtests, computing the indicators and the metrics, their source is part of the key too
+ENGINE_MODULES = ('backtesting.task', 'backtesting.batch', 'backtesting.vectorized', 'backtesting.analyzer',
+                  'backtesting.stats', 'backtesting.metrics', 'backtesting.indicators.cache',
+                  'backtesting.indicators.zigzag', 'backtesting.feeds.arraydata')
+
+
+def strategy_source(strategy_cls):
+    """
+    Source of the modules defining ``strategy_cls`` and its project base classes.
+    """
+    sources = []
+    for cls in strategy_cls.__mro__:
+        if cls.__module__.split('.')[0] == 'backtesting':
+            sources.append(inspect.getsource(sys.modules[cls.__module__]))
+    return '\n'.join(sources)
+
+
+def engine_source():
+    """
+    Source of the cost and engine modules every backtest goes through.
+    """
+    return '\n'.join(inspect.getsource(importlib.import_module(module)) for module in COST_MODULES + ENGINE_MODULES)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of backtest results, one pickle per
+    (bars, strategy source, params, config) key holding the ``DetailMetric``
+    record and the trade list of a parameter set.
+
+    Entries older than ``max_age`` days are dropped and the least recently
+    used ones go once the cache is over ``max_bytes``; ``evict`` runs in the
+    main process only, workers just read and write entries.
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, max_age=90):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sources = {}
+        self.engine = None
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + '.pkl')
+
+    def key(self, bars_fingerprint, strategy_cls, params, config):
+        if strategy_cls not in self.sources:
+            self.sources[strategy_cls] = hashlib.blake2b(strategy_source(strategy_cls).encode('utf-8'),
+                                                         digest_size=16).hexdigest()
+        if self.engine is None:
+            self.engine = hashlib.blake2b(engine_source().encode('utf-8'), digest_size=16).hexdigest()
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(bars_fingerprint.encode('utf-8'))
+        digest.update(self.engine.encode('utf-8'))
+        digest.update(strategy_cls.__name__.encode('utf-8'))
+        digest.update(self.sources[strategy_cls].encode('utf-8'))
+        digest.update(params.encode('utf-8'))
+        digest.update(repr([(k, config.get(k)) for k in CONFIG_KEYS]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        :return: (metrics record, trade list), None when missing
+        """
+        file_path = self.path(key)
+        try:
+            with open(file_path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # the modification time orders the entries for eviction
+        os.utime(file_path)
+        return entry
+
+    def put(self, key, record, trade_list):
+        file_path = self.path(key)
+        directory = os.path.dirname(file_path)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (file_path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((record, trade_list), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+    def evict(self):
+        if not os.path.exists(self.root):
+            return
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for file_name in files:
+                file_path = os.path.join(directory, file_name)
+                stat = os.stat(file_path)
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+        expired = time.time() - self.max_age * 24 * 3600
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, file_path in sorted(entries):
+            if mtime >= expired and total <= self.max_bytes:
+                break
+            os.remove(file_path)
+            total -= size
+
+
+def result_cache(config):
+    """
+    The result cache configured by ``RESULT_CACHE_*``, None when disabled.
+    """
+    size = config.get('RESULT_CACHE_SIZE', 1024)
+    if not size:
+        return None
+    root = config.get('RESULT_CACHE_DIR') or os.path.join(config.get('DATA_DIR'), 'results')
+    return ResultCache(root, size * 1024 * 1024, config.get('RESULT_CACHE_AGE', 90))
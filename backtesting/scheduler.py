@@ -0,0 +1,215 @@
+import os
+import time
+import itertools
+from collections import OrderedDict
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from backtesting.feeds.store import BarStore
+
+
+class WorkUnit:
+    """
+    One piece of a sweep on a symbol: ``jobs`` is a list of
+    (strategy class, params, chunk, chunks), where ``params`` is a
+    ``params_list()`` style dict covering a sub-product of the strategy grid.
+    """
+
+    def __init__(self, symbol, name, jobs, cost):
+        self.symbol = symbol
+        self.name = name
+        self.jobs = jobs
+        self.cost = cost
+
+    @property
+    def key(self):
+        """
+        Identifies the unit across runs with the same symbols, strategies and chunking.
+        """
+        return '%s %s' % (self.symbol, ', '.join(
+            '%s %d/%d' % (strategy_cls.__name__, chunk + 1, chunks) for strategy_cls, _, chunk, chunks in self.jobs))
+
+    def __repr__(self):
+        return self.key
+
+
+class BatchUnit:
+    """
+    Work units with the same jobs on different symbols, run together in one Cerebro
+    by ``BatchTask``. Each keeps its key for the trade log.
+    """
+
+    def __init__(self, units):
+        self.units = units
+        self.jobs = units[0].jobs
+        self.cost = sum(unit.cost for unit in units)
+
+    @property
+    def symbol(self):
+        return ' '.join(unit.symbol for unit in self.units)
+
+    @property
+    def key(self):
+        return ' | '.join(unit.key for unit in self.units)
+
+    def __repr__(self):
+        return self.key
+
+
+def iterize(values):
+    if isinstance(values, str) or not hasattr(values, '__iter__'):
+        return [values]
+    return list(values)
+
+
+def grid_size(params, optimization):
+    if not optimization:
+        return 1
+    size = 1
+    for values in params.values():
+        size *= len(iterize(values))
+    return size
+
+
+def split_params(params, optimization, chunk_size):
+    """
+    Split a ``params_list()`` grid into sub-grids of about ``chunk_size``
+    parameter sets, slicing the parameter with the most values. Every chunk
+    is still a product, so ``cerebro.optstrategy`` takes it as is.
+    """
+    size = grid_size(params, optimization)
+    if not optimization or not chunk_size or size <= chunk_size:
+        return [params]
+    key = max(params, key=lambda k: len(iterize(params[k])))
+    values = iterize(params[key])
+    step = max(1, chunk_size // (size // len(values)))
+    return [dict(params, **{key: values[i:i + step]}) for i in range(0, len(values), step)]
+
+
+def sub_grids(combos):
+    """
+    Group parameter dicts into ``params_list()`` style product grids covering
+    exactly them, varying the parameter that needs the fewest grids.
+    """
+    if not combos:
+        return []
+    keys = list(combos[0])
+    best = None
+    for key in keys:
+        groups = OrderedDict()
+        for combo in combos:
+            rest = tuple((k, combo[k]) for k in keys if k != key)
+            groups.setdefault(rest, []).append(combo[key])
+        if best is None or len(groups) < len(best[1]):
+            best = key, groups
+    key, groups = best
+    return [dict([(k, [v]) for k, v in rest], **{key: values}) for rest, values in groups.items()]
+
+
+def symbol_bars(data_dir, symbols):
+    """
+    Bar count of every symbol already in the bar store, None for the others.
+    """
+    store = BarStore(os.path.join(data_dir, 'store'))
+    return {symbol: store.meta(symbol)['bars'] if store.has(symbol) else None for symbol in symbols}
+
+
+def work_units(symbols, bars, strategies, chunk_size):
+    """
+    Split the sweep of ``strategies`` over ``symbols`` into units of about
+    ``chunk_size`` parameter sets, 0 for one unit per symbol. The chunks of
+    all strategies on a symbol are packed together so a unit loads the
+    symbol once for all of them. Units are costed as bars x parameter sets,
+    symbols not stored yet like the longest known history.
+    """
+    known = [b for b in bars.values() if b]
+    default_bars = max(known) if known else 1
+    jobs = []
+    for strategy_cls in strategies:
+        optimization = strategy_cls.optimize()
+        chunks = split_params(strategy_cls.params_list(), optimization, chunk_size)
+        for i, chunk in enumerate(chunks):
+            jobs.append(((strategy_cls, chunk, i, len(chunks)), grid_size(chunk, optimization)))
+
+    packs = []
+    for job, size in jobs:
+        if packs and (not chunk_size or packs[-1][1] + size <= chunk_size):
+            packs[-1][0].append(job)
+            packs[-1][1] += size
+        else:
+            packs.append([[job], size])
+
+    units = []
+    for symbol, name in symbols.items():
+        count = bars.get(symbol) or default_bars
+        for pack, size in packs:
+            units.append(WorkUnit(symbol, name, list(pack), count * size))
+    return units
+
+
+def batch_units(units, batch_size):
+    """
+    Group the units with the same jobs into ``BatchUnit`` of up to ``batch_size``
+    symbols, in the order of ``units``; 0 or 1 keeps one unit per symbol.
+    """
+    if not batch_size or batch_size <= 1:
+        return units
+    groups = OrderedDict()
+    for unit in units:
+        jobs = tuple((strategy_cls.__name__, chunk, chunks) for strategy_cls, _, chunk, chunks in unit.jobs)
+        groups.setdefault(jobs, []).append(unit)
+    batches = []
+    for group in groups.values():
+        for i in range(0, len(group), batch_size):
+            batches.append(BatchUnit(group[i:i + batch_size]))
+    return batches
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return result, time.time() - start
+
+
+class Scheduler:
+    """
+    Runs work units on an executor, longest estimated units first, keeping at
+    most ``window`` units submitted at a time so pending work stays bounded
+    however many symbols there are.
+    """
+
+    def __init__(self, executor, window):
+        self.executor = executor
+        self.window = max(1, window)
+
+    def run(self, fn, units, *args):
+        """
+        Call ``fn(*args, unit)`` for every unit.
+
+        :return: generator of (unit, result, exception, elapsed seconds) in completion order
+        """
+        units = sorted(units, key=lambda u: u.cost, reverse=True)
+        total = len(units)
+        total_cost = sum(u.cost for u in units) or 1
+        done_cost = 0
+        pending = {}
+        queue = iter(units)
+        done = 0
+        while True:
+            for unit in itertools.islice(queue, self.window - len(pending)):
+                pending[self.executor.submit(timed, fn, *(args + (unit,)))] = unit
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                unit = pending.pop(future)
+                done += 1
+                done_cost += unit.cost
+                try:
+                    result, elapsed = future.result()
+                except Exception as exc:
+                    print('[%d/%d] %s generated an exception: %s' % (done, total, unit, exc))
+                    yield unit, None, exc, None
+                else:
+                    print('[%d/%d %.0f%%] %s have completed in %.1fs' % (
+                        done, total, 100.0 * done_cost / total_cost, unit, elapsed))
+                    yield unit, result, None, elapsed
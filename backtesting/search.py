@@ -0,0 +1,184 @@
+import math
+import itertools
+import numbers
+
+import numpy as np
+
+from backtesting.scheduler import iterize
+
+
+def search_space(params):
+    """
+    Values of every parameter of a ``params_list()`` style dict, a single value
+    being a fixed parameter.
+    """
+    return {key: iterize(values) for key, values in params.items()}
+
+
+def space_size(space):
+    size = 1
+    for values in space.values():
+        size *= len(values)
+    return size
+
+
+def candidate_key(candidate):
+    return tuple(sorted(candidate.items(), key=lambda item: item[0]))
+
+
+def sample(space, count, rng, exclude=()):
+    """
+    Up to ``count`` distinct parameter dicts drawn uniformly from ``space``, none
+    of them in ``exclude`` (candidate keys). Spaces too large to enumerate are
+    sampled without building the grid.
+    """
+    seen = set(exclude)
+    keys = list(space)
+    if space_size(space) <= max(4 * count, 10000):
+        grid = [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+        grid = [candidate for candidate in grid if candidate_key(candidate) not in seen]
+        order = rng.permutation(len(grid))[:count]
+        return [grid[i] for i in order]
+    candidates = []
+    attempts = 0
+    while len(candidates) < count and attempts < 100 * count:
+        attempts += 1
+        candidate = {key: space[key][rng.integers(len(space[key]))] for key in keys}
+        key = candidate_key(candidate)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+    return candidates
+
+
+def top(candidates, scores, count):
+    """
+    The ``count`` candidates with the highest scores, a None score ranking last.
+    """
+    order = sorted(range(len(candidates)), key=lambda i: -math.inf if scores[i] is None else scores[i], reverse=True)
+    return [candidates[i] for i in order[:count]]
+
+
+def random_search(space, evaluate, samples, rng):
+    """
+    Evaluate ``samples`` random parameter dicts on the full budget.
+
+    :param evaluate: callable(candidates, budget) returning a score per candidate,
+        higher is better and None when there is none
+    """
+    candidates = sample(space, samples, rng)
+    evaluate(candidates, 1.0)
+
+
+def successive_halving(candidates, evaluate, min_budget, eta):
+    """
+    Evaluate ``candidates`` on ``min_budget`` and go on with the best ``1 / eta``
+    of them on ``eta`` times the budget, until the full budget.
+    """
+    budget = min_budget
+    while candidates:
+        scores = evaluate(candidates, budget)
+        if budget >= 1.0 or len(candidates) == 1:
+            return top(candidates, scores, 1)
+        candidates = top(candidates, scores, max(1, len(candidates) // eta))
+        # rounding must not leave a rung just short of the full budget
+        budget = 1.0 if budget * eta > 1.0 - 1e-9 else budget * eta
+    return []
+
+
+def rungs(min_budget, eta):
+    """
+    Times the budget can grow ``eta``-fold from ``min_budget`` up to the full budget.
+    """
+    return int(math.floor(math.log(1.0 / min_budget, eta) + 1e-9))
+
+
+def hyperband(space, evaluate, samples, min_budget, eta, rng):
+    """
+    Successive halving brackets from the most aggressive, ``samples`` candidates
+    on ``min_budget``, to the most conservative, few candidates on the full budget.
+    """
+    brackets = rungs(min_budget, eta)
+    for s in range(brackets, -1, -1):
+        count = int(math.ceil(samples * eta ** (s - brackets) * (brackets + 1) / (s + 1)))
+        successive_halving(sample(space, count, rng), evaluate, float(eta) ** -s, eta)
+
+
+def parzen(space, key, observations):
+    """
+    Smoothed probability of every value of parameter ``key`` given the observed
+    values: neighbours share the weight of numeric values, categories only count
+    themselves. A uniform prior keeps every value possible.
+    """
+    values = space[key]
+    k = len(values)
+    weights = np.ones(k)
+    indices = [values.index(observation[key]) for observation in observations]
+    if all(isinstance(v, numbers.Number) and not isinstance(v, bool) for v in values) and k > 2:
+        bandwidth = max(1.0, k / 10.0)
+        positions = np.arange(k)
+        for i in indices:
+            weights += np.exp(-0.5 * ((positions - i) / bandwidth) ** 2)
+    else:
+        for i in indices:
+            weights[i] += 1
+    return weights / weights.sum()
+
+
+def tpe(space, evaluate, samples, rng, initial=None, batch=4, gamma=0.25, draws=32, budget=1.0):
+    """
+    Tree-structured Parzen estimator over a discrete space: after ``initial`` random
+    candidates, split the evaluated ones into the best ``gamma`` and the rest, draw
+    ``draws`` candidates from the distribution of the best and evaluate the ``batch``
+    with the highest ratio of the two densities, until ``samples`` are evaluated.
+    """
+    initial = initial or max(batch, samples // 4)
+    evaluated = []
+    candidates = sample(space, min(initial, samples), rng)
+    while candidates:
+        scores = evaluate(candidates, budget)
+        evaluated.extend(zip(candidates, scores))
+        left = samples - len(evaluated)
+        if left <= 0:
+            break
+        ranked = top([c for c, _ in evaluated], [s for _, s in evaluated], len(evaluated))
+        split = max(1, int(math.ceil(gamma * len(ranked))))
+        good, bad = ranked[:split], ranked[split:]
+        good_p = {key: parzen(space, key, good) for key in space}
+        bad_p = {key: parzen(space, key, bad) for key in space}
+        seen = set(candidate_key(c) for c, _ in evaluated)
+        proposals = {}
+        for _ in range(draws):
+            indices = {key: rng.choice(len(space[key]), p=good_p[key]) for key in space}
+            candidate = {key: space[key][i] for key, i in indices.items()}
+            key = candidate_key(candidate)
+            if key in seen or key in proposals:
+                continue
+            ratio = sum(math.log(good_p[k][i]) - math.log(bad_p[k][i]) for k, i in indices.items())
+            proposals[key] = (ratio, candidate)
+        candidates = [c for _, c in sorted(proposals.values(), key=lambda p: p[0], reverse=True)[:min(batch, left)]]
+        if not candidates:
+            # the best region is exhausted, explore at random
+            candidates = sample(space, min(batch, left), rng, seen)
+
+
+METHODS = ('random', 'halving', 'hyperband', 'tpe')
+
+
+def search(method, space, evaluate, samples=64, min_budget=0.1, eta=3, seed=None):
+    """
+    Run the parameter search ``method`` over ``space``, every evaluation going
+    through ``evaluate(candidates, budget)``, which records them.
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        random_search(space, evaluate, samples, rng)
+    elif method == 'halving':
+        # the first rung lands the last one on the full budget
+        successive_halving(sample(space, samples, rng), evaluate, float(eta) ** -rungs(min_budget, eta), eta)
+    elif method == 'hyperband':
+        hyperband(space, evaluate, samples, min_budget, eta, rng)
+    elif method == 'tpe':
+        tpe(space, evaluate, samples, rng)
+    else:
+        raise ValueError('unknown search method %s, expected one of %s' % (method, ', '.join(METHODS)))
@@ -14,6 +14,9 @@ class AllInSizerRoundLot(bt.Sizer):
         position = self.broker.getposition(data)
         if not position:
             price = data.open[0] if self.cheat_on_open else data.open[1]
+            costs = getattr(comminfo, 'costs', None)
+            if costs is not None:
+                return costs.max_size(cash, price, self.params.a_round_lot)
             size = int(cash // price // self.params.a_round_lot * self.params.a_round_lot)
             while size > 0:
                 order_value = size * price
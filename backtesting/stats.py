@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+
+def drawdown(values):
+    """
+    Max drawdown of broker value curves, one column per curve.
+
+    Mirrors ``bt.analyzers.DrawDown``: the drawdown is measured against the
+    running peak value and expressed in % of that peak.
+
+    :return: (max drawdown in %, max moneydown) arrays, one value per column
+    """
+    peak = np.maximum.accumulate(values, axis=0)
+    moneydown = peak - values
+    return (100.0 * moneydown / peak).max(axis=0), moneydown.max(axis=0)
+
+
+def metric_window(dates, bar_dates, start_date, end_date):
+    """
+    Rows of a broker value curve the return metrics are computed on: from ``start_date``
+    to the bar after the first one past ``end_date``, when a position still open at the
+    end is closed at the latest. The flat values of the warm-up before and of the bars
+    after are left out, so how many of them were loaded changes no metric.
+
+    :param dates: date of every curve row, ``datetime64[D]``
+    :param bar_dates: dates of the bars of the run, ``datetime64[D]``, ascending
+    :return: boolean mask of the rows
+    """
+    if not len(bar_dates):
+        return np.zeros(len(dates), dtype=bool)
+    after = int(np.searchsorted(bar_dates, np.datetime64(end_date, 'D'), side='right'))
+    stop = bar_dates[min(after + 1, len(bar_dates) - 1)]
+    return (dates >= np.datetime64(start_date, 'D')) & (dates <= stop)
+
+
+def period_returns(values, keys, start_value):
+    """
+    Returns of broker value curves over the periods given by ``keys``, in the
+    way ``bt.analyzers.TimeReturn`` builds them: every period is measured from
+    the last value of the previous period (``start_value`` for the first one).
+
+    :param values: (bars x curves) broker values
+    :param keys: one period key per bar, non decreasing
+    :return: (periods x curves) returns
+    """
+    last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True))
+    ends = values[last]
+    starts = np.vstack([np.full((1, values.shape[1]), float(start_value)), ends[:-1]])
+    return ends / starts - 1.0
+
+
+def sharpe_ratio(returns, riskfreerate=0.0, factor=None, annualize=False):
+    """
+    Sharpe ratio of every column of ``returns``, following ``bt.analyzers.SharpeRatio``
+    with ``convertrate`` on and population standard deviation.
+
+    A column without variance has no ratio and yields NaN.
+    """
+    rate = riskfreerate
+    if factor is not None:
+        rate = pow(1.0 + rate, 1.0 / factor) - 1.0
+    ret_free = returns - rate
+    avg = ret_free.mean(axis=0)
+    std = ret_free.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(std > 0.0, avg / std, np.nan)
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    return ratio
+
+
+def sqn(pnl):
+    """
+    System Quality Number of a sequence of closed trade net profits, as ``bt.analyzers.SQN``.
+    """
+    if len(pnl) <= 1:
+        return 0
+    pnl = np.asarray(pnl, dtype=np.float64)
+    std = pnl.std()
+    if not std:
+        return None
+    return math.sqrt(len(pnl)) * pnl.mean() / std
+
+
+def longest_streak(flags):
+    """
+    Length of the longest run of True in ``flags``.
+    """
+    flags = np.asarray(flags, dtype=bool)
+    if not flags.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+def trade_stats(pnlcomm):
+    """
+    The ``bt.analyzers.TradeAnalyzer`` figures used by ``DetailMetric`` for a
+    sequence of closed trade net profits. Trades with ``pnlcomm >= 0`` are won.
+
+    Keys are missing altogether when no trade was closed, as in TradeAnalyzer.
+    """
+    if not len(pnlcomm):
+        return {}
+    pnlcomm = np.asarray(pnlcomm, dtype=np.float64)
+    won = pnlcomm >= 0.0
+    total = float(sum(pnlcomm.tolist()))
+    return {
+        'total_closed': len(pnlcomm),
+        'won_total': int(won.sum()),
+        'lost_total': int((~won).sum()),
+        'streak_won_longest': longest_streak(won),
+        'streak_lost_longest': longest_streak(~won),
+        'pnl_net_total': total,
+        'pnl_net_average': total / len(pnlcomm),
+    }
+
+
+def sortino_ratio(returns, factor=None, annualize=False):
+    """
+    Sortino ratio of every column of ``returns`` with a zero target: the mean
+    return over the downside deviation. A column without losses yields NaN.
+    """
+    downside = np.sqrt((np.minimum(returns, 0.0) ** 2).mean(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(downside > 0.0, returns.mean(axis=0) / downside, np.nan)
+    if factor is not None and annualize:
+        ratio = math.sqrt(factor) * ratio
+    return ratio
+
+
+def annualized_return(values, days, start_value):
+    """
+    Compound annual growth of broker value curves from ``start_value`` over ``days`` calendar days.
+    """
+    if days <= 0:
+        return np.full(values.shape[1], np.nan)
+    return (values[-1] / float(start_value)) ** (365.0 / days) - 1.0
+
+
+def calmar_ratio(values, days, start_value):
+    """
+    Annualized return over max drawdown (as a fraction) of broker value curves,
+    NaN for a curve without drawdown.
+    """
+    max_drawdown, _ = drawdown(values)
+    cagr = annualized_return(values, days, start_value)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(max_drawdown > 0.0, cagr / (max_drawdown / 100.0), np.nan)
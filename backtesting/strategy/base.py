@@ -1,14 +1,57 @@
+import numpy as np
+import pandas as pd
 import backtrader as bt
-from backtesting.utils import read_config
+from backtesting.utils import LazyConfig
+from backtesting.eventlog import event_log, DEBUG, INFO, WARNING
 
 
-class BaseStrategy(bt.Strategy):
-    config = read_config()
+class MetaBaseStrategy(type(bt.Strategy)):
+    """
+    Lets ``BatchTask`` run one strategy per symbol in a Cerebro holding the data of
+    many: the ``batch`` keyword, the index of a data in Cerebro, binds the strategy to
+    that data alone and to an account of its own on the ``BatchBroker``.
+    """
+
+    def donew(cls, *args, **kwargs):
+        batch = kwargs.pop('batch', None)
+        if batch is not None:
+            datas = [arg for arg in args if isinstance(arg, bt.AbstractDataBase)]
+            args = [datas[batch]] + [arg for arg in args if not isinstance(arg, bt.AbstractDataBase)]
+        _obj, args, kwargs = super(MetaBaseStrategy, cls).donew(*args, **kwargs)
+        _obj.batch = batch
+        return _obj, args, kwargs
+
+    def dopreinit(cls, _obj, *args, **kwargs):
+        _obj, args, kwargs = super(MetaBaseStrategy, cls).dopreinit(_obj, *args, **kwargs)
+        if _obj.batch is not None:
+            _obj.broker = _obj.env.broker.account(_obj)
+        return _obj, args, kwargs
+
+
+class BaseStrategy(bt.Strategy, metaclass=MetaBaseStrategy):
+    config = LazyConfig()
 
     def __init__(self):
         self.cheating = self.cerebro.p.cheat_on_open
-        self.start_date = BaseStrategy.config.get('START_DATE')
-        self.end_date = BaseStrategy.config.get('END_DATE')
+        # the window of the task running the strategy, of the config file without one
+        self.start_date, self.end_date = getattr(self.cerebro, 'backtest_window', (
+            BaseStrategy.config.get('START_DATE'), BaseStrategy.config.get('END_DATE')))
+        # the trading window as bar indices: [first_bar, end_bar)
+        self.first_bar, self.end_bar = self.window(self.data, self.start_date, self.end_date)
+
+    @staticmethod
+    def window(data, start_date, end_date):
+        """
+        Bar indices of the first bar of ``data`` on or after ``start_date`` and of the first
+        bar after ``end_date``, from its preloaded datetime line when the feed is not an ``ArrayData``.
+        """
+        if hasattr(data, 'window'):
+            return data.window(start_date, end_date)
+        dates = np.asarray(data.datetime.array)
+        first = np.searchsorted(dates, bt.date2num(pd.Timestamp(start_date).to_pydatetime()), side='left')
+        last = np.searchsorted(dates, bt.date2num((pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_pydatetime()),
+                               side='left')
+        return int(first), int(last)
 
     @classmethod
     def run_once(cls):
@@ -22,28 +65,80 @@ class BaseStrategy(bt.Strategy):
     def params_list(cls):
         pass
 
+    @classmethod
+    def warmup(cls, params):
+        """
+        Bars the strategy needs before ``START_DATE`` to trade with the parameter dict
+        ``params`` as it would over the whole history, None to keep the whole history.
+        """
+        return None
+
+    @classmethod
+    def lookahead(cls, params):
+        """
+        Bars after a bar its indicators read, for indicators revised by later bars.
+        """
+        return 0
+
+    @classmethod
+    def grid_window(cls, params):
+        """
+        Warm-up and look-ahead covering every parameter dict in ``params``, None to
+        keep the whole history.
+        """
+        warmups = [cls.warmup(p) for p in params]
+        if not warmups or None in warmups:
+            return None
+        return max(warmups), max(cls.lookahead(p) for p in params)
+
+    @classmethod
+    def vector_signals(cls, bars, params):
+        """
+        Signals for the vectorized engine, one column per parameter dict in ``params``.
+
+        Row ``t`` holds what ``operate`` acts on at bar ``t + 1``: > 0 to enter,
+        < 0 to exit and NaN while the strategy does not operate yet.
+        """
+        raise NotImplementedError('%s does not support the vectorized engine' % cls.__name__)
+
     def log(self, txt, dt=None):
+        if not event_log.info:
+            return
         dt = dt or self.datas[0].datetime.date(0)
-        print('%s, %s' % (dt.isoformat(), txt))
+        event_log.emit(INFO, 'log', symbol=self.data._name, dt=dt.isoformat(), text=txt)
 
     def notify_order(self, order):
-        dt = self.datas[0].datetime.datetime(0)
-        if order.status == order.Margin:
-            if order.isbuy():
-                print(
-                    '[%s] order was not executed, not enough cash. Price: %.2f, PNL: %.2f, Cash: %.2f' %
-                    (dt, order.executed.price, order.executed.pnl, self.broker.getvalue()))
-
-        elif order.status == order.Completed:
-            if order.isbuy():
-                print(
-                    '[%s] BUY EXECUTED, Price: %.2f, PNL: %.2f, Cash: %.2f' %
-                    (dt, order.executed.price, order.executed.pnl, self.broker.getvalue()))
-            else:  # Sell
-                print('[%s] SELL EXECUTED, Price: %.2f, PNL: %.2f, Cash: %.2f' %
-                      (dt, order.executed.price, order.executed.pnl, self.broker.getvalue()))
-        else:
-            print('order status: {}'.format(order.status))
+        # an order rejected for lack of cash is a warning, the other status changes are debug events
+        level = WARNING if order.status == order.Margin else DEBUG
+        if level < event_log.level:
+            return
+        event_log.emit(level, 'order', symbol=self.data._name, dt=self.datas[0].datetime.datetime(0),
+                       status=order.getstatusname(), side='buy' if order.isbuy() else 'sell',
+                       price=order.executed.price, pnl=order.executed.pnl, value=self.broker.getvalue())
+
+    def stop(self):
+        event_log.flush()
+
+    def batch_bar(self):
+        # in a batch Cerebro steps the strategies on the dates of all the symbols,
+        # a strategy only steps when its symbol has a new bar, as it would alone
+        return self.batch is None or len(self.data) > len(self)
+
+    def _next_open(self):
+        if self.batch_bar():
+            super(BaseStrategy, self)._next_open()
+
+    def _next(self):
+        if self.batch_bar():
+            super(BaseStrategy, self)._next()
+
+    def _oncepost_open(self):
+        if self.batch_bar():
+            super(BaseStrategy, self)._oncepost_open()
+
+    def _oncepost(self, dt):
+        if self.batch_bar():
+            super(BaseStrategy, self)._oncepost(dt)
 
     def operate(self, from_open):
         pass
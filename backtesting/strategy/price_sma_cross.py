@@ -1,5 +1,8 @@
+import numpy as np
 import backtrader as bt
+from backtesting.vectorized import sma, sma_exact, crossover
 from backtesting.strategy.base import BaseStrategy
+from backtesting.indicators.cache import indicator
 
 
 class PriceSMACrossStrategy(BaseStrategy):
@@ -11,7 +14,7 @@ class PriceSMACrossStrategy(BaseStrategy):
     def __init__(self):
         super(PriceSMACrossStrategy, self).__init__()
         self.period = self.params.period
-        self.sma = bt.ind.SMA(period=self.period)
+        self.sma = indicator(bt.ind.SMA, period=self.period)
         self.crossover = bt.ind.CrossOver(self.data.close, self.sma)
 
     @classmethod
@@ -27,8 +30,24 @@ class PriceSMACrossStrategy(BaseStrategy):
         period = cls.config['PRICE SMA CROSS STRATEGY PARAMETERS']['PERIOD']
         return {'period': period}
 
+    @classmethod
+    def warmup(cls, params):
+        # the crossover compares with the average of the previous bar
+        return params['period'] + 1
+
+    @classmethod
+    def vector_signals(cls, bars, params):
+        close = np.asarray(bars.close, dtype=np.float64)
+        periods = [p['period'] for p in params]
+
+        def exact(rows, cols):
+            return close[rows] - sma_exact(close, periods, rows, cols)
+
+        return crossover(close[:, None], sma(close, periods), exact)
+
     def operate(self, from_open):
-        if self.start_date <= self.data.datetime.date() <= self.end_date:
+        bar = len(self.data) - 1
+        if self.first_bar <= bar < self.end_bar:
             if not self.position:  # not in the market
                 if self.crossover > 0:  # if fast crosses slow to the upside
                     # print(' {} submit Buy, from open {}, close {}'.format(
@@ -38,5 +57,5 @@ class PriceSMACrossStrategy(BaseStrategy):
                     order = self.buy()  # enter long
             elif self.crossover < 0:  # in the market & cross to the downside
                 self.close()  # close long position
-        if self.data.datetime.date() > self.end_date and self.position:
+        if bar >= self.end_bar and self.position:
             order = self.close()  # close position
@@ -1,5 +1,9 @@
+import numpy as np
 import backtrader as bt
+from backtesting.vectorized import sma, sma_exact, crossover
 from backtesting.strategy.base import BaseStrategy
+from backtesting.eventlog import event_log, DEBUG
+from backtesting.indicators.cache import indicator
 
 
 class SMACrossStrategy(BaseStrategy):
@@ -11,8 +15,8 @@ class SMACrossStrategy(BaseStrategy):
 
     def __init__(self):
         super(SMACrossStrategy, self).__init__()
-        self.sma_fast = bt.ind.SMA(period=self.params.fast_period)
-        self.sma_slow = bt.ind.SMA(period=self.params.slow_period)
+        self.sma_fast = indicator(bt.ind.SMA, period=self.params.fast_period)
+        self.sma_slow = indicator(bt.ind.SMA, period=self.params.slow_period)
         self.crossover = bt.ind.CrossOver(self.sma_fast, self.sma_slow)
 
     @classmethod
@@ -35,16 +39,37 @@ class SMACrossStrategy(BaseStrategy):
         else:
             return {'fast_period': fast_period, 'slow_period': slow_period}
 
+    @classmethod
+    def warmup(cls, params):
+        # the crossover compares with the averages of the previous bar
+        return max(params['fast_period'], params['slow_period']) + 1
+
+    @classmethod
+    def vector_signals(cls, bars, params):
+        close = np.asarray(bars.close, dtype=np.float64)
+        fast_periods = [p['fast_period'] for p in params]
+        slow_periods = [p['slow_period'] for p in params]
+
+        def exact(rows, cols):
+            # equal periods give identical averages, no need to sum them again
+            diff = np.zeros(len(rows))
+            other = np.array(fast_periods)[cols] != np.array(slow_periods)[cols]
+            rows, cols = rows[other], cols[other]
+            diff[other] = sma_exact(close, fast_periods, rows, cols) - sma_exact(close, slow_periods, rows, cols)
+            return diff
+
+        return crossover(sma(close, fast_periods), sma(close, slow_periods), exact)
+
     def operate(self, from_open):
-        if self.start_date <= self.data.datetime.date() <= self.end_date:
+        bar = len(self.data) - 1
+        if self.first_bar <= bar < self.end_bar:
             if not self.position:  # not in the market
                 if self.crossover > 0:  # if fast crosses slow to the upside
-                    print(' {} submit Buy, from open {}, close {}'.format(
-                        self.data.datetime.date(),
-                        from_open, self.data.close[0])
-                    )
+                    if event_log.debug:
+                        event_log.emit(DEBUG, 'signal', symbol=self.data._name, dt=self.data.datetime.date(),
+                                       side='buy', from_open=from_open, close=self.data.close[0])
                     order = self.buy()  # enter long
             elif self.crossover < 0:  # in the market & cross to the downside
                 self.close()  # close long position
-        if self.data.datetime.date() > self.end_date and self.position:
+        if bar >= self.end_bar and self.position:
             order = self.close()  # close position
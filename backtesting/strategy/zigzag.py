@@ -1,6 +1,9 @@
 from datetime import date
+import numpy as np
 from backtesting.strategy.base import BaseStrategy
-from backtesting.indicators.zigzag import ZigZag
+from backtesting.eventlog import event_log, DEBUG
+from backtesting.indicators.cache import indicator
+from backtesting.indicators.zigzag import ZigZag, zigzag_lines
 
 
 class ZigZagStrategy(BaseStrategy):
@@ -14,7 +17,7 @@ class ZigZagStrategy(BaseStrategy):
         super(ZigZagStrategy, self).__init__()
         # Keep a reference to the "close" line in the data[0] dataseries
         self.dataclose = self.datas[0].close
-        self.zigzag = ZigZag(dev_threshold=self.params.dev_threshold, depth=self.params.depth)
+        self.zigzag = indicator(ZigZag, dev_threshold=self.params.dev_threshold, depth=self.params.depth)
         # self.crossover = bt.ind.CrossOver(self.zigzag.trough, self.data.close)
 
     @classmethod
@@ -25,13 +28,6 @@ class ZigZagStrategy(BaseStrategy):
     def optimize(cls):
         return cls.config['ZIGZAG STRATEGY PARAMETERS']['OPTIMIZATION']
 
-    def log(self, txt, dt=None):
-        """
-        Logging function for this strategy
-        """
-        dt = dt or self.datas[0].datetime.date(0)
-        print('%s, %s' % (dt.isoformat(), txt))
-
     @classmethod
     def params_list(cls):
         dev_threshold = cls.config['ZIGZAG STRATEGY PARAMETERS']['DEV THRESHOLD']
@@ -40,6 +36,63 @@ class ZigZagStrategy(BaseStrategy):
         mode = cls.config['ZIGZAG STRATEGY PARAMETERS']['MODE']
         return {'dev_threshold': dev_threshold, 'depth': depth, 'mode': mode}
 
+    @classmethod
+    def trend(cls, mode, close_price, previous_peak, peak, previous_trough, trough):
+        """
+        Uptrend and downtrend arrays of ``mode``, the vectorized counterpart of ``operate``.
+        """
+        if mode == 'strict uptrend and downtrend':
+            uptrend = (previous_peak < peak) & (previous_trough < trough)
+            downtrend = (previous_peak > peak) & (previous_trough > trough)
+        elif mode == 'strict uptrend':
+            uptrend = (previous_peak < peak) & (previous_trough < trough)
+            downtrend = ~uptrend
+        elif mode == 'not downtrend':
+            downtrend = (previous_peak > peak) & (previous_trough > trough)
+            uptrend = ~downtrend
+        elif mode == 'strict price with previous trough and trough':
+            uptrend = (close_price > previous_trough) & (close_price > trough)
+            downtrend = (close_price < previous_trough) & (close_price < trough)
+        elif mode == 'above previous swing low and swing low':
+            uptrend = (close_price > previous_trough) & (close_price > trough)
+            downtrend = ~uptrend
+        elif mode == 'above previous swing low':
+            uptrend = close_price > previous_trough
+            downtrend = close_price < previous_trough
+        elif mode == 'above swing low':
+            uptrend = close_price > trough
+            downtrend = close_price < trough
+        else:
+            raise ValueError('unknown zigzag mode: %s' % mode)
+        return uptrend, downtrend
+
+    @classmethod
+    def warmup(cls, params):
+        # every pivot depends on the ones before it back to the first bar, no warm-up bounds them
+        return None
+
+    @classmethod
+    def vector_signals(cls, bars, params):
+        high = np.asarray(bars.high, dtype=np.float64)
+        low = np.asarray(bars.low, dtype=np.float64)
+        # operate reads the indicator of the previous bar but the close of the current one
+        close = np.append(np.asarray(bars.close, dtype=np.float64)[1:], np.nan)
+        zigzags = {}
+        signals = np.empty((len(high), len(params)))
+        for i, p in enumerate(params):
+            key = (p['dev_threshold'], p['depth'])
+            if key not in zigzags:
+                zigzags[key] = zigzag_lines(high, low, *key)
+            zz = zigzags[key]
+            with np.errstate(invalid='ignore'):
+                uptrend, downtrend = cls.trend(p['mode'], close, zz['previous_peak'], zz['peak'],
+                                               zz['previous_trough'], zz['trough'])
+            signals[:, i] = np.where(uptrend, 1.0, np.where(downtrend, -1.0, 0.0))
+            # a zero pivot price makes operate return early
+            skip = (zz['previous_peak'] == 0) | (zz['peak'] == 0) | (zz['previous_trough'] == 0) | (zz['trough'] == 0)
+            signals[skip, i] = np.nan
+        return signals
+
     def operate(self, from_open):
         close_price = self.data.close[0]
         previous_peak = self.zigzag.previous_peak[0]
@@ -72,15 +125,15 @@ class ZigZagStrategy(BaseStrategy):
             uptrend = close_price > trough
             downtrend = close_price < trough
 
-        if self.start_date <= self.data.datetime.date() <= self.end_date:
+        bar = len(self.data) - 1
+        if self.first_bar <= bar < self.end_bar:
             if not self.position:
                 if uptrend > 0:
-                    print(' {} submit Buy, from open {}, close {}'.format(
-                        self.data.datetime.date(),
-                        from_open, self.data.close[0])
-                    )
+                    if event_log.debug:
+                        event_log.emit(DEBUG, 'signal', symbol=self.data._name, dt=self.data.datetime.date(),
+                                       side='buy', from_open=from_open, close=self.data.close[0])
                     order = self.buy()
             elif downtrend:
                 self.close()
-        if self.data.datetime.date() > self.end_date and self.position:
+        if bar >= self.end_bar and self.position:
             order = self.close()
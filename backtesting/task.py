@@ -1,20 +1,22 @@
-import os
-
-import pandas as pd
-import matplotlib.pyplot as plt
 import backtrader as bt
 
 from backtesting.comminfo import StampDutyCommissionScheme
-from backtesting.analyzer import TradeList
-from backtesting.feeds.akshare import load_data_from_akshare
-from backtesting.utils import keys_exists, df_to_csv, strategy_params_repr
+from backtesting.analyzer import TradeList, EquityCurve, ChartSeries, DEFAULT_METRICS
+from backtesting.feeds.akshare import load_bars, feed_from_bars
+from backtesting.vectorized import params_grid
+from backtesting.utils import strategy_params_repr
 from backtesting.metrics import DetailMetric
 from backtesting.sizer import AllInSizerInt
+from backtesting.indicators.cache import indicator_cache
+from backtesting.eventlog import event_log, INFO
+from backtesting.timing import timer
 
 
 class Task:
+    # record the equity curve of every parameter set in ``curves``
+    keep_curves = False
 
-    def __init__(self, config, strategy_cls):
+    def __init__(self, config, strategy_cls, params=None):
         self.config = config
         self.start_date = self.config.get('START_DATE')
         self.end_date = self.config.get('END_DATE')
@@ -22,32 +24,35 @@ class Task:
 
         self.symbol = None
         self.name = None
+        # trade list of every parameter set run by params repr, saved to the trade log by the caller
+        self.trade_lists = {}
+        # equity curve of every parameter set by params repr, with ``keep_curves``
+        self.curves = {}
+        # chart series of every parameter set by params repr with ``CHART``, saved to the chart log by the caller
+        self.chart_series = {}
         self.strategy_cls = strategy_cls
         self.strategy_name = self.strategy_cls.__name__
         self.optimization = strategy_cls.optimize()
-        self.params = strategy_cls.params_list()
+        self.params = strategy_cls.params_list() if params is None else params
         self.run_once = strategy_cls.run_once()
 
         self.cheat_on_open = self.config.get('CHEAT_ON_OPEN')
         self.trade_history = self.config.get('TRADE_HISTORY')
-
-        self.cerebro = bt.Cerebro()
-
-        if self.optimization:
-            self.cerebro.optstrategy(self.strategy_cls, **self.params)
-        else:
-            self.cerebro.addstrategy(self.strategy_cls, **self.params)
-
-        self.cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trade_analyzer')
-        self.cerebro.addanalyzer(bt.analyzers.AnnualReturn, _name='annual_return')
-        self.cerebro.addanalyzer(bt.analyzers.Returns, _name='returns', tann=365)
-        self.cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
-        self.cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe_ratio', riskfreerate=0.0, annualize=True,
-                                 timeframe=bt.TimeFrame.Days)
-        self.cerebro.addanalyzer(bt.analyzers.SharpeRatio_A, _name='sharpe_ratio_a')
-        self.cerebro.addanalyzer(bt.analyzers.SQN, _name='sqn')
-        self.cerebro.addanalyzer(bt.analyzers.Transactions, _name='transactions')
+        self.indicator_cache_size = self.config.get('INDICATOR_CACHE_SIZE', 256)
+        self.trim_bars = self.config.get('TRIM_BARS', True)
+        # processes of backtrader's optimization pool, all the cores by default
+        self.maxcpus = self.config.get('MAXCPUS')
+        self.metrics = self.config.get('METRICS') or DEFAULT_METRICS
+
+        self.cerebro = self.new_cerebro()
+        # the strategies trade from START_DATE to END_DATE of this config
+        self.cerebro.backtest_window = (self.start_date, self.end_date)
+        self.add_strategies()
+
+        self.cerebro.addanalyzer(EquityCurve, _name='equity', metrics=tuple(self.metrics), curve=self.keep_curves)
         self.cerebro.addanalyzer(TradeList, _name='tradelist')
+        if self.chart():
+            self.cerebro.addanalyzer(ChartSeries, _name='chart')
 
         start_cash = self.config.get('START_CASH', 1000000)
         self.cerebro.broker.setcash(start_cash)
@@ -68,6 +73,32 @@ class Task:
 
         self.portfolio_startvalue = self.cerebro.broker.getvalue()
 
+    def new_cerebro(self):
+        # the observers only fed cerebro.plot, the charts are drawn from the chart series after the run
+        return bt.Cerebro(stdstats=False)
+
+    def add_strategies(self):
+        if self.optimization:
+            self.cerebro.optstrategy(self.strategy_cls, **self.params)
+        else:
+            self.cerebro.addstrategy(self.strategy_cls, **self.params)
+
+    def chart(self):
+        return 'CHART' in self.config and self.config['CHART'] is True
+
+    def window_bars(self, bars):
+        """
+        ``bars`` trimmed to the backtest window and the warm-up of the parameter grid, when ``TRIM_BARS``.
+        """
+        if self.trim_bars:
+            window = self.strategy_cls.grid_window(params_grid(self.strategy_cls, self.optimization, self.params))
+            if window is not None:
+                bars = bars.window(self.start_date, self.end_date, *window)
+        return bars
+
+    def feed(self, bars):
+        return feed_from_bars(self.window_bars(bars))
+
     def performance(self, strategy):
 
         metrics = DetailMetric()
@@ -77,21 +108,19 @@ class Task:
         metrics.params = strategy_params_repr(strategy)
 
         analyzers = strategy.analyzers
-        if hasattr(analyzers, 'trade_analyzer'):
-            ta = strategy.analyzers.trade_analyzer.get_analysis()
+        if hasattr(analyzers, 'equity'):
+            ec = strategy.analyzers.equity.get_analysis()
 
-            metrics.total_open = ta.total.open if keys_exists(ta, 'total', 'open') else None
-            metrics.total_closed = ta.total.closed if keys_exists(ta, 'total', 'closed') else None
-            metrics.won_total = ta.won.total if keys_exists(ta, 'won', 'total') else None
-            metrics.lost_total = ta.lost.total if keys_exists(ta, 'lost', 'total') else None
+            metrics.total_open = ec.get('total_open')
+            metrics.total_closed = ec.get('total_closed')
+            metrics.won_total = ec.get('won_total')
+            metrics.lost_total = ec.get('lost_total')
 
-            metrics.streak_won_longest = ta.streak.won.longest if keys_exists(ta, 'streak', 'won',
-                                                                              'longest') else None
-            metrics.streak_lost_longest = ta.streak.lost.longest if keys_exists(ta, 'streak', 'lost',
-                                                                                'longest') else None
+            metrics.streak_won_longest = ec.get('streak_won_longest')
+            metrics.streak_lost_longest = ec.get('streak_lost_longest')
 
-            metrics.pnl_net_total = ta.pnl.net.total if keys_exists(ta, 'pnl', 'net', 'total') else None
-            metrics.pnl_net_average = ta.pnl.net.average if keys_exists(ta, 'pnl', 'net', 'average') else None
+            metrics.pnl_net_total = ec.get('pnl_net_total')
+            metrics.pnl_net_average = ec.get('pnl_net_average')
 
             metrics.strike_rate = (metrics.won_total / metrics.total_closed) * 100 \
                 if metrics.won_total and metrics.total_closed else None
@@ -103,88 +132,51 @@ class Task:
             metrics.annualized_return_percentage = metrics.net_profit_percentage / (
                     days / 365) if metrics.net_profit_percentage else None
 
-        if hasattr(analyzers, 'drawdown'):
-            dd = strategy.analyzers.drawdown.get_analysis()
-            metrics.max_drawdown = dd.max.drawdown
-            metrics.max_moneydown = dd.max.moneydown
+            metrics.max_drawdown = ec.get('max_drawdown')
+            metrics.max_moneydown = ec.get('max_moneydown')
+            metrics.sqn = ec.get('sqn')
+            metrics.sharpe_ratio = ec.get('sharpe_ratio')
+            metrics.sharpe_ratio_a = ec.get('sharpe_ratio_a')
+            metrics.sortino_ratio = ec.get('sortino_ratio')
+            metrics.calmar_ratio = ec.get('calmar_ratio')
+            if 'curve' in ec:
+                self.curves[metrics.params] = ec.get('curve')
 
-        if hasattr(analyzers, 'sqn'):
-            sqn_analyzer = strategy.analyzers.sqn.get_analysis()
-            metrics.sqn = sqn_analyzer.sqn
-
-        if hasattr(analyzers, 'sharpe_ratio'):
-            sharpe_analyzer = strategy.analyzers.sharpe_ratio.get_analysis()
-            metrics.sharpe_ratio = sharpe_analyzer['sharperatio']
+        if hasattr(analyzers, 'tradelist'):
+            self.trade_lists[metrics.params] = strategy.analyzers.tradelist.get_analysis()
 
-        if hasattr(analyzers, 'sharpe_ratio_a'):
-            sharpe_analyzer = strategy.analyzers.sharpe_ratio_a.get_analysis()
-            metrics.sharpe_ratio_a = sharpe_analyzer['sharperatio']
+        if hasattr(analyzers, 'chart'):
+            self.chart_series[metrics.params] = strategy.analyzers.chart.get_analysis()
 
-        if hasattr(analyzers, 'tradelist'):
-            trade_list = strategy.analyzers.tradelist.get_analysis()
-            df = pd.DataFrame(trade_list)
-            report_dir = self.config.get('REPORT_DIR')
-            trade_list_dir = os.path.join(report_dir, r'trade_list')
-            prefix = ' '.join([
-                metrics.strategy,
-                metrics.params,
-                self.symbol,
-                'trade_list '
-            ])
-            df_to_csv(df, trade_list_dir, prefix)
-
-        # Designate the rows
-        h1 = ['Total Open', 'Total Closed', 'Total Won', 'Total Lost']
-        h2 = ['Strike Rate', 'Win Streak', 'Losing Streak', 'PnL Net']
-        h3 = ['DrawDown Pct', 'MoneyDown', '', '']
-        r1 = [metrics.total_open, metrics.total_closed, metrics.won_total, metrics.lost_total]
-        r2 = [('%.2f%%' % metrics.strike_rate) if metrics.strike_rate else '',
-              metrics.streak_won_longest, metrics.streak_lost_longest, metrics.pnl_net_total]
-        r3 = [('%.2f%%' % metrics.max_drawdown) if metrics.max_drawdown else '', metrics.max_moneydown,
-              '', '']
-
-        # Check which set of headers is the longest.
-        header_length = max(len(h1), len(h2), len(h3))
-        # Print the rows
-        print_list = [h1, r1, h2, r2, h3, r3]
-        row_format = "{:<15}" * (header_length + 1)
-        try:
-            print("Trade Analysis Results:")
-            for row in print_list:
-                if row:
-                    print(row_format.format('', *row))
-            print('[SQN:%.2f, Sharpe Ratio:%.2f, Final Portfolio:%.2f, Total PnL:%.2f]' % (
-                metrics.sqn, metrics.sharpe_ratio, self.cerebro.broker.getvalue(),
-                metrics.pnl_net_total))
-        except Exception as e:
-            pass
-
-        if 'CHART' in self.config and self.config['CHART'] is True and not self.optimization:
-            figs = self.cerebro.plot(style='candlestick')
-            plt.rcParams["figure.figsize"] = [16, 9]
-            chart_dir = os.path.join(self.config.get('REPORT_DIR'), 'chart')
-            if not os.path.exists(chart_dir):
-                os.mkdir(chart_dir)
-            for fig in figs:
-                fig.savefig(os.path.join(chart_dir, '{}.png'.format(metrics.strategy + ' ' + metrics.symbol)))
+        if event_log.info:
+            event_log.emit(INFO, 'result', **metrics.asdict())
 
         return metrics
 
-    def run(self, symbol, name):
+    def run(self, symbol, name, bars=None):
+        """
+        :param bars: the ``Bars`` of ``symbol`` when already loaded, read from the store otherwise
+        """
         self.symbol = symbol
         self.name = name
-        data = load_data_from_akshare(self.data_dir, symbol)
+        indicator_cache.resize(self.indicator_cache_size * 1024 * 1024)
+        with timer.phase('load'):
+            if bars is None:
+                bars = load_bars(self.data_dir, symbol)
+            data = self.feed(bars)
         self.cerebro.adddata(data, name=symbol)
-        strategies = self.cerebro.run(cheat_on_open=self.cheat_on_open, tradehistory=self.trade_history,
-                                      runonce=self.run_once)
+        with timer.phase('run'):
+            strategies = self.cerebro.run(cheat_on_open=self.cheat_on_open, tradehistory=self.trade_history,
+                                          runonce=self.run_once, maxcpus=self.maxcpus)
         metrics_record = []
-        if self.optimization:
-            for strategy_group in strategies:
-                for strategy in strategy_group:
+        with timer.phase('performance'):
+            if self.optimization:
+                for strategy_group in strategies:
+                    for strategy in strategy_group:
+                        metrics = self.performance(strategy)
+                        metrics_record.append(metrics.asdict())
+            else:
+                for strategy in strategies:
                     metrics = self.performance(strategy)
                     metrics_record.append(metrics.asdict())
-        else:
-            for strategy in strategies:
-                metrics = self.performance(strategy)
-                metrics_record.append(metrics.asdict())
         return metrics_record
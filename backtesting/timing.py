@@ -0,0 +1,123 @@
+import os
+import time
+import glob
+import json
+import pstats
+import hashlib
+import cProfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+from backtesting.eventlog import EventLog, INFO, OFF, merge_events
+
+
+class PhaseTimer:
+    """
+    Wall and CPU seconds spent in named phases, summed over the calls of each
+    phase since the last ``reset``. Phases are not nested.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            total = self.phases.setdefault(name, [0.0, 0.0])
+            total[0] += time.perf_counter() - wall
+            total[1] += time.process_time() - cpu
+
+    def reset(self):
+        """
+        :return: the phases timed since the last reset, by name: [wall, cpu]
+        """
+        phases, self.phases = self.phases, {}
+        return phases
+
+
+timer = PhaseTimer()
+# one ``timing`` event per job and per unit, in the event log format
+timing_log = EventLog()
+
+
+def configure_timing(config, run_id):
+    enabled = config.get('TIMINGS', True)
+    timing_log.configure(INFO if enabled else OFF, os.path.join(config.get('REPORT_DIR'), 'timing', run_id))
+    timer.reset()
+
+
+def timing_report(directory):
+    """
+    Merge the timing parts of a run and flatten them into ``timings.csv``: one row per
+    unit, strategy, params and phase with its wall and CPU seconds.
+
+    :return: the rows, empty without timings
+    """
+    merge_events(directory)
+    file_path = os.path.join(directory, 'events.jsonl')
+    if not os.path.exists(file_path):
+        return pd.DataFrame()
+    rows = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            for phase, (wall, cpu) in event['phases'].items():
+                rows.append([event['unit'], event['symbol'], event['strategy'], event['params'], event['pid'],
+                             phase, wall, cpu])
+    df = pd.DataFrame(rows, columns=['unit', 'symbol', 'strategy', 'params', 'pid', 'phase', 'wall', 'cpu'])
+    df.to_csv(os.path.join(directory, 'timings.csv'), index=False)
+    return df
+
+
+def profiled(config, unit_key):
+    """
+    Whether to profile the unit: ``PROFILE_RATE`` is the share of units profiled,
+    picked by a hash of their key so a resumed run profiles the same ones.
+    """
+    rate = config.get('PROFILE_RATE', 0)
+    if not rate:
+        return False
+    digest = hashlib.blake2b(unit_key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') < rate * 2 ** 64
+
+
+@contextmanager
+def profile(directory, unit_key):
+    """
+    Run the block under ``cProfile`` and dump its stats to ``directory``.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        part = hashlib.blake2b(unit_key.encode('utf-8'), digest_size=8).hexdigest()
+        profiler.dump_stats(os.path.join(directory, part + '.prof'))
+
+
+def profile_report(directory, limit=60):
+    """
+    Merge the unit profiles of a run into ``profile.prof`` and write the functions
+    with the most cumulative time to ``profile.txt``.
+    """
+    merged = os.path.join(directory, 'profile.prof')
+    parts = [p for p in glob.glob(os.path.join(directory, '*.prof')) if p != merged]
+    if not parts:
+        return
+    # a resumed run adds its units to the profile of the first attempt
+    stats = pstats.Stats(*(parts + [merged] if os.path.exists(merged) else parts))
+    stats.dump_stats(merged)
+    with open(os.path.join(directory, 'profile.txt'), 'w') as f:
+        stats.stream = f
+        f.write('%d profiled units\n' % len(parts))
+        stats.sort_stats('cumulative').print_stats(limit)
+    for file_path in parts:
+        os.remove(file_path)
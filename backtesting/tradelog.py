@@ -0,0 +1,129 @@
+import os
+import glob
+import hashlib
+
+import pandas as pd
+
+from backtesting.utils import os_encoding
+
+INDEX_COLUMNS = ['symbol', 'params', 'part', 'first', 'rows']
+
+
+class TradeLog:
+    """
+    Trade lists of every backtest in one dataset partitioned by strategy and run:
+
+      <root>/<strategy>/<run id>/<part>.csv          trades of a work unit, by params
+      <root>/<strategy>/<run id>/<part>.index.csv    symbol, params, first row and rows of each trade list
+      <root>/<strategy>/<run id>/index.csv           all the part indexes, once the run is indexed
+
+    A part holds all the trade lists of a strategy in a work unit and is named
+    after the unit, so running the unit again replaces it.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, strategy, run_id):
+        return os.path.join(self.root, strategy, run_id)
+
+    def write(self, strategy, run_id, unit_key, symbol, trade_lists):
+        """
+        :param trade_lists: dict of params repr to the ``TradeList`` analysis of a backtest
+        """
+        if not trade_lists:
+            return
+        directory = self.path(strategy, run_id)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        part = hashlib.blake2b(unit_key.encode('utf-8'), digest_size=8).hexdigest()
+        frames = []
+        index = []
+        first = 0
+        for params in sorted(trade_lists):
+            trades = trade_lists[params]
+            index.append([symbol, params, part, first, len(trades)])
+            first += len(trades)
+            if len(trades):
+                frames.append(pd.DataFrame(trades).assign(symbol=symbol, params=params))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['symbol', 'params'])
+        columns = ['symbol', 'params'] + [c for c in df.columns if c not in ('symbol', 'params')]
+        self.replace(os.path.join(directory, part + '.csv'), df[columns])
+        self.replace(os.path.join(directory, part + '.index.csv'), pd.DataFrame(index, columns=INDEX_COLUMNS))
+
+    @staticmethod
+    def replace(file_path, df):
+        tmp_path = file_path + '.tmp'
+        df.to_csv(tmp_path, index=False, encoding=os_encoding())
+        os.replace(tmp_path, file_path)
+
+    def build_index(self, strategy, run_id):
+        """
+        Merge the part indexes of a run into its ``index.csv``.
+        """
+        directory = self.path(strategy, run_id)
+        parts = glob.glob(os.path.join(directory, '*.index.csv'))
+        if not parts:
+            return
+        frames = [self.read_index(os.path.join(directory, 'index.csv'))] + [self.read_index(p) for p in parts]
+        index = pd.concat(frames, ignore_index=True).drop_duplicates(['symbol', 'params'], keep='last')
+        self.replace(os.path.join(directory, 'index.csv'), index.sort_values(['symbol', 'params']))
+        for file_path in parts:
+            os.remove(file_path)
+
+    @staticmethod
+    def read_index(file_path):
+        if not os.path.exists(file_path):
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+        return pd.read_csv(file_path, dtype={'symbol': str, 'params': str, 'part': str})
+
+    def strategies(self):
+        return sorted(os.listdir(self.root)) if os.path.exists(self.root) else []
+
+    def runs(self, strategy):
+        directory = os.path.join(self.root, strategy)
+        return sorted(os.listdir(directory)) if os.path.exists(directory) else []
+
+    def index(self, strategy, run_id):
+        """
+        :return: index of the trade lists of a run: symbol, params, part, first row and rows
+        """
+        directory = self.path(strategy, run_id)
+        frames = [self.read_index(os.path.join(directory, 'index.csv'))]
+        frames += [self.read_index(p) for p in glob.glob(os.path.join(directory, '*.index.csv'))]
+        return pd.concat(frames, ignore_index=True).drop_duplicates(['symbol', 'params'], keep='last')
+
+    def trades(self, strategy, run_id, symbol=None, params=None):
+        """
+        Trades of a run, of one symbol and/or one parameter set when given.
+        """
+        index = self.index(strategy, run_id)
+        if symbol is not None:
+            index = index[index['symbol'] == str(symbol)]
+        if params is not None:
+            index = index[index['params'] == str(params)]
+        index = index[index['rows'] > 0]
+        frames = []
+        directory = self.path(strategy, run_id)
+        for part, entries in index.groupby('part', sort=False):
+            df = pd.read_csv(os.path.join(directory, part + '.csv'), dtype={'symbol': str, 'params': str},
+                             parse_dates=['datein', 'dateout'])
+            for first, rows in zip(entries['first'], entries['rows']):
+                frames.append(df.iloc[first:first + rows])
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def aggregate(self, strategy, run_id, by='params'):
+        """
+        Trade figures of a run across symbols (``by='params'``) or parameter sets (``by='symbol'``).
+        """
+        df = self.trades(strategy, run_id)
+        if df.empty:
+            return df
+        df['won'] = df['pnl'] >= 0
+        summary = df.groupby(by).agg(trades=('pnl', 'size'), won=('won', 'sum'), pnl=('pnl', 'sum'),
+                                     pnl_average=('pnl', 'mean'), nbars_average=('nbars', 'mean'),
+                                     mfe_average=('mfe%', 'mean'), mae_average=('mae%', 'mean'))
+        summary['strike_rate'] = summary['won'] / summary['trades']
+        return summary.reset_index()
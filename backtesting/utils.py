@@ -2,14 +2,22 @@ import os
 import platform
 from datetime import datetime
 import yaml
-import akshare as ak
 
-PROJECT_DIR = os.getcwd()
-CONFIG_PATH = os.path.join(PROJECT_DIR, 'config/config.yaml')
+from backtesting.feeds.akshare import fetch_index_cons
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def config_path():
+    """
+    ``config/config.yaml`` of the working directory, of the project directory without one.
+    """
+    path = os.path.join(os.getcwd(), 'config', 'config.yaml')
+    return path if os.path.exists(path) else os.path.join(PROJECT_DIR, 'config', 'config.yaml')
 
 
 def read_config():
-    with open(CONFIG_PATH, "r") as stream:
+    with open(config_path(), "r") as stream:
         try:
             config = yaml.safe_load(stream)
             return config
@@ -17,6 +25,21 @@ def read_config():
             raise exception
 
 
+class LazyConfig:
+    """
+    Class attribute holding the config, read on its first access rather than when the
+    class is defined, so importing a strategy reads no file.
+    """
+
+    def __init__(self):
+        self.config = None
+
+    def __get__(self, instance, owner):
+        if self.config is None:
+            self.config = read_config()
+        return self.config
+
+
 def keys_exists(element, *keys):
     '''
     Check if *keys (nested) exists in `element` (dict).
@@ -36,16 +59,22 @@ def keys_exists(element, *keys):
 
 
 def index_stock_cons(index_code='000300'):
-    df = ak.index_stock_cons(symbol=index_code)
-    df.columns = ['stock_code', 'stock_name', 'lift_date']
-    return dict(zip(df.stock_code, df.stock_name))
+    """
+    Current constituents of ``index_code`` fetched from akshare, ``universe`` serves them from snapshots.
+    """
+    df = fetch_index_cons(index_code)
+    return dict(zip(df.symbol, df.name))
 
 
-def df_to_csv(df, directory, prefix):
+def csv_path(directory, prefix):
     if not os.path.exists(directory):
         os.makedirs(directory)
     file_name = prefix + datetime.now().strftime(' - %d-%H%M%S') + '.csv'
-    file_path = os.path.join(directory, file_name)
+    return os.path.join(directory, file_name)
+
+
+def df_to_csv(df, directory, prefix):
+    file_path = csv_path(directory, prefix)
     encoding = os_encoding()
     df.to_csv(file_path, index=False, encoding=encoding)
 
@@ -0,0 +1,324 @@
+import math
+import itertools
+
+import numpy as np
+
+from backtesting.feeds.akshare import load_bars
+from backtesting.metrics import DetailMetric
+from backtesting import stats
+from backtesting.analyzer import DEFAULT_METRICS
+from backtesting.costs import CostModel
+from backtesting.timing import timer
+
+
+def sma(values, periods):
+    """
+    Simple moving averages of ``values`` for every period in ``periods``, computed
+    from one cumulative sum.
+
+    :return: (bars x periods) array, NaN until a period has enough bars
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    # offsetting by the first value keeps the running sum small and precise
+    offset = values[0] if n else 0.0
+    csum = np.concatenate(([0.0], np.cumsum(values - offset)))
+    distinct = sorted(set(periods))
+    columns = {}
+    for period in distinct:
+        column = np.full(n, np.nan)
+        if period <= n:
+            column[period - 1:] = (csum[period:] - csum[:n - period + 1]) / period + offset
+        columns[period] = column
+    return np.column_stack([columns[p] for p in periods]) if periods else np.empty((n, 0))
+
+
+def sma_exact(values, periods, rows, cols):
+    """
+    SMA values at the cells (``rows``, ``cols``) of the ``sma(values, periods)`` grid,
+    summed with ``math.fsum`` exactly as ``bt.ind.SMA`` does.
+    """
+    return np.array([math.fsum(values[r - periods[c] + 1:r + 1]) / periods[c] for r, c in zip(rows, cols)])
+
+
+def crossover(data0, data1, exact=None, rtol=1e-9):
+    """
+    Vectorized ``bt.ind.CrossOver``: 1.0 where ``data0`` crosses ``data1`` upwards,
+    -1.0 where it crosses downwards, 0.0 otherwise and NaN during warm-up.
+
+    Only the sign of ``data0 - data1`` matters, so differences within ``rtol``
+    (where cumulative sum rounding could flip it) are recomputed by
+    ``exact(rows, cols)``, or taken as zero without it.
+    """
+    data0, data1 = np.broadcast_arrays(np.asarray(data0, dtype=np.float64),
+                                       np.asarray(data1, dtype=np.float64))
+    diff = data0 - data1
+    with np.errstate(invalid='ignore'):
+        rows, cols = np.nonzero(np.abs(diff) <= rtol * np.abs(data1))
+    if len(rows):
+        diff[rows, cols] = exact(rows, cols) if exact is not None else 0.0
+
+    # last non zero difference, seeded with the first valid difference
+    valid = ~np.isnan(diff)
+    rows = np.arange(len(diff))[:, None]
+    first = valid.argmax(axis=0)
+    keep = (diff != 0.0) | (rows == first)
+    nzd = np.take_along_axis(diff, np.maximum.accumulate(np.where(keep, rows, 0), axis=0), axis=0)
+
+    cross = np.full(diff.shape, np.nan)
+    before, after = nzd[:-1], diff[1:]
+    with np.errstate(invalid='ignore'):
+        cross[1:] = (before < 0.0) & (after > 0.0)
+        cross[1:] -= (before > 0.0) & (after < 0.0)
+    cross[1:][np.isnan(before) | np.isnan(after)] = np.nan
+    return cross
+
+
+def params_grid(strategy_cls, optimization, params):
+    """
+    Expand ``params_list()`` into a list of parameter dicts in the order
+    ``cerebro.optstrategy`` runs them.
+    """
+    defaults = dict(strategy_cls.params._getitems())
+    if not optimization:
+        return [dict(defaults, **params)]
+    keys = list(params)
+    values = [[v] if isinstance(v, str) or not hasattr(v, '__iter__') else v for v in params.values()]
+    return [dict(defaults, **dict(zip(keys, combo))) for combo in itertools.product(*values)]
+
+
+def params_repr(strategy_cls, params):
+    return '_'.join([str(params[k]) for k in strategy_cls.params._getkeys()])
+
+
+def curve_metrics(dates, values, trades, total_open, start_cash, days, selected, window=None):
+    """
+    ``DetailMetric`` of broker value curves, the fields the ``EquityCurve`` analyzer
+    fills, without the symbol, strategy and params.
+
+    :param values: (bars x curves) broker values
+    :param trades: list of closed trade pnlcomm per curve
+    :param total_open: trades still open at the end per curve
+    :param days: calendar days of the backtest window, annualizing the return
+    :param selected: the ``METRICS`` to compute
+    :param window: mask of the rows the return metrics are computed on (``stats.metric_window``),
+        all of them by default
+    """
+    count = values.shape[1]
+    nan = np.full(count, np.nan)
+    max_drawdown, max_moneydown = stats.drawdown(values) if 'drawdown' in selected else (nan, nan)
+    if window is not None:
+        dates, values = dates[window], values[window]
+    sharpe_ratio = sortino_ratio = sharpe_ratio_a = calmar_ratio = nan
+    if len(dates):
+        daily = stats.period_returns(values, dates, start_cash)
+        if 'sharpe_ratio' in selected:
+            sharpe_ratio = stats.sharpe_ratio(daily, factor=252, annualize=True)
+        if 'sortino_ratio' in selected:
+            sortino_ratio = stats.sortino_ratio(daily, factor=252, annualize=True)
+        years = dates.astype('datetime64[Y]')
+        yearly = stats.period_returns(values, years, start_cash)
+        if 'sharpe_ratio_a' in selected:
+            sharpe_ratio_a = stats.sharpe_ratio(yearly, riskfreerate=0.01, factor=1, annualize=True)
+        if 'calmar_ratio' in selected:
+            span = int((dates[-1] - dates[0]).astype(int))
+            # the drawdown is measured from the start value, as over the flat bars before the window
+            start = np.full((1, count), float(start_cash))
+            calmar_ratio = stats.calmar_ratio(np.vstack([start, values]), span, start_cash)
+
+    metrics_list = []
+    for i in range(count):
+        metrics = DetailMetric()
+        if 'trades' in selected:
+            ta = stats.trade_stats(trades[i])
+            metrics.total_open = int(total_open[i]) if trades[i] or total_open[i] else None
+            metrics.total_closed = ta.get('total_closed')
+            metrics.won_total = ta.get('won_total')
+            metrics.lost_total = ta.get('lost_total')
+            metrics.streak_won_longest = ta.get('streak_won_longest')
+            metrics.streak_lost_longest = ta.get('streak_lost_longest')
+            metrics.pnl_net_total = ta.get('pnl_net_total')
+            metrics.pnl_net_average = ta.get('pnl_net_average')
+
+            metrics.strike_rate = (metrics.won_total / metrics.total_closed) * 100 \
+                if metrics.won_total and metrics.total_closed else None
+            metrics.net_profit_percentage = metrics.pnl_net_total / start_cash if metrics.pnl_net_total else None
+            metrics.annualized_return_percentage = metrics.net_profit_percentage / (
+                    days / 365) if metrics.net_profit_percentage else None
+
+        metrics.max_drawdown = None if np.isnan(max_drawdown[i]) else float(max_drawdown[i])
+        metrics.max_moneydown = None if np.isnan(max_moneydown[i]) else float(max_moneydown[i])
+        metrics.sqn = stats.sqn(trades[i]) if 'sqn' in selected else None
+        metrics.sharpe_ratio = None if np.isnan(sharpe_ratio[i]) else float(sharpe_ratio[i])
+        metrics.sharpe_ratio_a = None if np.isnan(sharpe_ratio_a[i]) else float(sharpe_ratio_a[i])
+        metrics.sortino_ratio = None if np.isnan(sortino_ratio[i]) else float(sortino_ratio[i])
+        metrics.calmar_ratio = None if np.isnan(calmar_ratio[i]) else float(calmar_ratio[i])
+        metrics_list.append(metrics)
+    return metrics_list
+
+
+class VectorTask:
+    """
+    Runs a parameter sweep of a long-only, all-in strategy as one NumPy
+    simulation over a (bars x parameter sets) grid instead of a backtrader
+    event loop per parameter set.
+
+    The strategy provides its signals through ``vector_signals``. Fills follow
+    the backtrader setup of ``Task``: orders decided on a bar's signal are filled
+    at the open of the next bar (cheat-on-open), sized all-in by whole shares
+    like ``AllInSizerInt`` and charged by the ``CostModel`` of ``StampDutyCommissionScheme``.
+    """
+    # record the equity curve of every parameter set in ``curves``
+    keep_curves = False
+
+    def __init__(self, config, strategy_cls, params=None):
+        self.config = config
+        self.start_date = self.config.get('START_DATE')
+        self.end_date = self.config.get('END_DATE')
+        self.data_dir = self.config.get('DATA_DIR')
+
+        self.strategy_cls = strategy_cls
+        # trade lists are only recorded by the backtrader engine
+        self.trade_lists = {}
+        # (dates, broker values, closed trade pnlcomm) of every parameter set by params repr, with keep_curves
+        self.curves = {}
+        # chart series of every parameter set by params repr with ``CHART``: the bars and the orders,
+        # the strategies have no indicator lines here
+        self.chart_series = {}
+        self.strategy_name = self.strategy_cls.__name__
+        self.optimization = strategy_cls.optimize()
+        if params is None:
+            params = strategy_cls.params_list()
+        self.params = params_grid(strategy_cls, self.optimization, params)
+
+        self.start_cash = self.config.get('START_CASH', 1000000)
+        self.costs = CostModel(self.config.get('BUY_COMMISSION_RATE', 0.0005),
+                               self.config.get('SELL_COMMISSION_RATE', 0.0015),
+                               self.config.get('MINIMUM_COMMISSION', 5),
+                               self.config.get('STAMP_DUTY', 0.001))
+        self.metrics = self.config.get('METRICS') or DEFAULT_METRICS
+        self.trim_bars = self.config.get('TRIM_BARS', True)
+
+    def chart(self):
+        return 'CHART' in self.config and self.config['CHART'] is True
+
+    def simulate(self, dates, open_, close, signals, orders=None):
+        """
+        :param signals: (bars x parameter sets) array, the value the strategy acts
+            on at the next bar: > 0 enters, < 0 exits, NaN skips the bar
+        :param orders: list receiving the executed orders of every parameter set as a
+            list of (bar, price, size), the size negative for a sale
+        :return: (broker values, list of closed trade pnlcomm per parameter set, open trades)
+        """
+        n, count = signals.shape
+        start = np.datetime64(self.start_date, 'D')
+        end = np.datetime64(self.end_date, 'D')
+        in_window = ((dates >= start) & (dates <= end))[1:, None]
+        after_end = (dates > end)[1:, None]
+
+        # row t - 1 holds the orders operate would submit at bar t
+        signals = signals[:-1]
+        with np.errstate(invalid='ignore'):
+            enter = in_window & (signals > 0)
+            exit_ = (in_window & (signals < 0)) | (after_end & ~np.isnan(signals))
+        open_ = np.asarray(open_, dtype=np.float64).tolist()
+        close = np.asarray(close, dtype=np.float64)
+        start_cash = float(self.start_cash)
+        values = np.empty((n, count))
+        trades = []
+        holding = np.zeros(count, dtype=int)
+
+        # a position changes only on bars with orders, walk those and carry
+        # cash and position forward to the bars in between
+        for j in range(count):
+            rows = np.flatnonzero(enter[:, j] | exit_[:, j]) + 1
+            cash, size, entry_price, entry_comm = start_cash, 0, 0.0, 0.0
+            cash_rows = np.empty(len(rows))
+            size_rows = np.empty(len(rows))
+            pnlcomm = []
+            executed = []
+            for k, t in enumerate(rows.tolist()):
+                price = open_[t]
+                if size:
+                    if exit_[t - 1, j]:
+                        pnl = size * (price - entry_price)
+                        comm = self.costs.sell_cost(size * price)
+                        cash = cash + size * entry_price + pnl - comm
+                        pnlcomm.append(pnl - (entry_comm + comm))
+                        executed.append((t, price, -size))
+                        size = 0
+                elif enter[t - 1, j]:
+                    buy_size = self.costs.max_size(cash, price)
+                    if buy_size:
+                        entry_price = price
+                        entry_comm = self.costs.buy_cost(buy_size * price)
+                        cash = cash - buy_size * price - entry_comm
+                        size = buy_size
+                        executed.append((t, price, size))
+                cash_rows[k] = cash
+                size_rows[k] = size
+
+            last = np.searchsorted(rows, np.arange(n), side='right') - 1
+            started = last >= 0
+            values[:, j] = np.where(started, cash_rows[last], start_cash) + \
+                np.where(started, size_rows[last], 0.0) * close
+            trades.append(pnlcomm)
+            holding[j] = size > 0
+            if orders is not None:
+                orders.append(executed)
+
+        return values, trades, holding
+
+    def performance(self, symbol, name, dates, values, trades, total_open):
+        days = (self.end_date - self.start_date).days
+        metrics_record = []
+        window = stats.metric_window(dates, dates, self.start_date, self.end_date)
+        for i, metrics in enumerate(curve_metrics(dates, values, trades, total_open, self.start_cash, days,
+                                                  self.metrics, window)):
+            metrics.symbol = symbol
+            metrics.name = name
+            metrics.strategy = self.strategy_name
+            metrics.params = params_repr(self.strategy_cls, self.params[i])
+            if self.keep_curves:
+                self.curves[metrics.params] = (dates, values[:, i].copy(), list(trades[i]))
+            metrics_record.append(metrics.asdict())
+        return metrics_record
+
+    def run(self, symbol, name, bars=None, signals=None):
+        """
+        :param bars: the ``Bars`` of ``symbol`` when already loaded, read from the store otherwise
+        :param signals: the ``vector_signals`` of ``bars`` for the parameter grid when already
+            computed, the bars are then taken as they are
+        """
+        with timer.phase('load'):
+            if bars is None:
+                bars = load_bars(self.data_dir, symbol)
+            if self.trim_bars and signals is None:
+                window = self.strategy_cls.grid_window(self.params)
+                if window is not None:
+                    bars = bars.window(self.start_date, self.end_date, *window)
+            dates = np.asarray(bars.datetime)
+        with timer.phase('signals'):
+            if signals is None:
+                signals = self.strategy_cls.vector_signals(bars, self.params)
+        orders = [] if self.chart() else None
+        with timer.phase('run'):
+            values, trades, total_open = self.simulate(dates, np.asarray(bars.open), np.asarray(bars.close), signals,
+                                                       orders)
+        with timer.phase('performance'):
+            if orders is not None:
+                self.record_charts(bars, orders)
+            return self.performance(symbol, name, dates, values, trades, total_open)
+
+    def record_charts(self, bars, orders):
+        """
+        Keep the chart series of every parameter set: the bars of the backtest window and the executed orders.
+        """
+        first, last = bars.locate(self.start_date), bars.locate(self.end_date, side='right')
+        window = {name: np.asarray(getattr(bars, name))[first:last] for name in ('datetime', 'open', 'high', 'low',
+                                                                                 'close')}
+        for combo, executed in zip(self.params, orders):
+            executed = np.array(executed, dtype=np.float64).reshape(-1, 3)
+            self.chart_series[params_repr(self.strategy_cls, combo)] = dict(
+                window, lines=[], order_datetime=np.asarray(bars.datetime)[executed[:, 0].astype(np.int64)],
+                order_price=executed[:, 1], order_size=executed[:, 2])
@@ -0,0 +1,216 @@
+import math
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from backtesting.task import Task
+from backtesting.vectorized import VectorTask, params_grid, params_repr, curve_metrics
+from backtesting.feeds.akshare import load_bars
+from backtesting.feeds.arraydata import ArrayData
+from backtesting.report import Summary
+from backtesting.search import top
+from backtesting.timing import timer
+
+
+class Window:
+    """
+    A walk-forward step: the parameters are chosen on the in-sample dates
+    (``train_start`` to ``train_end``) and traded on the out-of-sample dates
+    right after them (``test_start`` to ``test_end``).
+    """
+
+    def __init__(self, index, train_start, train_end, test_start, test_end):
+        self.index = index
+        self.train_start = train_start
+        self.train_end = train_end
+        self.test_start = test_start
+        self.test_end = test_end
+
+    def dates(self, out_of_sample=False):
+        return (self.test_start, self.test_end) if out_of_sample else (self.train_start, self.train_end)
+
+    def asdict(self):
+        return {
+            'window': self.index,
+            'train_start': self.train_start,
+            'train_end': self.train_end,
+            'test_start': self.test_start,
+            'test_end': self.test_end,
+        }
+
+    def __repr__(self):
+        return self.asdict().__repr__()
+
+
+def add_months(day, months):
+    return (pd.Timestamp(day) + pd.DateOffset(months=months)).date()
+
+
+def walk_forward_windows(start_date, end_date, train_months, test_months, anchored=False):
+    """
+    Windows of ``train_months`` of in-sample dates followed by ``test_months`` of
+    out-of-sample dates, stepping by ``test_months`` from ``start_date`` so the
+    out-of-sample dates follow each other up to ``end_date``, the last ones cut
+    there. Anchored windows all train from ``start_date``, a step longer each.
+    """
+    windows = []
+    while True:
+        step = len(windows) * test_months
+        test_start = add_months(start_date, train_months + step)
+        if test_start > end_date:
+            return windows
+        train_start = start_date if anchored else add_months(start_date, step)
+        test_end = min(add_months(test_start, test_months) - timedelta(days=1), end_date)
+        windows.append(Window(len(windows), train_start, test_start - timedelta(days=1), test_start, test_end))
+
+
+def window_groups(windows, groups):
+    """
+    ``windows`` split into ``groups`` runs of consecutive windows, which share the most bars.
+    """
+    size = int(math.ceil(len(windows) / max(1, groups)))
+    return [windows[i:i + size] for i in range(0, len(windows), size)]
+
+
+class SpanTask(Task):
+    """
+    ``Task`` over bars spanning more dates than its backtest window: the feed holds
+    them all and delivers the window and its warm-up with ``fromdate`` and ``todate``,
+    so the cached indicators of the windows of one span are computed once.
+    """
+
+    def __init__(self, config, strategy_cls, params=None, keep_curves=False):
+        self.keep_curves = keep_curves
+        super(SpanTask, self).__init__(config, strategy_cls, params)
+
+    def feed(self, bars):
+        first, last = 0, len(bars)
+        if self.trim_bars:
+            window = self.strategy_cls.grid_window(params_grid(self.strategy_cls, self.optimization, self.params))
+            if window is not None:
+                first, last = bars.bounds(self.start_date, self.end_date, *window)
+        fromdate, todate = bars.datetime[[first, last - 1]].astype('datetime64[s]').tolist()
+        return ArrayData.from_bars(bars, fromdate=fromdate, todate=todate)
+
+
+def run_windows(conf, strategy_cls, symbol, name, bars, windows, grids, out_of_sample=False):
+    """
+    Run the parameter grid ``grids[i]`` of every window of ``windows`` on its in-sample
+    dates, or its out-of-sample ones, over one span of ``bars`` covering them all. The
+    backtrader engine computes the cached indicators of the span once for all the
+    windows, the vectorized engine the signals of all the grids.
+
+    :return: list of (window index, detail records, curves by params repr), the equity
+        curves being kept out of sample only; windows without bars of the symbol are left out
+    """
+    combos = {}
+    for grid in grids:
+        for combo in params_grid(strategy_cls, strategy_cls.optimize(), grid):
+            combos.setdefault(params_repr(strategy_cls, combo), combo)
+    dates = [window.dates(out_of_sample) for window in windows]
+    span = bars
+    if conf.get('TRIM_BARS', True):
+        window = strategy_cls.grid_window(list(combos.values()))
+        if window is not None:
+            span = bars.window(min(d[0] for d in dates), max(d[1] for d in dates), *window)
+    vectorized = conf.get('ENGINE', 'backtrader') == 'vectorized'
+    if vectorized:
+        with timer.phase('signals'):
+            signals = strategy_cls.vector_signals(span, list(combos.values()))
+        columns = {key: i for i, key in enumerate(combos)}
+
+    results = []
+    for window, (start_date, end_date), grid in zip(windows, dates, grids):
+        if span.locate(start_date) == span.locate(end_date, side='right'):
+            continue
+        window_conf = dict(conf, START_DATE=start_date, END_DATE=end_date)
+        if vectorized:
+            task = VectorTask(window_conf, strategy_cls, grid)
+            task.keep_curves = out_of_sample
+            first, last = 0, len(span)
+            trim = strategy_cls.grid_window(task.params) if task.trim_bars else None
+            if trim is not None:
+                first, last = span.bounds(start_date, end_date, *trim)
+            rows = signals[first:last][:, [columns[params_repr(strategy_cls, p)] for p in task.params]]
+            records = task.run(symbol, name, span.slice(first, last), rows)
+        else:
+            task = SpanTask(window_conf, strategy_cls, grid, out_of_sample)
+            records = task.run(symbol, name, span)
+        results.append((window.index, records, task.curves))
+    return results
+
+
+def in_sample(conf, strategy_cls, symbol, name, windows):
+    """
+    Run the parameter grid of the strategy on the in-sample dates of ``windows``,
+    loading the bars of ``symbol`` once. The grids run in this process, where the
+    indicator cache is.
+
+    :return: list of (window index, detail records)
+    """
+    conf = dict(conf, MAXCPUS=1, CHART=False)
+    bars = load_bars(conf.get('DATA_DIR'), symbol)
+    grids = [strategy_cls.params_list()] * len(windows)
+    return [(index, records) for index, records, _ in run_windows(conf, strategy_cls, symbol, name, bars,
+                                                                  windows, grids)]
+
+
+def out_of_sample(conf, strategy_cls, symbol, name, windows, chosen):
+    """
+    Run the parameter dict chosen for every window of ``windows`` on its out-of-sample dates.
+
+    :param chosen: the parameter dict of every window
+    :return: list of (window index, detail record, (dates, broker values, closed trade pnlcomm))
+    """
+    conf = dict(conf, MAXCPUS=1, CHART=False)
+    bars = load_bars(conf.get('DATA_DIR'), symbol)
+    results = []
+    for index, records, curves in run_windows(conf, strategy_cls, symbol, name, bars, windows, chosen, True):
+        record = records[0]
+        results.append((index, record, curves[record['params']]))
+    return results
+
+
+def choose(records, metric, days):
+    """
+    The best parameter set of the ``Summary`` of ``records`` by its ``metric``.
+
+    :return: (params repr, score), (None, None) without records
+    """
+    summary = Summary(days)
+    summary.add(records)
+    rows = [metrics.asdict() for metrics in summary.metrics()]
+    if not rows:
+        return None, None
+    best = top(rows, [row.get(metric) for row in rows], 1)[0]
+    return best['params'], best.get(metric)
+
+
+def stitch(windows, curves, start_cash, selected):
+    """
+    One ``DetailMetric`` of the out-of-sample windows traded one after the other. The
+    curve of a window is cut to its out-of-sample dates, with the position still open at
+    its end closed on its last date, and scaled by the value the windows before it ended
+    with, as is the net profit of its trades.
+
+    :param curves: (dates, broker values, closed trade pnlcomm) of every window, each run from ``start_cash``
+    :param selected: the ``METRICS`` to compute
+    """
+    scale = 1.0
+    dates = []
+    values = []
+    trades = []
+    for window, (curve_dates, curve_values, pnlcomm) in zip(windows, curves):
+        inside = (curve_dates >= np.datetime64(window.test_start, 'D')) & \
+                 (curve_dates <= np.datetime64(window.test_end, 'D'))
+        window_values = curve_values[inside]
+        if len(window_values):
+            window_values[-1] = curve_values[-1]
+        dates.append(curve_dates[inside])
+        values.append(window_values * scale)
+        trades.extend(pnl * scale for pnl in pnlcomm)
+        scale *= curve_values[-1] / start_cash
+    days = (windows[-1].test_end - windows[0].test_start).days
+    return curve_metrics(np.concatenate(dates), np.concatenate(values)[:, None], [trades], [0], start_cash, days,
+                         selected)[0]
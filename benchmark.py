@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks on synthetic bars, no network access needed:
+
+  python benchmark.py [--quick] [--baseline BASELINE.json] [--tolerance 0.2]
+
+Results are written as JSON to ``REPORT_DIR/benchmark`` (or ``--output``) and,
+with ``--baseline``, compared case by case with an earlier result file; the
+exit status is 1 when a case got slower than the tolerance allows.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import subprocess
+import multiprocessing
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import backtrader as bt
+
+import start
+from backtesting.task import Task
+from backtesting.analyzer import TradeList
+from backtesting.sizer import AllInSizerInt
+from backtesting.comminfo import StampDutyCommissionScheme
+from backtesting.indicators.zigzag import ZigZag
+from backtesting.feeds.store import BarStore
+from backtesting.feeds.akshare import feed_from_bars
+from backtesting.feeds.synthetic import synthetic_bars
+from backtesting.strategy.sma_cross import SMACrossStrategy
+from backtesting.strategy.price_sma_cross import PriceSMACrossStrategy
+from backtesting.strategy.zigzag import ZigZagStrategy
+from backtesting.utils import read_config
+
+# cases of the full and the --quick suite
+CASES = {
+    'full': dict(bars=(1000, 3000, 6000), grids=(1, 8, 32), symbols=8, workers=(1, os.cpu_count()), calls=200000),
+    'quick': dict(bars=(1000, 3000), grids=(1, 8), symbols=2, workers=(1,), calls=20000),
+}
+
+# modules imported by a fresh interpreter in the startup suite: the CLI and what a worker needs
+STARTUP_IMPORTS = ('start', 'backtesting.task')
+
+# fast x slow periods of the SMA cross grids
+GRIDS = {1: (1, 1), 8: (2, 4), 32: (4, 8)}
+
+
+class SMACrossGrid(SMACrossStrategy):
+    """
+    ``SMACrossStrategy`` swept over the grid given to ``Task`` whatever the config says.
+    """
+
+    @classmethod
+    def optimize(cls):
+        return True
+
+
+class ZigZagOnly(bt.Strategy):
+    params = (
+        ('dev_threshold', 5),
+        ('depth', 10),
+    )
+
+    def __init__(self):
+        self.zigzag = ZigZag(dev_threshold=self.p.dev_threshold, depth=self.p.depth)
+
+
+class FrequentTrader(bt.Strategy):
+    """
+    Enters every ``every`` bars and exits ``hold`` bars later, to load the trade analyzers.
+    """
+    params = (
+        ('every', 5),
+        ('hold', 3),
+    )
+
+    def __init__(self):
+        self.position_bar = 0
+
+    def next(self):
+        if not self.position:
+            if len(self) % self.p.every == 0:
+                self.buy(size=100)
+        elif len(self) - self.position_bar >= self.p.hold:
+            self.close()
+
+    def notify_order(self, order):
+        if order.status == order.Completed and order.isbuy():
+            self.position_bar = len(self)
+
+
+class OpenPrice:
+    """
+    The ``data.open`` the sizer reads, without a feed.
+    """
+
+    def __init__(self, price):
+        self.open = [price]
+
+
+class Benchmark:
+
+    def __init__(self, config, directory, repeat=3, quick=False):
+        self.config = config
+        self.directory = directory
+        self.repeat = repeat
+        self.cases = CASES['quick' if quick else 'full']
+        self.store = BarStore(os.path.join(directory, 'store'))
+        self.results = []
+
+    def bars(self, symbol, count):
+        """
+        ``count`` synthetic bars of ``symbol``, stored once.
+        """
+        key = '%s_%d' % (symbol, count)
+        if not self.store.has(key):
+            self.store.write(key, synthetic_bars(symbol, count))
+        return self.store.read(key)
+
+    def measure(self, name, case, fn):
+        """
+        Best wall time of ``repeat`` calls of ``fn``, which prepares its own inputs untimed
+        and returns the callable to time.
+        """
+        runs = []
+        for _ in range(self.repeat):
+            timed = fn()
+            with contextlib.redirect_stdout(io.StringIO()):
+                begin = time.perf_counter()
+                timed()
+                runs.append(time.perf_counter() - begin)
+        result = {'name': name, 'case': case, 'seconds': min(runs), 'runs': runs}
+        self.results.append(result)
+        print('%-10s %-60s %9.4fs' % (name, json.dumps(case, sort_keys=True), result['seconds']))
+        return result
+
+    def task(self):
+        config = dict(self.config, TRIM_BARS=False)
+        for count in self.cases['bars']:
+            bars = self.bars('600000', count)
+            for grid in self.cases['grids']:
+                fast, slow = GRIDS[grid]
+                params = {'fast_period': list(range(5, 5 + 5 * fast, 5)),
+                          'slow_period': list(range(50, 50 + 10 * slow, 10))}
+                case = {'strategy': 'SMACrossStrategy', 'bars': count, 'grid': grid}
+                self.measure('task', case, lambda: (lambda: Task(config, SMACrossGrid, params).run('600000', 'x', bars)))
+
+    def zigzag(self):
+        for count in self.cases['bars']:
+            bars = self.bars('600000', count)
+
+            def run():
+                cerebro = bt.Cerebro(stdstats=False)
+                cerebro.adddata(feed_from_bars(bars))
+                cerebro.addstrategy(ZigZagOnly)
+                return cerebro.run
+            self.measure('zigzag', {'bars': count}, run)
+
+    def sizer(self):
+        calls = self.cases['calls']
+        rng = np.random.default_rng(0)
+        prices = np.round(rng.uniform(2, 200, calls), 2).tolist()
+        cash = np.round(rng.uniform(1e4, 1e6, calls), 2).tolist()
+        comminfo = StampDutyCommissionScheme(0.0005, 0.0015, 5, 0.001)
+
+        def run_sizer():
+            sizer = AllInSizerInt(cheat_on_open=True)
+            sizer.set(None, bt.brokers.BackBroker())
+            datas = [OpenPrice(p) for p in prices]
+
+            def run():
+                for data, c in zip(datas, cash):
+                    sizer._getsizing(comminfo, c, data, True)
+            return run
+        self.measure('sizer', {'sizer': 'AllInSizerInt', 'calls': calls}, run_sizer)
+
+        def run_commission():
+            sizes = [int(c // p) for c, p in zip(cash, prices)]
+
+            def run():
+                for size, price in zip(sizes, prices):
+                    comminfo.getcommission(size, price)
+                    comminfo.getcommission(-size, price)
+            return run
+        self.measure('commission', {'scheme': 'StampDutyCommissionScheme', 'calls': 2 * calls}, run_commission)
+
+    def tradelist(self):
+        for count in self.cases['bars']:
+            bars = self.bars('600000', count)
+            for analyzed in (False, True):
+                def run():
+                    cerebro = bt.Cerebro(stdstats=False)
+                    cerebro.adddata(feed_from_bars(bars))
+                    cerebro.addstrategy(FrequentTrader)
+                    if analyzed:
+                        cerebro.addanalyzer(TradeList, _name='tradelist')
+                    # TradeList reads the trade history, as Task runs it
+                    return lambda: cerebro.run(tradehistory=True)
+                self.measure('tradelist', {'bars': count, 'analyzer': analyzed}, run)
+
+    def end_to_end(self):
+        symbols = {'6%05d' % i: 'synthetic %d' % i for i in range(self.cases['symbols'])}
+        data_dir = os.path.join(self.directory, 'e2e')
+        store = BarStore(os.path.join(data_dir, 'store'))
+        for symbol in symbols:
+            if not store.has(symbol):
+                store.write(symbol, synthetic_bars(symbol, 3000))
+        strategies = [PriceSMACrossStrategy, ZigZagStrategy]
+        for workers in self.cases['workers']:
+            def run():
+                report_dir = os.path.join(self.directory, 'report')
+                shutil.rmtree(report_dir, ignore_errors=True)
+                config = dict(self.config, DATA_DIR=data_dir, REPORT_DIR=report_dir, WORKERS=workers,
+                              RESULT_CACHE_SIZE=0, TIMINGS=False, PROFILE_RATE=0, LOG_LEVEL='OFF')
+
+                return lambda: start.backtest_symbols(config, strategies, symbols=symbols)
+            self.measure('e2e', {'symbols': len(symbols), 'bars': 3000, 'workers': workers,
+                                 'strategies': [s.__name__ for s in strategies]}, run)
+
+    def startup(self):
+        for module in STARTUP_IMPORTS:
+            command = [sys.executable, '-c', 'import %s' % module]
+            self.measure('startup', {'import': module},
+                         lambda: (lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL)))
+
+        def spawn():
+            # a spawned worker imports the main module again before its first task,
+            # as the workers of every platform but Linux do
+            def first_task():
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    executor.submit(os.getpid).result()
+            return first_task
+        self.measure('startup', {'worker': 'spawn'}, spawn)
+
+    def run(self, only=None):
+        suites = ('startup', 'task', 'zigzag', 'sizer', 'tradelist', 'end_to_end')
+        for suite in suites:
+            if only is None or suite in only:
+                getattr(self, suite)()
+        return self.results
+
+
+def case_key(result):
+    return result['name'] + ' ' + json.dumps(result['case'], sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print every case against the baseline.
+
+    :return: the cases slower than the baseline by more than ``tolerance``
+    """
+    base = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        key = case_key(result)
+        if key not in base:
+            print('%-72s %9.4fs       new' % (key, result['seconds']))
+            continue
+        ratio = result['seconds'] / base[key]['seconds']
+        slower = ratio > 1 + tolerance
+        if slower:
+            regressions.append(key)
+        print('%-72s %9.4fs %8.2fx%s' % (key, result['seconds'], ratio, ' REGRESSION' if slower else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks on synthetic bars')
+    parser.add_argument('--quick', action='store_true', help='fewer and smaller cases')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every case, the best one counts')
+    parser.add_argument('--only', nargs='+', choices=('startup', 'task', 'zigzag', 'sizer', 'tradelist', 'end_to_end'))
+    parser.add_argument('--output', help='result file, REPORT_DIR/benchmark/<time>.json by default')
+    parser.add_argument('--baseline', help='earlier result file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown allowed against the baseline')
+    args = parser.parse_args()
+
+    config = read_config()
+    directory = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        results = Benchmark(config, directory, args.repeat, args.quick).run(args.only)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    output = args.output or os.path.join(config.get('REPORT_DIR'), 'benchmark',
+                                         datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    if os.path.dirname(output) and not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as f:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                   'platform': platform.platform(), 'cpus': os.cpu_count(), 'quick': args.quick,
+                   'repeat': args.repeat, 'results': results}, f, indent=2)
+    print('results written to %s' % output)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('%d case(s) slower than the baseline by more than %.0f%%' % (len(regressions), 100 * args.tolerance))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Render the charts of a backtest run from the chart series its workers kept (``CHART``):
+
+  python charts.py [RUN_ID] [--top 10] [--metric sharpe_ratio] [--strategies ZigZagStrategy ...] [--symbols 600000 ...]
+
+The latest run by default. Charts go to ``REPORT_DIR/chart/<run id>``.
+"""
+
+import os
+import glob
+import argparse
+
+from backtesting.charts import render_charts
+from backtesting.utils import read_config
+
+
+def main():
+    config = read_config()
+    parser = argparse.ArgumentParser(description='render the charts of a backtest run')
+    parser.add_argument('run_id', nargs='?', help='run to chart, the latest one by default')
+    parser.add_argument('--top', type=int, default=config.get('CHART_TOP', 10),
+                        help='backtests of every strategy to chart')
+    parser.add_argument('--metric', default=config.get('CHART_METRIC', 'sharpe_ratio'),
+                        help='detail column the backtests are ranked by')
+    parser.add_argument('--strategies', nargs='+', help='strategy class names, all those of the run by default')
+    parser.add_argument('--symbols', nargs='+', help='symbols to chart, all those of the run by default')
+    args = parser.parse_args()
+
+    run_id = args.run_id
+    if run_id is None:
+        journals = sorted(glob.glob(os.path.join(config.get('REPORT_DIR'), 'journal', '*.jsonl')))
+        if not journals:
+            parser.error('no run under %s' % os.path.join(config.get('REPORT_DIR'), 'journal'))
+        run_id = os.path.splitext(os.path.basename(journals[-1]))[0]
+    render_charts(config, run_id, args.strategies, args.top, args.metric, args.symbols)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Adaptive parameter search of a strategy over the index symbols, instead of its full grid:
+
+  python search.py SMACrossStrategy [--method hyperband] [--samples 64] [--symbols 600000 600036]
+
+The search space is the ``params_list()`` of the strategy. A candidate evaluated on a
+budget ``b`` (0 to 1) runs on the first ``b`` of the symbols, shuffled once, and on the
+last ``b`` of the backtest window, and is scored by the ``SEARCH_METRIC`` of its summary
+row. Every evaluated point is appended to ``REPORT_DIR/search/<run id>.jsonl``, and the
+points evaluated on the full budget are saved best first to ``REPORT_DIR/search``.
+"""
+
+import os
+import json
+import math
+import argparse
+import importlib
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import start
+from backtesting.search import search, search_space, METHODS
+from backtesting.scheduler import WorkUnit, sub_grids
+from backtesting.vectorized import params_repr
+from backtesting.feeds.akshare import load_bars
+from backtesting.results import result_cache
+from backtesting.report import Summary, SUMMARY_COLUMNS
+from backtesting.journal import new_run_id
+from backtesting.feeds.universe import universe
+from backtesting.utils import read_config, df_to_csv
+
+# columns of a point of the search log, its summary metrics and the step it was evaluated in
+POINT_COLUMNS = SUMMARY_COLUMNS + ['method', 'step', 'budget', 'symbols', 'start_date', 'end_date', 'candidate',
+                                   'score']
+
+
+def evaluate_symbol(conf, strategy_cls, grids, symbol, name):
+    bars = load_bars(conf.get('DATA_DIR'), symbol)
+    cache = result_cache(conf)
+    records = []
+    for grid in grids:
+        if cache is None:
+            records.extend(start.Engine(conf, strategy_cls, grid)(symbol, name, bars))
+        else:
+            records.extend(start.run_cached(conf, cache, strategy_cls, grid, WorkUnit(symbol, name, [], 0), bars, {},
+                                            {}))
+    return records
+
+
+class Evaluator:
+    """
+    The ``evaluate`` of the search methods: runs candidates on the share of the
+    symbols and of the backtest window given by the budget in the process pool,
+    scores them with the ``Summary`` metric ``metric`` and logs every point.
+    A point already evaluated on the same budget is not run again.
+    """
+
+    def __init__(self, config, strategy_cls, symbols, executor, metric, log_path, method, seed=None):
+        self.config = config
+        self.strategy_cls = strategy_cls
+        # shuffled once, so a larger budget adds symbols to the ones already run
+        items = list(symbols.items())
+        self.symbols = [items[i] for i in np.random.default_rng(seed).permutation(len(items))]
+        self.executor = executor
+        self.metric = metric
+        self.log_path = log_path
+        self.method = method
+        self.defaults = dict(strategy_cls.params._getitems())
+        # (params repr, budget) -> score
+        self.scores = {}
+        self.points = []
+        self.step = 0
+
+    def window(self, budget):
+        start_date, end_date = self.config.get('START_DATE'), self.config.get('END_DATE')
+        days = int(math.ceil((end_date - start_date).days * budget))
+        return end_date - timedelta(days=days), end_date
+
+    def __call__(self, candidates, budget):
+        self.step += 1
+        reprs = [params_repr(self.strategy_cls, dict(self.defaults, **candidate)) for candidate in candidates]
+        missing = [c for c, r in zip(candidates, reprs) if (r, budget) not in self.scores]
+        if missing:
+            self.run(missing, budget)
+        return [self.scores[(r, budget)] for r in reprs]
+
+    def run(self, candidates, budget):
+        symbols = self.symbols[:max(1, int(math.ceil(len(self.symbols) * budget)))]
+        start_date, end_date = self.window(budget)
+        # the evaluations are scored, not charted
+        conf = dict(self.config, START_DATE=start_date, CHART=False)
+        grids = sub_grids(candidates)
+        futures = [(symbol, self.executor.submit(evaluate_symbol, conf, self.strategy_cls, grids, symbol, name))
+                   for symbol, name in symbols]
+        summary = Summary((end_date - start_date).days)
+        for symbol, future in futures:
+            try:
+                summary.add(future.result())
+            except Exception as exc:
+                print('%s generated an exception: %s' % (symbol, exc))
+        metrics = {m.params: m.asdict() for m in summary.metrics(self.strategy_cls.__name__)}
+
+        scores = []
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            for candidate in candidates:
+                params = params_repr(self.strategy_cls, dict(self.defaults, **candidate))
+                row = metrics.get(params, {'strategy': self.strategy_cls.__name__, 'params': params})
+                score = row.get(self.metric)
+                self.scores[(params, budget)] = score
+                scores.append(score)
+                point = dict(row, method=self.method, step=self.step, budget=budget, symbols=len(symbols),
+                             start_date=start_date, end_date=end_date, candidate=candidate, score=score)
+                self.points.append(point)
+                f.write(json.dumps(point, ensure_ascii=False, default=str) + '\n')
+        best = max((score for score in scores if score is not None), default=None)
+        print('step %d: %d candidates on %d symbols from %s, best %s %s' % (
+            self.step, len(candidates), len(symbols), start_date, self.metric, best))
+
+
+def main():
+    config = read_config()
+    parser = argparse.ArgumentParser(description='adaptive parameter search of a strategy')
+    parser.add_argument('strategy', choices=sorted(config.get('STRATEGIES')), help='strategy class name')
+    parser.add_argument('--method', choices=METHODS, default=config.get('SEARCH_METHOD', 'hyperband'))
+    parser.add_argument('--samples', type=int, default=config.get('SEARCH_SAMPLES', 64),
+                        help='candidates of random, halving and tpe, of the first hyperband bracket')
+    parser.add_argument('--metric', default=config.get('SEARCH_METRIC', 'annualized_return_percentage'),
+                        help='summary column to maximize')
+    parser.add_argument('--seed', type=int, default=config.get('SEARCH_SEED'))
+    parser.add_argument('--symbols', nargs='+', help='symbols to search on, the UNIVERSE by default')
+    args = parser.parse_args()
+
+    strategy_cls = getattr(importlib.import_module(config.get('STRATEGIES')[args.strategy]), args.strategy)
+    if not strategy_cls.optimize():
+        parser.error('%s runs a single parameter set, set its OPTIMIZATION to search' % args.strategy)
+    symbols = {symbol: symbol for symbol in args.symbols} if args.symbols else universe(config)
+
+    run_id = new_run_id()
+    directory = os.path.join(config.get('REPORT_DIR'), 'search')
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    log_path = os.path.join(directory, '%s %s.jsonl' % (args.strategy, run_id))
+    print('search %s %s of %s, logged to %s' % (args.method, run_id, args.strategy, log_path))
+
+    workers = config.get('WORKERS') or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        evaluator = Evaluator(config, strategy_cls, symbols, executor, args.metric, log_path, args.method, args.seed)
+        search(args.method, search_space(strategy_cls.params_list()), evaluator, args.samples,
+               config.get('SEARCH_MIN_BUDGET', 0.1), config.get('SEARCH_ETA', 3), args.seed)
+
+    # the summary columns stay when every point of the full budget failed and has none of them
+    points = pd.DataFrame([p for p in evaluator.points if p['budget'] == 1.0], columns=POINT_COLUMNS)
+    print('%d points evaluated, %d on the full budget' % (len(evaluator.points), len(points)))
+    if not points.empty:
+        points = points.drop(columns=['candidate']).sort_values('score', ascending=False, na_position='last')
+        df_to_csv(points, directory, args.strategy)
+        print(points[['params', 'score', 'net_profit_percentage', 'max_drawdown', 'sharpe_ratio_a']].head(10))
+
+
+if __name__ == '__main__':
+    main()
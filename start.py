@@ -2,80 +2,358 @@
 # coding: utf-8
 
 import os
+import pickle
+import argparse
 import importlib
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
 
-import pandas as pd
 from backtesting.task import Task
-from backtesting.utils import read_config, index_stock_cons, df_to_csv
+from backtesting.batch import BatchTask
+from backtesting.vectorized import VectorTask, params_grid, params_repr
+from backtesting.feeds.akshare import load_bars, fetch_akshare
+from backtesting.feeds.refresh import refresh
+from backtesting.feeds.universe import universe
+from backtesting.utils import read_config, df_to_csv
+from backtesting.scheduler import Scheduler, BatchUnit, work_units, batch_units, symbol_bars, sub_grids
+from backtesting.results import result_cache
+from backtesting.journal import Journal, new_run_id
+from backtesting.report import DetailWriter, Summary
+from backtesting.tradelog import TradeLog
+from backtesting.chartlog import ChartLog
+from backtesting.charts import render_charts
+from backtesting.eventlog import event_log, configure_events, merge_events, INFO
+from backtesting.timing import timer, timing_log, configure_timing, timing_report, profiled, profile, profile_report
 
-config = read_config()
 
-
-def start():
-    start_date = config.get('START_DATE')
-    end_date = config.get('END_DATE')
-    days = (end_date - start_date).days
-    summary_list = []
-    strategies = config.get('STRATEGIES')
-    for strategy_cls_name, module in strategies.items():
-        strategy_cls = getattr(importlib.import_module(module), strategy_cls_name)
-        detail_report = backtest_symbols(strategy_cls)
-        if detail_report is None or detail_report.empty:
-            continue
-        df = detail_report.groupby(by=['strategy', 'params'], axis=0).agg(
-            {'won_total': 'sum', 'total_closed': 'sum', 'pnl_net_total': 'sum',
-             'net_profit_percentage': 'mean', 'max_drawdown': 'max',
-             'sharpe_ratio_a': 'mean'})
-        df['strike_rate'] = (df['won_total'].astype(float) / df['total_closed'].astype(float)).fillna(0)
-        df['annualized_return_percentage'] = df['net_profit_percentage'] / days * 365
-        summary_list.append(df)
-    if summary_list:
-        summary_report = pd.concat(summary_list)
-        summary_report.reset_index(inplace=True)
+def start(config, refresh_data=False, run_id=None, resume=False):
+    strategies = []
+    for strategy_cls_name, module in config.get('STRATEGIES').items():
+        strategies.append(getattr(importlib.import_module(module), strategy_cls_name))
+    summary = backtest_symbols(config, strategies, refresh_data, run_id, resume)
+    summary_report = summary.frame()
+    if not summary_report.empty:
         report_dir = config.get('REPORT_DIR')
         df_to_csv(summary_report, report_dir, 'summary')
 
 
-def backtest_symbols(strategy_cls):
-    symbols = index_stock_cons('000300')
+def backtest_symbols(config, strategies, refresh_data=False, run_id=None, resume=False, symbols=None):
+    """
+    Run every strategy of ``strategies`` on the index symbols in one pool:
+    a worker loads a symbol once for all the strategies of a unit.
+
+    Results are streamed as units complete: journaled under
+    ``REPORT_DIR/journal/<run_id>.jsonl``, appended to the detail report of
+    their strategy and added to the summary, so the main process never holds
+    the detail records.
+
+    :param refresh_data: update the stored bars first
+    :param resume: skip the units already in the journal of ``run_id``
+    :param symbols: dict of symbol to name, the ``UNIVERSE`` by default
+
+    With ``BATCH_SIZE``, the backtrader engine runs the units of up to that many
+    symbols in one Cerebro (``BatchTask``).
+
+    Workers log events at ``LOG_LEVEL`` to their own part under
+    ``REPORT_DIR/log/<run_id>``, merged into ``events.jsonl`` at the end, and
+    the time of every phase of their units to ``REPORT_DIR/timing/<run_id>``,
+    flattened into ``timings.csv``. Units picked by ``PROFILE_RATE`` are
+    profiled into ``REPORT_DIR/profile/<run_id>``. With ``CHART``, they keep the
+    chart series of their backtests under ``REPORT_DIR/chart_log``, and the charts
+    of the best ones are rendered once the run is done (``render_charts``).
+    :return: the ``Summary`` of the run
+    """
+    if symbols is None:
+        symbols = universe(config)
     # symbols = {'601318': '中国平安', '601336': '新华保险', '603283': '赛腾股份', '002557': '洽洽食品',
     #            '002384': '东山精密', '000582': '海康威视'}
 
-    record_list = []
-    workers = os.cpu_count()
-    with ProcessPoolExecutor(max_workers=workers) as executor:
-        engine = Engine(config, strategy_cls)
-        future_to_symbol = {executor.submit(engine, symbol, name): symbol for symbol, name in symbols.items()}
-        for future in as_completed(future_to_symbol):
-            symbol = future_to_symbol[future]
-            try:
-                res = future.result()
-                record_list.extend(res)
-            except Exception as exc:
-                print('%s generated an exception: %s' % (symbol, exc))
-            else:
-                print('%s have completed' % symbol)
-    if not record_list:
-        return None
-
-    df = pd.DataFrame(record_list)
-    report_dir = config.get('REPORT_DIR')
-    strategy_dir = os.path.join(report_dir, 'strategy')
-    prefix = strategy_cls.__name__
-    df_to_csv(df, strategy_dir, prefix)
-    return df
+    if refresh_data:
+        refresh(config.get('DATA_DIR'), symbols, fetch_akshare)
+
+    workers = config.get('WORKERS') or os.cpu_count()
+    # the vectorized engine runs a whole grid at once, splitting it only repeats data loading
+    chunk_size = config.get('CHUNK_SIZE', 0) if config.get('ENGINE', 'backtrader') != 'vectorized' else 0
+    batch_size = config.get('BATCH_SIZE', 0) if config.get('ENGINE', 'backtrader') != 'vectorized' else 0
+    bars = symbol_bars(config.get('DATA_DIR'), symbols)
+    units = work_units(symbols, bars, strategies, chunk_size)
+    cache = result_cache(config)
+    if cache is not None:
+        cache.evict()
+
+    days = (config.get('END_DATE') - config.get('START_DATE')).days
+    summary = Summary(days)
+    strategy_dir = os.path.join(config.get('REPORT_DIR'), 'strategy')
+    writers = {strategy_cls.__name__: DetailWriter(strategy_dir, strategy_cls.__name__) for strategy_cls in strategies}
+
+    def collect(records):
+        for strategy_name, writer in writers.items():
+            writer.write([record for record in records if record['strategy'] == strategy_name])
+        summary.add(records)
+
+    run_id = run_id or new_run_id()
+    journal = Journal(os.path.join(config.get('REPORT_DIR'), 'journal'), run_id)
+    if resume:
+        # the journal keeps the units of a batch apart, the units left are batched again
+        keys = set(unit.key for unit in units)
+        for key, records in journal.entries():
+            if key in keys:
+                keys.remove(key)
+                collect(records)
+        units = [unit for unit in units if unit.key in keys]
+        print('run %s resumed, %d units left' % (run_id, len(units)))
+    else:
+        print('run %s' % run_id)
+    units = batch_units(units, batch_size)
+
+    try:
+        with journal, ProcessPoolExecutor(max_workers=workers) as executor:
+            scheduler = Scheduler(executor, workers * config.get('PENDING_PER_WORKER', 2))
+            failed = []
+            for unit, res, exc, elapsed in scheduler.run(run_unit, units, config, run_id):
+                if exc is None:
+                    journal_units(journal, unit, res)
+                    collect(res)
+                elif isinstance(unit, BatchUnit):
+                    failed.extend(unit.units)
+            if failed:
+                # a symbol failing its batch takes the others down with it, run them one by one
+                print('running the %d units of the failed batches one by one' % len(failed))
+                for unit, res, exc, elapsed in scheduler.run(run_unit, failed, config, run_id):
+                    if exc is None:
+                        journal_units(journal, unit, res)
+                        collect(res)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        trade_log = TradeLog(os.path.join(config.get('REPORT_DIR'), 'trade_log'))
+        for strategy_cls in strategies:
+            trade_log.build_index(strategy_cls.__name__, run_id)
+        merge_events(os.path.join(config.get('REPORT_DIR'), 'log', run_id))
+        timings = timing_report(os.path.join(config.get('REPORT_DIR'), 'timing', run_id))
+        if not timings.empty:
+            print(timings.groupby('phase')[['wall', 'cpu']].sum().sort_values('wall', ascending=False).round(1))
+        profile_report(os.path.join(config.get('REPORT_DIR'), 'profile', run_id))
+    if config.get('CHART') is True:
+        render_charts(config, run_id, [strategy_cls.__name__ for strategy_cls in strategies])
+    return summary
+
+
+def journal_units(journal, unit, records):
+    """
+    Journal the records of a completed unit, one entry per unit of a ``BatchUnit``
+    so a run resumes whatever the batches.
+    """
+    if not isinstance(unit, BatchUnit):
+        journal.append(unit.key, records)
+        return
+    for member in unit.units:
+        journal.append(member.key, [record for record in records if record['symbol'] == member.symbol])
 
 
 class Engine(object):
 
-    def __init__(self, conf, strategy_cls):
-        self.task = Task(conf, strategy_cls)
+    def __init__(self, conf, strategy_cls, params=None):
+        if conf.get('ENGINE', 'backtrader') == 'vectorized':
+            self.task = VectorTask(conf, strategy_cls, params)
+        else:
+            self.task = Task(conf, strategy_cls, params)
 
-    def __call__(self, symbol, name):
-        metrics_record = self.task.run(symbol, name)
+    def __call__(self, symbol, name, bars=None):
+        metrics_record = self.task.run(symbol, name, bars)
         return metrics_record
 
 
+def run_unit(conf, run_id, unit):
+    configure_events(conf, run_id)
+    configure_timing(conf, run_id)
+    run = run_batch if isinstance(unit, BatchUnit) else run_jobs
+    try:
+        if profiled(conf, unit.key):
+            # run the grids in this process, the profile would only see the optimization pool otherwise
+            conf = dict(conf, MAXCPUS=1)
+            with profile(os.path.join(conf.get('REPORT_DIR'), 'profile', run_id), unit.key):
+                return run(conf, run_id, unit)
+        return run(conf, run_id, unit)
+    finally:
+        # the parent merges the event and timing parts once the pool is done
+        event_log.flush()
+        timing_log.flush()
+
+
+def run_jobs(conf, run_id, unit):
+    with timer.phase('load'):
+        bars = load_bars(conf.get('DATA_DIR'), unit.symbol)
+    unit_phases = timer.reset()
+    cache = result_cache(conf)
+    metrics_record = []
+    trade_lists = {}
+    chart_series = {}
+    for strategy_cls, params, chunk, chunks in unit.jobs:
+        strategy_trade_lists = trade_lists.setdefault(strategy_cls.__name__, {})
+        strategy_chart_series = chart_series.setdefault(strategy_cls.__name__, {})
+        if cache is None:
+            engine = Engine(conf, strategy_cls, params)
+            metrics_record.extend(engine(unit.symbol, unit.name, bars))
+            strategy_trade_lists.update(engine.task.trade_lists)
+            strategy_chart_series.update(engine.task.chart_series)
+        else:
+            metrics_record.extend(run_cached(conf, cache, strategy_cls, params, unit, bars, strategy_trade_lists,
+                                             strategy_chart_series))
+        record_timing(unit, strategy_cls.__name__, '%s %d/%d' % (params, chunk + 1, chunks), timer.reset())
+    with timer.phase('trade_log'):
+        trade_log = TradeLog(os.path.join(conf.get('REPORT_DIR'), 'trade_log'))
+        for strategy_name, strategy_trade_lists in trade_lists.items():
+            trade_log.write(strategy_name, run_id, unit.key, unit.symbol, strategy_trade_lists)
+    with timer.phase('chart_log'):
+        chart_log = ChartLog(os.path.join(conf.get('REPORT_DIR'), 'chart_log'))
+        for strategy_name, strategy_chart_series in chart_series.items():
+            chart_log.write(strategy_name, run_id, unit.key, unit.symbol, strategy_chart_series)
+    if timing_log.info:
+        # what sending the records back to the parent costs the worker
+        with timer.phase('pickle'):
+            pickle.dumps(metrics_record, protocol=pickle.HIGHEST_PROTOCOL)
+    unit_phases.update(timer.reset())
+    record_timing(unit, '', '', unit_phases)
+    return metrics_record
+
+
+def run_batch(conf, run_id, batch):
+    """
+    ``run_jobs`` for a ``BatchUnit``: every job runs on all the symbols of the batch
+    in one ``BatchTask``. With the result cache, a symbol missing any parameter set
+    of a job runs the whole job again.
+    """
+    symbols = {unit.symbol: unit.name for unit in batch.units}
+    with timer.phase('load'):
+        bars = {symbol: load_bars(conf.get('DATA_DIR'), symbol) for symbol in symbols}
+    unit_phases = timer.reset()
+    cache = result_cache(conf)
+    fingerprints = {symbol: bars[symbol].fingerprint() for symbol in symbols} if cache is not None else {}
+    metrics_record = []
+    # trade lists and chart series by (strategy name, symbol), then by params repr
+    trade_lists = {}
+    chart_series = {}
+    for strategy_cls, params, chunk, chunks in batch.jobs:
+        symbol_trade_lists = {symbol: trade_lists.setdefault((strategy_cls.__name__, symbol), {}) for symbol in symbols}
+        symbol_chart_series = {symbol: chart_series.setdefault((strategy_cls.__name__, symbol), {})
+                               for symbol in symbols}
+        cached = {}
+        missing = symbols
+        if cache is not None:
+            for unit in batch.units:
+                cached[unit.symbol] = cached_records(conf, cache, strategy_cls, params, unit,
+                                                     fingerprints[unit.symbol], symbol_trade_lists[unit.symbol])
+            missing = {symbol: name for symbol, name in symbols.items() if cached[symbol][2]}
+        if missing:
+            task = BatchTask(conf, strategy_cls, params)
+            results = task.run(missing, bars)
+        for symbol in symbols:
+            if symbol in missing:
+                symbol_chart_series[symbol].update(task.chart_series[symbol])
+            if cache is None:
+                metrics_record.extend(results[symbol])
+                symbol_trade_lists[symbol].update(task.trade_lists[symbol])
+                continue
+            keys, records, _ = cached[symbol]
+            if symbol in missing:
+                cache_records(conf, cache, strategy_cls, fingerprints[symbol], results[symbol],
+                              task.trade_lists[symbol], records, symbol_trade_lists[symbol])
+            metrics_record.extend(records[key] for key in keys if key in records)
+        record_timing(batch, strategy_cls.__name__, '%s %d/%d' % (params, chunk + 1, chunks), timer.reset())
+    with timer.phase('trade_log'):
+        trade_log = TradeLog(os.path.join(conf.get('REPORT_DIR'), 'trade_log'))
+        # the parts of the trade log are those of the units run one by one
+        for unit in batch.units:
+            for strategy_cls, _, _, _ in batch.jobs:
+                trade_log.write(strategy_cls.__name__, run_id, unit.key, unit.symbol,
+                                trade_lists[(strategy_cls.__name__, unit.symbol)])
+    with timer.phase('chart_log'):
+        chart_log = ChartLog(os.path.join(conf.get('REPORT_DIR'), 'chart_log'))
+        for unit in batch.units:
+            for strategy_cls, _, _, _ in batch.jobs:
+                chart_log.write(strategy_cls.__name__, run_id, unit.key, unit.symbol,
+                                chart_series[(strategy_cls.__name__, unit.symbol)])
+    if timing_log.info:
+        with timer.phase('pickle'):
+            pickle.dumps(metrics_record, protocol=pickle.HIGHEST_PROTOCOL)
+    unit_phases.update(timer.reset())
+    record_timing(batch, '', '', unit_phases)
+    return metrics_record
+
+
+def record_timing(unit, strategy, params, phases):
+    if timing_log.info:
+        timing_log.emit(INFO, 'timing', unit=unit.key, symbol=unit.symbol, strategy=strategy, params=params,
+                        phases=phases)
+
+
+def run_cached(conf, cache, strategy_cls, params, unit, bars, trade_lists, chart_series):
+    """
+    Run the parameter sets of ``params`` missing from the result cache only,
+    the others are taken from the cache with their trade lists.
+
+    :param trade_lists: dict receiving the trade list of every parameter set by params repr
+    :param chart_series: dict receiving the chart series of every parameter set run by params repr,
+        the cached ones have none
+    """
+    fingerprint = bars.fingerprint()
+    keys, records, missing = cached_records(conf, cache, strategy_cls, params, unit, fingerprint, trade_lists)
+
+    if strategy_cls.optimize():
+        grids = sub_grids(missing)
+    else:
+        grids = [params] if missing else []
+    for grid in grids:
+        engine = Engine(conf, strategy_cls, grid)
+        cache_records(conf, cache, strategy_cls, fingerprint, engine(unit.symbol, unit.name, bars),
+                      engine.task.trade_lists, records, trade_lists)
+        chart_series.update(engine.task.chart_series)
+    return [records[key] for key in keys if key in records]
+
+
+def cached_records(conf, cache, strategy_cls, params, unit, fingerprint, trade_lists):
+    """
+    Look the parameter sets of ``params`` up in the result cache.
+
+    :param trade_lists: dict receiving the trade list of every cached parameter set by params repr
+    :return: the cache keys of the parameter sets, the cached records by key and the
+        parameter dicts missing from the cache
+    """
+    records = {}
+    keys = []
+    missing = []
+    for combo in params_grid(strategy_cls, strategy_cls.optimize(), params):
+        key = cache.key(fingerprint, strategy_cls, params_repr(strategy_cls, combo), conf)
+        keys.append(key)
+        with timer.phase('cache'):
+            entry = cache.get(key)
+        if entry is None:
+            missing.append(combo)
+            continue
+        record, trade_list = entry
+        records[key] = dict(record, symbol=unit.symbol, name=unit.name)
+        if trade_list is not None:
+            trade_lists[record['params']] = trade_list
+    return keys, records, missing
+
+
+def cache_records(conf, cache, strategy_cls, fingerprint, metrics_record, task_trade_lists, records, trade_lists):
+    """
+    Put the records of a run with their trade lists in the result cache and in ``records`` by key.
+    """
+    for record in metrics_record:
+        key = cache.key(fingerprint, strategy_cls, record['params'], conf)
+        trade_list = task_trade_lists.get(record['params'])
+        with timer.phase('cache'):
+            cache.put(key, record, trade_list)
+        if trade_list is not None:
+            trade_lists[record['params']] = trade_list
+        records[key] = record
+
+
 if __name__ == '__main__':
-    start()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--refresh', action='store_true', help='update the stored bars of the symbols before backtesting')
+    parser.add_argument('--resume', metavar='RUN_ID', help='resume an interrupted run, skipping its completed units')
+    args = parser.parse_args()
+    start(read_config(), refresh_data=args.refresh, run_id=args.resume, resume=args.resume is not None)
@@ -0,0 +1,34 @@
+from datetime import date
+
+import pytest
+
+from backtesting.feeds.store import BarStore
+from backtesting.feeds.synthetic import synthetic_bars
+
+CONFIG = {
+    'START_DATE': date(2017, 1, 1),
+    'END_DATE': date(2022, 12, 31),
+    'START_CASH': 1000000,
+    'STAMP_DUTY': 0.005,
+    'BUY_COMMISSION_RATE': 0.0005,
+    'SELL_COMMISSION_RATE': 0.0015,
+    'MINIMUM_COMMISSION': 5,
+    'CHEAT_ON_OPEN': True,
+    'TRADE_HISTORY': True,
+    'MAXCPUS': 1,
+}
+
+
+@pytest.fixture
+def config(tmp_path):
+    return dict(CONFIG, DATA_DIR=str(tmp_path))
+
+
+@pytest.fixture(scope='session')
+def bars(tmp_path_factory):
+    """
+    1500 synthetic bars of 600000 from a ``BarStore``.
+    """
+    store = BarStore(str(tmp_path_factory.mktemp('store')))
+    store.write('600000', synthetic_bars('600000', 1500))
+    return store.read('600000')
@@ -0,0 +1,45 @@
+import pytest
+import pandas as pd
+
+from backtesting.task import Task
+from backtesting.batch import BatchTask
+from backtesting.feeds.store import BarStore
+from backtesting.feeds.synthetic import synthetic_bars
+from backtesting.strategy.sma_cross import SMACrossStrategy
+
+from test_vectorized import same
+
+PARAMS = {'fast_period': [5, 10], 'slow_period': [30]}
+
+
+@pytest.fixture(scope='module')
+def symbols(tmp_path_factory):
+    """
+    Bars of 4 symbols of uneven histories, ``600002`` halted for two months.
+    """
+    store = BarStore(str(tmp_path_factory.mktemp('batch')))
+    store.write('600000', synthetic_bars('600000', 1500))
+    store.write('600001', synthetic_bars('600001', 900))
+    store.write('600002', synthetic_bars('600002', 1400, end='2022-09-30').drop(range(800, 840)).reset_index(drop=True))
+    store.write('000001', synthetic_bars('000001', 1200, end='2021-12-31'))
+    return {symbol: store.read(symbol) for symbol in store.symbols()}
+
+
+@pytest.mark.parametrize('trim', [False, True])
+@pytest.mark.parametrize('cheat_on_open', [False, True])
+def test_matches_task(config, symbols, cheat_on_open, trim):
+    config = dict(config, CHEAT_ON_OPEN=cheat_on_open, TRIM_BARS=trim)
+    batch = BatchTask(config, SMACrossStrategy, PARAMS)
+    results = batch.run({symbol: 'x' for symbol in symbols}, symbols)
+    for symbol, bars in symbols.items():
+        task = Task(config, SMACrossStrategy, PARAMS)
+        expected = task.run(symbol, 'x', bars)
+        assert any(reference['total_closed'] for reference in expected)
+        assert [r['params'] for r in results[symbol]] == [r['params'] for r in expected]
+        for record, reference in zip(results[symbol], expected):
+            mismatches = [(k, record[k], reference[k]) for k in reference if not same(record[k], reference[k])]
+            assert not mismatches, (symbol, reference['params'], mismatches)
+        assert list(batch.trade_lists[symbol]) == list(task.trade_lists)
+        for key, trades in task.trade_lists.items():
+            # trade refs count the trades of the whole Cerebro
+            pd.testing.assert_frame_equal(batch.trade_lists[symbol][key].drop(columns='ref'), trades.drop(columns='ref'))
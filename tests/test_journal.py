@@ -0,0 +1,26 @@
+from backtesting.journal import Journal, new_run_id
+from backtesting.scheduler import work_units, batch_units
+from backtesting.strategy.sma_cross import SMACrossStrategy
+from start import journal_units
+
+
+def test_run_ids_are_unique_and_ordered():
+    run_ids = [new_run_id() for _ in range(100)]
+    assert len(set(run_ids)) == len(run_ids)
+    assert sorted(run_ids) == run_ids
+
+
+def test_batch_journaled_by_unit(tmp_path):
+    strategies = [SMACrossStrategy]
+    symbols = {'600000': 'a', '600001': 'b', '600002': 'c'}
+    units = work_units(symbols, {}, strategies, 0)
+    batch = batch_units(units, 2)[0]
+    journal = Journal(str(tmp_path), new_run_id())
+    with journal:
+        journal_units(journal, batch, [{'symbol': '600000'}, {'symbol': '600001'}, {'symbol': '600000'}])
+    entries = dict(journal.entries())
+    assert list(entries) == [unit.key for unit in units[:2]]
+    assert entries[units[0].key] == [{'symbol': '600000'}, {'symbol': '600000'}]
+    # resuming with batches of another size runs the missing unit only
+    left = [unit for unit in units if unit.key not in entries]
+    assert [unit.symbol for unit in batch_units(left, 3)] == ['600002']
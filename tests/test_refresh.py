@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from backtesting.feeds import store as store_module
+from backtesting.feeds.refresh import CsvSource, refresh_symbol
+from backtesting.feeds.store import BarStore
+from backtesting.feeds.synthetic import synthetic_bars
+
+SYMBOL = '600000'
+
+
+@pytest.fixture
+def history():
+    return synthetic_bars(SYMBOL, 300)
+
+
+@pytest.fixture
+def source(tmp_path):
+    directory = tmp_path / 'csv'
+    directory.mkdir()
+    return CsvSource(str(directory))
+
+
+def publish(source, df):
+    df.to_csv(os.path.join(source.directory, SYMBOL + '.csv'), index=False)
+
+
+def assert_stored(store, df):
+    bars = store.read(SYMBOL)
+    np.testing.assert_array_equal(bars.datetime, df['date'].values.astype('datetime64[D]'))
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        np.testing.assert_array_equal(getattr(bars, column), df[column].values)
+
+
+def test_refresh_symbol(tmp_path, source, history):
+    store = BarStore(str(tmp_path / 'store'))
+    publish(source, history[:250])
+    assert refresh_symbol(store, SYMBOL, source) == 'new'
+    assert refresh_symbol(store, SYMBOL, source) == 'current'
+    assert_stored(store, history[:250])
+
+    publish(source, history)
+    assert refresh_symbol(store, SYMBOL, source) == 'appended'
+    assert_stored(store, history)
+
+    adjusted = history.assign(**{column: (history[column] * 0.9).round(3) for column in ('open', 'high', 'low', 'close')})
+    publish(source, adjusted)
+    assert refresh_symbol(store, SYMBOL, source) == 'adjusted'
+    assert_stored(store, adjusted)
+    # the columns of the earlier versions are gone
+    assert len(os.listdir(store.path(SYMBOL))) == 7
+
+
+def test_crashed_append_keeps_symbol(tmp_path, source, history, monkeypatch):
+    store = BarStore(str(tmp_path / 'store'))
+    publish(source, history[:250])
+    refresh_symbol(store, SYMBOL, source)
+    publish(source, history)
+
+    def crash(f, values):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(store_module.np, 'save', crash)
+    with pytest.raises(OSError):
+        refresh_symbol(store, SYMBOL, source)
+    monkeypatch.undo()
+    assert store.has(SYMBOL)
+    assert_stored(store, history[:250])
+    assert refresh_symbol(store, SYMBOL, source) == 'appended'
+    assert_stored(store, history)
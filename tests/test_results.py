@@ -0,0 +1,34 @@
+import inspect
+
+from backtesting import results
+from backtesting.results import ResultCache
+from backtesting.strategy.sma_cross import SMACrossStrategy
+
+CONFIG = {'START_DATE': '2015-01-01', 'END_DATE': '2023-06-30', 'START_CASH': 100000}
+
+
+def key(root):
+    return ResultCache(str(root)).key('bars', SMACrossStrategy, '(5, 20)', CONFIG)
+
+
+def test_key_is_stable(tmp_path):
+    assert key(tmp_path) == key(tmp_path)
+
+
+def test_key_covers_indicator_source(tmp_path, monkeypatch):
+    before = key(tmp_path)
+    getsource = inspect.getsource
+
+    def edited(obj):
+        source = getsource(obj)
+        if getattr(obj, '__name__', None) == 'backtesting.indicators.zigzag':
+            source += '\n# edited\n'
+        return source
+
+    monkeypatch.setattr(results.inspect, 'getsource', edited)
+    assert key(tmp_path) != before
+
+
+def test_engine_modules_import():
+    assert 'backtesting.indicators.zigzag' in results.ENGINE_MODULES
+    assert results.engine_source()
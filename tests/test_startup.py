@@ -0,0 +1,25 @@
+import os
+import sys
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = '''
+import os, builtins
+hooks = []
+os.register_at_fork = lambda **kwargs: hooks.append(kwargs)
+opened = []
+builtin_open = builtins.open
+def tracked_open(file, *args, **kwargs):
+    opened.append(str(file))
+    return builtin_open(file, *args, **kwargs)
+builtins.open = tracked_open
+import %s
+assert not [h for h in hooks if 'EventLog' in repr(h)], 'event log fork hooks registered on import'
+assert not [f for f in opened if f.endswith('config.yaml')], 'config read on import'
+'''
+
+
+def test_imports_have_no_side_effects():
+    for module in ('start', 'search', 'walkforward'):
+        subprocess.run([sys.executable, '-c', CHECK % module], cwd=PROJECT_DIR, check=True)
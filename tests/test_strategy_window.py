@@ -0,0 +1,28 @@
+import backtrader as bt
+import pandas as pd
+
+from backtesting.feeds.arraydata import ArrayData, frame_columns
+from backtesting.feeds.synthetic import synthetic_bars
+from backtesting.strategy.sma_cross import SMACrossStrategy
+
+WINDOW = ('2020-01-01', '2022-12-31')
+
+
+def run(data):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.backtest_window = WINDOW
+    cerebro.adddata(data)
+    cerebro.addstrategy(SMACrossStrategy, fast_period=10, slow_period=30)
+    cerebro.broker.setcash(100000)
+    strategy = cerebro.run()[0]
+    return strategy.first_bar, strategy.end_bar, cerebro.broker.getvalue()
+
+
+def test_window_without_array_data():
+    df = synthetic_bars('600000', bars=1500)
+    array_run = run(ArrayData(dataname=frame_columns(df, 'date')))
+    frame = df.set_index(pd.to_datetime(df['date'])).drop(columns='date')
+    pandas_run = run(bt.feeds.PandasData(dataname=frame, openinterest=None))
+    dates = pd.to_datetime(df['date'])
+    assert array_run[:2] == ((dates < WINDOW[0]).sum(), (dates <= WINDOW[1]).sum())
+    assert pandas_run == array_run
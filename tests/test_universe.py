@@ -0,0 +1,15 @@
+import pytest
+import yaml
+
+from backtesting.feeds.universe import universe
+
+
+def test_quoted_codes():
+    config = yaml.safe_load("UNIVERSE: ['600000', '000001']")
+    assert universe(config) == {'600000': '600000', '000001': '000001'}
+
+
+def test_unquoted_code_rejected():
+    config = yaml.safe_load('UNIVERSE: [000300]')
+    with pytest.raises(ValueError, match='quote'):
+        universe(config)
@@ -0,0 +1,56 @@
+import math
+from datetime import date
+
+import pytest
+
+from backtesting.task import Task
+from backtesting.vectorized import VectorTask
+from backtesting.strategy.price_sma_cross import PriceSMACrossStrategy
+from backtesting.strategy.sma_cross import SMACrossStrategy
+from backtesting.strategy.zigzag import ZigZagStrategy
+
+GRIDS = [
+    (PriceSMACrossStrategy, {'period': [5, 20, 60]}),
+    (SMACrossStrategy, {'fast_period': [5, 20], 'slow_period': [30, 60]}),
+    (ZigZagStrategy, {'dev_threshold': [3, 5], 'depth': [10], 'mode': ['above swing low', 'strict uptrend']}),
+]
+
+
+def same(x, y):
+    if isinstance(x, float) or isinstance(y, float):
+        if x is None or y is None:
+            return x is y
+        return math.isclose(x, y, rel_tol=1e-7, abs_tol=1e-6) or (math.isnan(x) and math.isnan(y))
+    return x == y
+
+
+@pytest.mark.parametrize('trim', [False, True])
+@pytest.mark.parametrize('strategy_cls, params', GRIDS, ids=[cls.__name__ for cls, _ in GRIDS])
+def test_matches_backtrader(config, bars, strategy_cls, params, trim):
+    config = dict(config, TRIM_BARS=trim)
+    expected = Task(config, strategy_cls, params).run('600000', 'x', bars)
+    records = VectorTask(config, strategy_cls, params).run('600000', 'x', bars)
+    assert [r['params'] for r in records] == [r['params'] for r in expected]
+    assert any(reference['total_closed'] for reference in expected)
+    for record, reference in zip(records, expected):
+        mismatches = [(k, record[k], reference[k]) for k in reference if not same(record[k], reference[k])]
+        assert not mismatches, (reference['params'], mismatches)
+
+
+@pytest.mark.parametrize('engine', [Task, VectorTask], ids=['backtrader', 'vectorized'])
+def test_record_independent_of_grid(config, bars, engine):
+    # the wider grid loads a longer warm-up, which no metric may see
+    config = dict(config, START_DATE=date(2019, 1, 1),
+                  METRICS=['trades', 'drawdown', 'sqn', 'sharpe_ratio', 'sharpe_ratio_a', 'sortino_ratio',
+                           'calmar_ratio'])
+    records = []
+    for trim in (True, False):
+        for slow_period in ([20], [20, 120]):
+            task = engine(dict(config, TRIM_BARS=trim), SMACrossStrategy,
+                          {'fast_period': [5], 'slow_period': slow_period})
+            records.extend(r for r in task.run('600000', 'x', bars) if r['params'] == '5_20')
+    reference = records[0]
+    assert reference['sharpe_ratio'] is not None and reference['calmar_ratio'] is not None
+    for record in records[1:]:
+        mismatches = [(k, record[k], reference[k]) for k in reference if not same(record[k], reference[k])]
+        assert not mismatches
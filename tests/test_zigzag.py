@@ -0,0 +1,39 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+from backtesting.feeds.akshare import feed_from_bars
+from backtesting.indicators.zigzag import ZigZag, zigzag_lines
+from zigzag_reference import ReferenceZigZag
+
+PAIRS = [(1, 5), (4, 3), (7, 2), (10, 5), (12, 8), (20, 2)]
+
+
+class Lines(bt.Strategy):
+    params = (('indicator', ZigZag), ('dev_threshold', 5), ('depth', 10))
+
+    def __init__(self):
+        self.zigzag = self.p.indicator(self.data, dev_threshold=self.p.dev_threshold, depth=self.p.depth)
+
+
+def run_lines(bars, indicator, runonce, dev_threshold, depth):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(feed_from_bars(bars))
+    cerebro.addstrategy(Lines, indicator=indicator, dev_threshold=dev_threshold, depth=depth)
+    strategy = cerebro.run(runonce=runonce)[0]
+    return {name: np.array(getattr(strategy.zigzag.lines, name).array) for name in ZigZag.lines.getlinealiases()}
+
+
+@pytest.mark.parametrize('depth, dev_threshold', PAIRS)
+def test_matches_reference(bars, depth, dev_threshold):
+    # the reference writes the zig zag ahead of the current bar, into the lines runonce sizes up front
+    reference = run_lines(bars, ReferenceZigZag, True, dev_threshold, depth)
+    # a depth of 1 has no window around its pivots
+    assert depth == 1 or np.isfinite(reference['zigzag']).sum() > 10
+    for runonce in (False, True):
+        lines = run_lines(bars, ZigZag, runonce, dev_threshold, depth)
+        for name in reference:
+            np.testing.assert_array_equal(lines[name], reference[name], err_msg='%s runonce=%s' % (name, runonce))
+    lines = zigzag_lines(bars.high, bars.low, dev_threshold, depth)
+    for name in reference:
+        np.testing.assert_array_equal(lines[name], reference[name], err_msg=name)
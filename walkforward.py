@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Walk-forward optimization of strategies over the index symbols:
+
+  python walkforward.py [SMACrossStrategy ...] [--train 36] [--test 12] [--anchored] [--symbols 600000 600036]
+
+``START_DATE`` to ``END_DATE`` is cut into windows of ``--train`` months of in-sample
+dates followed by ``--test`` months of out-of-sample dates. The parameter grid of a
+strategy runs on the in-sample dates of every window, the parameter set with the best
+``WALK_FORWARD_METRIC`` summary is chosen and run on the out-of-sample dates after them.
+Reports go to ``REPORT_DIR/walkforward``, by strategy:
+
+  - ``<strategy> windows``: the dates, chosen params and scores of every window
+  - ``<strategy> out of sample``: the detail records of every window out of sample
+  - ``<strategy>``: the detail record of every symbol over the windows out of sample stitched together
+"""
+
+import os
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from backtesting.walkforward import walk_forward_windows, window_groups, in_sample, out_of_sample, choose, stitch
+from backtesting.vectorized import params_grid, params_repr
+from backtesting.analyzer import DEFAULT_METRICS
+from backtesting.report import DetailWriter, Summary, DETAIL_COLUMNS
+from backtesting.feeds.universe import universe
+from backtesting.utils import read_config, df_to_csv
+
+
+def gather(futures):
+    """
+    Results of the (key, future) pairs by key, the failed ones reported and left out.
+    """
+    results = {}
+    for key, future in futures:
+        try:
+            results[key] = future.result()
+        except Exception as exc:
+            print('%s generated an exception: %s' % (' '.join(str(k) for k in key), exc))
+    return results
+
+
+def main():
+    config = read_config()
+    parser = argparse.ArgumentParser(description='walk-forward optimization of strategies')
+    parser.add_argument('strategies', nargs='*', help='strategy class names, all the optimized ones by default')
+    parser.add_argument('--train', type=int, default=config.get('WALK_FORWARD_TRAIN_MONTHS', 36),
+                        help='months of in-sample dates of a window')
+    parser.add_argument('--test', type=int, default=config.get('WALK_FORWARD_TEST_MONTHS', 12),
+                        help='months of out-of-sample dates of a window, the step between windows')
+    parser.add_argument('--anchored', action='store_true', default=config.get('WALK_FORWARD_ANCHORED', False),
+                        help='train every window from START_DATE')
+    parser.add_argument('--metric', default=config.get('WALK_FORWARD_METRIC', 'annualized_return_percentage'),
+                        help='summary column the parameters are chosen by')
+    parser.add_argument('--symbols', nargs='+', help='symbols to run, the UNIVERSE by default')
+    args = parser.parse_args()
+
+    unknown = set(args.strategies) - set(config.get('STRATEGIES'))
+    if unknown:
+        parser.error('unknown strategies: %s' % ', '.join(sorted(unknown)))
+    strategies = []
+    for strategy_cls_name, module in config.get('STRATEGIES').items():
+        if args.strategies and strategy_cls_name not in args.strategies:
+            continue
+        strategy_cls = getattr(importlib.import_module(module), strategy_cls_name)
+        if strategy_cls.optimize():
+            strategies.append(strategy_cls)
+        else:
+            print('%s runs a single parameter set, skipped' % strategy_cls_name)
+    if not strategies:
+        parser.error('no strategy to optimize')
+    windows = walk_forward_windows(config.get('START_DATE'), config.get('END_DATE'), args.train, args.test,
+                                   args.anchored)
+    if not windows:
+        parser.error('START_DATE to END_DATE is shorter than %d months of training' % args.train)
+    symbols = {symbol: symbol for symbol in args.symbols} if args.symbols else universe(config)
+    if not symbols:
+        parser.error('no symbols to optimize on, UNIVERSE is empty')
+
+    print('%d %s windows of %d months out of sample after %d months in sample' % (
+        len(windows), 'anchored' if args.anchored else 'rolling', args.test, args.train))
+    for window in windows:
+        print('  %(window)d: %(train_start)s to %(train_end)s, %(test_start)s to %(test_end)s' % window.asdict())
+
+    workers = config.get('WORKERS') or os.cpu_count()
+    # the windows of a symbol run in one unit to share its bars and indicators,
+    # unless there are too few symbols to keep the workers busy
+    groups = window_groups(windows, min(len(windows), workers // len(symbols)))
+    directory = os.path.join(config.get('REPORT_DIR'), 'walkforward')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [((strategy_cls.__name__, symbol, i), executor.submit(in_sample, config, strategy_cls, symbol, name,
+                                                                        group))
+                   for strategy_cls in strategies for symbol, name in symbols.items()
+                   for i, group in enumerate(groups)]
+        train = gather(futures)
+
+        chosen = {}
+        for strategy_cls in strategies:
+            combos = {params_repr(strategy_cls, combo): combo
+                      for combo in params_grid(strategy_cls, True, strategy_cls.params_list())}
+            for window in windows:
+                records = [record for (strategy_name, _, _), results in train.items()
+                           if strategy_name == strategy_cls.__name__
+                           for index, window_records in results if index == window.index
+                           for record in window_records]
+                params, score = choose(records, args.metric, (window.train_end - window.train_start).days)
+                if params is not None:
+                    chosen[(strategy_cls.__name__, window.index)] = (combos[params], score)
+
+        futures = []
+        for strategy_cls in strategies:
+            for symbol, name in symbols.items():
+                for i, group in enumerate(groups):
+                    group = [window for window in group if (strategy_cls.__name__, window.index) in chosen]
+                    if group:
+                        params = [chosen[(strategy_cls.__name__, window.index)][0] for window in group]
+                        futures.append(((strategy_cls.__name__, symbol, i), executor.submit(
+                            out_of_sample, config, strategy_cls, symbol, name, group, params)))
+        test = gather(futures)
+
+    metrics = config.get('METRICS') or DEFAULT_METRICS
+    for strategy_cls in strategies:
+        strategy_name = strategy_cls.__name__
+        results = {}
+        for (name, symbol, _), symbol_results in test.items():
+            if name == strategy_name:
+                results.setdefault(symbol, []).extend(symbol_results)
+
+        rows = []
+        details = []
+        for window in windows:
+            if (strategy_name, window.index) not in chosen:
+                continue
+            params, score = chosen[(strategy_name, window.index)]
+            records = [record for symbol_results in results.values()
+                       for index, record, _ in symbol_results if index == window.index]
+            _, oos_score = choose(records, args.metric, (window.test_end - window.test_start).days)
+            rows.append(dict(window.asdict(), params=params_repr(strategy_cls, params), symbols=len(records),
+                             in_sample=score, out_of_sample=oos_score))
+            details.extend(dict(record, window=window.index) for record in records)
+        if not rows:
+            print('%s: no window ran' % strategy_name)
+            continue
+        df_to_csv(pd.DataFrame(rows), directory, '%s windows' % strategy_name)
+        df_to_csv(pd.DataFrame(details, columns=['window'] + DETAIL_COLUMNS), directory,
+                  '%s out of sample' % strategy_name)
+
+        writer = DetailWriter(directory, strategy_name)
+        summary = Summary((windows[-1].test_end - windows[0].test_start).days)
+        stitched = []
+        for symbol, symbol_results in sorted(results.items()):
+            symbol_results.sort(key=lambda result: result[0])
+            metrics_record = stitch([windows[index] for index, _, _ in symbol_results],
+                                    [curve for _, _, curve in symbol_results], config.get('START_CASH', 1000000),
+                                    metrics)
+            metrics_record.symbol = symbol
+            metrics_record.name = symbols[symbol]
+            metrics_record.strategy = strategy_name
+            # the parameter sets of its windows, the same for the symbols trading in all of them
+            metrics_record.params = ' | '.join(record['params'] for _, record, _ in symbol_results)
+            stitched.append(metrics_record.asdict())
+        writer.write(stitched)
+        writer.close()
+        summary.add(stitched)
+
+        print('%s by %s, in sample and out of sample:' % (strategy_name, args.metric))
+        print(pd.DataFrame(rows)[['window', 'test_start', 'params', 'in_sample', 'out_of_sample']].to_string(index=False))
+        print(summary.frame().drop(columns=['strategy', 'params']).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()